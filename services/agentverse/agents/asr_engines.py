@@ -0,0 +1,231 @@
+"""ASR Engines
+
+Speech-to-text engines behind `TranscribeAgent.transcribe_audio`. Every engine
+takes a spooled `MediaFile` and returns a dict with `transcript`, `language`,
+`duration` and `engine`. Besides the OpenAI Whisper and HuggingFace Inference
+APIs there is a local CPU engine that runs a (optionally int8-quantized)
+Whisper or wav2vec2 model in a process pool, loading the model once per worker
+process, so throughput scales with our own cores and no network is involved.
+
+Run `python -m agents.asr_engines --engine local FILE...` to benchmark an
+engine offline.
+
+Env:
+- TRANSCRIBE_ENGINES: Comma-separated engine order (default "openai,huggingface")
+- OPENAI_API_KEY: OpenAI key for Whisper
+- HUGGINGFACE_TOKEN: HF inference token
+- LOCAL_ASR_MODEL: HuggingFace model id for the local engine (default openai/whisper-small)
+- LOCAL_ASR_WORKERS: Local engine worker processes (default CPU count)
+- LOCAL_ASR_QUANTIZE: "1" to apply dynamic int8 quantization (default 1)
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from agents.http_client import get_http_client
+from agents.media import MediaFile
+
+LOCAL_SAMPLING_RATE = 16000
+
+class ASREngine:
+    """Base class for speech-to-text engines."""
+    name = "base"
+
+    async def transcribe(self, media: MediaFile, language: str) -> Dict[str, Any]:
+        """Transcribe `media` and return transcript, language, duration and engine."""
+        raise NotImplementedError
+
+    async def close(self):
+        """Release engine resources (worker pools, clients)."""
+
+class OpenAIWhisperEngine(ASREngine):
+    """OpenAI Whisper API engine."""
+    name = "openai:whisper-1"
+
+    def __init__(self, api_key: str = None):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+
+    async def transcribe(self, media: MediaFile, language: str) -> Dict[str, Any]:
+        # The spool file is uploaded directly; the SDK call is blocking, so keep it off the event loop
+        response = await asyncio.to_thread(self._transcribe_file, media.path, language)
+        return {
+            'transcript': response.text,
+            'language': response.language,
+            'duration': response.duration,
+            'engine': self.name
+        }
+
+    def _transcribe_file(self, path: str, language: str):
+        """Blocking OpenAI Whisper call, run in a worker thread."""
+        import openai
+        openai.api_key = self.api_key
+
+        with open(path, 'rb') as audio_file:
+            return openai.Audio.transcribe(
+                "whisper-1",
+                audio_file,
+                language=language,
+                response_format="verbose_json"
+            )
+
+class HuggingFaceInferenceEngine(ASREngine):
+    """HuggingFace Inference API engine (wav2vec2 by default)."""
+    def __init__(self, model: str = "facebook/wav2vec2-large-xlsr-53", token: str = None):
+        self.model = model
+        self.token = token or os.getenv("HUGGINGFACE_TOKEN")
+        self.name = f"huggingface:{model}"
+
+    async def transcribe(self, media: MediaFile, language: str) -> Dict[str, Any]:
+        try:
+            api_url = f"https://api-inference.huggingface.co/models/{self.model}"
+            headers = {"Authorization": f"Bearer {self.token}"}
+
+            with media.open() as audio_file:
+                result = await get_http_client().post_json(api_url, headers=headers, data=audio_file)
+
+            return {
+                'transcript': result.get('text', ''),
+                'language': language,
+                'duration': None,
+                'engine': self.name
+            }
+
+        except Exception as e:
+            raise Exception(f"HuggingFace transcription failed: {str(e)}")
+
+# Per-process model state for the local engine, populated by `_init_local_worker`.
+_local_pipeline = None
+_local_is_whisper = False
+
+def _init_local_worker(model: str, quantize: bool):
+    """Process-pool initializer: load the ASR model once per worker process."""
+    global _local_pipeline, _local_is_whisper
+    import torch
+    from transformers import pipeline
+
+    torch.set_num_threads(1)
+    asr = pipeline("automatic-speech-recognition", model=model, device=-1)
+    if quantize:
+        asr.model = torch.quantization.quantize_dynamic(asr.model, {torch.nn.Linear}, dtype=torch.qint8)
+    _local_pipeline = asr
+    _local_is_whisper = "whisper" in model.lower()
+
+def _local_transcribe(path: str, language: str) -> Dict[str, Any]:
+    """Transcribe one file inside a worker process."""
+    from transformers.pipelines.audio_utils import ffmpeg_read
+
+    with open(path, 'rb') as f:
+        audio = ffmpeg_read(f.read(), LOCAL_SAMPLING_RATE)
+
+    kwargs = {"chunk_length_s": 30}
+    if _local_is_whisper:
+        kwargs["generate_kwargs"] = {"language": language, "task": "transcribe"}
+
+    output = _local_pipeline({"raw": audio, "sampling_rate": LOCAL_SAMPLING_RATE}, **kwargs)
+    return {
+        'transcript': output.get('text', '').strip(),
+        'language': language,
+        'duration': len(audio) / LOCAL_SAMPLING_RATE
+    }
+
+class LocalASREngine(ASREngine):
+    """Offline CPU engine running a local Whisper/wav2vec2 model in a process pool."""
+    def __init__(self, model: str = None, workers: int = None, quantize: bool = None):
+        self.model = model or os.getenv("LOCAL_ASR_MODEL", "openai/whisper-small")
+        self.workers = workers or int(os.getenv("LOCAL_ASR_WORKERS", str(os.cpu_count() or 1)))
+        self.quantize = quantize if quantize is not None else os.getenv("LOCAL_ASR_QUANTIZE", "1") == "1"
+        self.name = f"local:{self.model}" + (":int8" if self.quantize else "")
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn keeps torch state out of forked children
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_local_worker,
+                initargs=(self.model, self.quantize)
+            )
+        return self._executor
+
+    async def transcribe(self, media: MediaFile, language: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self._get_executor(), _local_transcribe, media.path, language)
+        result['engine'] = self.name
+        return result
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+ENGINE_FACTORIES = {
+    "openai": OpenAIWhisperEngine,
+    "huggingface": HuggingFaceInferenceEngine,
+    "local": LocalASREngine
+}
+
+def build_engines(names: List[str] = None) -> List[ASREngine]:
+    """Instantiate engines in fallback order from names or `TRANSCRIBE_ENGINES`."""
+    if names is None:
+        names = [n.strip() for n in os.getenv("TRANSCRIBE_ENGINES", "openai,huggingface").split(",") if n.strip()]
+    unknown = [n for n in names if n not in ENGINE_FACTORIES]
+    if unknown:
+        raise ValueError(f"Unknown transcription engines: {', '.join(unknown)}")
+    return [ENGINE_FACTORIES[name]() for name in names]
+
+async def benchmark(engine: ASREngine, paths: List[str], language: str, concurrency: int) -> Dict[str, Any]:
+    """Transcribe `paths` with bounded concurrency and report latency and real-time factor."""
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def run(path: str):
+        media = MediaFile(path, os.path.getsize(path), "", owned=False)
+        async with semaphore:
+            started = time.perf_counter()
+            result = await engine.transcribe(media, language)
+            timings.append((time.perf_counter() - started, result.get('duration')))
+
+    # Warm-up run so model loading is not counted
+    await run(paths[0])
+    timings.clear()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(path) for path in paths))
+    wall = time.perf_counter() - started
+
+    audio_seconds = sum(d for _, d in timings if d)
+    return {
+        'engine': engine.name,
+        'files': len(paths),
+        'wall_seconds': wall,
+        'mean_latency': sum(t for t, _ in timings) / len(timings),
+        'audio_seconds': audio_seconds,
+        'real_time_factor': wall / audio_seconds if audio_seconds else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark an ASR engine offline")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--engine", default="local", choices=sorted(ENGINE_FACTORIES))
+    parser.add_argument("--language", default="sw")
+    parser.add_argument("--concurrency", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    async def run():
+        engine = build_engines([args.engine])[0]
+        try:
+            print(await benchmark(engine, args.files, args.language, args.concurrency))
+        finally:
+            await engine.close()
+            await get_http_client().close()
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
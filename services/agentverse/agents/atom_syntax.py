@@ -0,0 +1,121 @@
+"""Atom Syntax
+
+Single-pass tokenizer and parser for MeTTa atoms shared by the Symbolizer and
+Validator agents. One linear scan checks that parentheses balance and string
+literals close, and produces a canonical form (single spaces between tokens,
+none inside parentheses). Parse results are cached per atom text, so atoms
+seen again by a later stage are not re-scanned.
+
+Env:
+- ATOM_PARSE_CACHE_SIZE: Parsed atoms kept in the LRU cache (default 65536)
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+# One alternation per token kind; the regex engine does the character loop
+_TOKEN = re.compile(r'(?P<ws>\s+)|(?P<open>\()|(?P<close>\))|(?P<str>"[^"\\]*(?:\\.[^"\\]*)*")|(?P<bad>")|(?P<sym>[^\s()"]+)')
+
+# Fast path for the common flat atom `(predicate arg ...)`: validated in one regex match
+_ARG = r'"[^"\\]*(?:\\.[^"\\]*)*"|[^\s()"]+'
+_FLAT = re.compile(r'\s*\(\s*([^\s()"]+)((?:\s+(?:' + _ARG + r'))+)\s*\)\s*')
+_FLAT_ARG = re.compile(_ARG)
+
+class ParsedAtom(NamedTuple):
+    """Result of parsing one atom string."""
+    valid: bool
+    canonical: Optional[str] = None
+    # Top-level elements: symbols as written, strings unquoted, sub-expressions canonical
+    terms: Tuple[str, ...] = ()
+    error: Optional[str] = None
+    # Unclosed parentheses at end of input, used by fix_atom_syntax
+    open_depth: int = 0
+
+def _scan(text: str) -> ParsedAtom:
+    """Tokenize and validate `text` in one pass."""
+    flat = _FLAT.fullmatch(text)
+    if flat:
+        args = _FLAT_ARG.findall(flat.group(2))
+        terms = [flat.group(1)]
+        terms.extend(arg[1:-1] if arg[0] == '"' else arg for arg in args)
+        return ParsedAtom(True, f"({flat.group(1)} {' '.join(args)})", tuple(terms))
+    out = []
+    terms = []
+    depth = 0
+    # Start of the current top-level sub-expression within `out`
+    element_start = 0
+    closed = False
+    for match in _TOKEN.finditer(text):
+        kind = match.lastgroup
+        if kind == 'ws':
+            continue
+        if closed:
+            return ParsedAtom(False, error=f"unexpected text after atom at position {match.start()}")
+        if kind == 'open':
+            if out and out[-1] != '(':
+                out.append(' ')
+            if depth == 1:
+                element_start = len(out)
+            out.append('(')
+            depth += 1
+        elif kind == 'close':
+            depth -= 1
+            if depth < 0:
+                return ParsedAtom(False, error=f"unbalanced ')' at position {match.start()}")
+            out.append(')')
+            if depth == 1:
+                terms.append(''.join(out[element_start:]))
+            elif depth == 0:
+                closed = True
+        elif kind == 'bad':
+            return ParsedAtom(False, error=f"unterminated string literal at position {match.start()}", open_depth=depth)
+        else:
+            token = match.group()
+            if depth == 0:
+                return ParsedAtom(False, error="atom must be a parenthesized expression")
+            if out[-1] != '(':
+                out.append(' ')
+            out.append(token)
+            if depth == 1:
+                terms.append(token[1:-1] if kind == 'str' else token)
+    if not out:
+        return ParsedAtom(False, error="empty atom")
+    if depth > 0:
+        return ParsedAtom(False, error=f"{depth} unclosed '('", open_depth=depth)
+    if len(terms) < 2:
+        return ParsedAtom(False, error="atom needs a predicate and at least one argument")
+    return ParsedAtom(True, ''.join(out), tuple(terms))
+
+@lru_cache(maxsize=int(os.getenv("ATOM_PARSE_CACHE_SIZE", "65536")))
+def parse_atom(text: str) -> ParsedAtom:
+    """Parse an atom string, memoized per exact text."""
+    return _scan(text)
+
+def is_valid_atom(text: str) -> bool:
+    """True if `text` is one balanced expression with at least two elements."""
+    return parse_atom(text).valid
+
+def normalize_atom(text: str) -> Optional[str]:
+    """Canonical form of a valid atom, or None."""
+    return parse_atom(text).canonical
+
+def fix_atom_syntax(text: str) -> Optional[str]:
+    """Best-effort repair of missing outer or closing parentheses; canonical form or None."""
+    text = text.strip()
+    parsed = parse_atom(text)
+    if parsed.valid:
+        return parsed.canonical
+    if not text.startswith('('):
+        text = '(' + text
+        if not text.endswith(')'):
+            text += ')'
+        parsed = parse_atom(text)
+    if parsed.open_depth > 0 and parsed.error and parsed.error.endswith("unclosed '('"):
+        parsed = parse_atom(text + ')' * parsed.open_depth)
+    return parsed.canonical
+
+def cache_info():
+    """Hit/miss statistics of the parse cache."""
+    return parse_atom.cache_info()
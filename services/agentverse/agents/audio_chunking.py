@@ -0,0 +1,187 @@
+"""Audio Chunking
+
+Splits long recordings into overlapping segments so they can be transcribed
+concurrently instead of as one slow request. Cut points are snapped to the
+nearest silence when one is close to the target boundary, each segment is
+re-encoded as 16 kHz mono WAV (small enough for the Whisper upload limit), and
+the per-segment transcripts are stitched back together with the words repeated
+in the overlaps removed.
+
+Env:
+- TRANSCRIBE_SEGMENT_SECONDS: Target segment length (default 300, at least 10)
+- TRANSCRIBE_OVERLAP_SECONDS: Overlap between neighbouring segments (default 2,
+  shorter than a segment)
+- TRANSCRIBE_MAX_WORKERS: Segments transcribed concurrently (default 4)
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from agents.media import MediaFile, spool_dir
+
+SILENCE_SEARCH_FRACTION = 0.15
+MIN_SEGMENT_SECONDS = 10.0
+MAX_OVERLAP_WORDS = 30
+
+class AudioSegmentFile:
+    """One exported segment of a longer recording."""
+    def __init__(self, index: int, start_ms: int, end_ms: int, overlap_ms: int, media: MediaFile):
+        self.index = index
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.overlap_ms = overlap_ms  # overlap with the previous segment
+        self.media = media
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ms - self.start_ms) / 1000.0
+
+def plan_segments(
+    length_ms: int,
+    silences: List[Tuple[int, int]],
+    segment_ms: int,
+    overlap_ms: int
+) -> List[Tuple[int, int]]:
+    """Return `(start_ms, end_ms)` spans covering `length_ms` with overlaps.
+
+    Each cut is placed at the middle of the silence closest to the target
+    boundary, if one lies within a window around it; otherwise at the target.
+    """
+    if not segment_ms > overlap_ms >= 0:
+        raise ValueError(f"segment length ({segment_ms} ms) must exceed the overlap ({overlap_ms} ms), "
+                         f"which must not be negative")
+    if length_ms <= segment_ms:
+        return [(0, length_ms)]
+
+    window = int(segment_ms * SILENCE_SEARCH_FRACTION)
+    midpoints = [(start + end) // 2 for start, end in silences]
+    spans = []
+    start = 0
+    while start < length_ms:
+        target = start + segment_ms
+        if target >= length_ms:
+            spans.append((start, length_ms))
+            break
+        nearby = [m for m in midpoints if abs(m - target) <= window and m > start + overlap_ms]
+        cut = min(nearby, key=lambda m: abs(m - target)) if nearby else target
+        spans.append((start, min(length_ms, cut + overlap_ms)))
+        if cut <= start:
+            raise RuntimeError(f"segment planning made no progress at {start} ms")
+        start = cut
+    return spans
+
+def split_audio(media: MediaFile, segment_seconds: float, overlap_seconds: float) -> List[AudioSegmentFile]:
+    """Decode `media` and export overlapping segments (blocking; run in a thread)."""
+    from pydub import AudioSegment
+    from pydub.silence import detect_silence
+
+    audio = AudioSegment.from_file(media.path)
+    segment_ms = int(segment_seconds * 1000)
+    overlap_ms = int(overlap_seconds * 1000)
+
+    silences = []
+    if len(audio) > segment_ms:
+        silences = detect_silence(audio, min_silence_len=500, silence_thresh=audio.dBFS - 16, seek_step=50)
+
+    segments = []
+    previous_end = 0
+    for index, (start, end) in enumerate(plan_segments(len(audio), silences, segment_ms, overlap_ms)):
+        chunk = audio[start:end].set_frame_rate(16000).set_channels(1)
+        fd, path = tempfile.mkstemp(suffix=".wav", dir=spool_dir())
+        os.close(fd)
+        chunk.export(path, format="wav")
+        segment_media = MediaFile(path, os.path.getsize(path), _sha256_file(path), "audio/wav")
+        segments.append(AudioSegmentFile(index, start, end, max(0, previous_end - start), segment_media))
+        previous_end = end
+    return segments
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+def stitch_transcripts(parts: List[str], max_overlap_words: int = MAX_OVERLAP_WORDS) -> str:
+    """Join segment transcripts, dropping words duplicated across each overlap."""
+    words: List[str] = []
+    for part in parts:
+        incoming = part.split()
+        if not words:
+            words.extend(incoming)
+            continue
+        tail = [_normalize_word(w) for w in words[-max_overlap_words:]]
+        head = [_normalize_word(w) for w in incoming[:max_overlap_words]]
+        overlap = 0
+        for size in range(min(len(tail), len(head)), 0, -1):
+            if tail[-size:] == head[:size]:
+                overlap = size
+                break
+        words.extend(incoming[overlap:])
+    return " ".join(words)
+
+async def transcribe_chunked(
+    media: MediaFile,
+    language: str,
+    transcribe: Callable[[MediaFile, str], Awaitable[Dict[str, Any]]],
+    segment_seconds: float = None,
+    overlap_seconds: float = None,
+    max_workers: int = None
+) -> Dict[str, Any]:
+    """Transcribe `media` as overlapping segments with a bounded worker pool.
+
+    `transcribe` is the single-file transcription coroutine (e.g.
+    `TranscribeAgent.transcribe_audio`) and is called once per segment.
+    """
+    segment_seconds = segment_seconds if segment_seconds is not None else float(
+        os.getenv("TRANSCRIBE_SEGMENT_SECONDS", "300")
+    )
+    overlap_seconds = overlap_seconds if overlap_seconds is not None else float(
+        os.getenv("TRANSCRIBE_OVERLAP_SECONDS", "2")
+    )
+    max_workers = max_workers or int(os.getenv("TRANSCRIBE_MAX_WORKERS", "4"))
+    if segment_seconds < MIN_SEGMENT_SECONDS:
+        raise ValueError(f"segment_seconds must be at least {MIN_SEGMENT_SECONDS:g}, got {segment_seconds:g}")
+    if not segment_seconds > overlap_seconds >= 0:
+        raise ValueError(f"overlap_seconds must be >= 0 and below segment_seconds, got {overlap_seconds:g}")
+
+    segments = await asyncio.to_thread(split_audio, media, segment_seconds, overlap_seconds)
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def run(segment: AudioSegmentFile) -> Dict[str, Any]:
+        async with semaphore:
+            return await transcribe(segment.media, language)
+
+    tasks = [asyncio.ensure_future(run(segment)) for segment in segments]
+    try:
+        results = await asyncio.gather(*tasks)
+    finally:
+        # A failed segment must not leave siblings reading files we are about to delete
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for segment in segments:
+            segment.media.cleanup()
+
+    duration = 0.0
+    for segment, result in zip(segments, results):
+        segment_duration = result.get('duration')
+        duration += (segment_duration if segment_duration is not None else segment.duration)
+        duration -= segment.overlap_ms / 1000.0
+
+    detected: Optional[str] = next((r.get('language') for r in results if r.get('language')), language)
+    engines = sorted({r.get('engine') for r in results if r.get('engine')})
+    return {
+        'transcript': stitch_transcripts([r.get('transcript') or '' for r in results]),
+        'language': detected,
+        'duration': duration,
+        'engine': ",".join(engines) or None,
+        'segments': len(segments)
+    }
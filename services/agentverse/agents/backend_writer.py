@@ -0,0 +1,428 @@
+"""Backend Writer
+
+Write-behind buffer for the agents' status/transcript/atom updates. Idempotent
+updates (PATCH/PUT) are keyed by (method, url), where the url already names
+the entry, so repeated updates of the same entry and endpoint are merged into
+one request (later fields win) and are retried from a SQLite spool with
+exponential backoff, including after a restart. POSTs create records, so each
+one is sent exactly as submitted and never retried; a failed POST is logged
+and dropped. The buffer is flushed when it holds `max_pending` writes or every
+`flush_seconds`. An entry's writes go out in the order they were submitted,
+and while an entry has writes waiting in the spool its newer writes wait
+behind them (and their backoff); different entries are written concurrently
+over the shared HTTP client. Spool access runs in a worker thread, off the
+event loop. Call `flush_backend_writer()` on shutdown so nothing buffered is
+lost: it waits for a running flush, and writes interrupted by cancellation
+are put back in the spool.
+
+Env:
+- BACKEND_WRITE_BEHIND: Buffer writes (default true); false sends each write
+  immediately, still spooling failed idempotent writes for retry
+- BACKEND_WRITE_FLUSH_SECONDS: Maximum time a write waits in the buffer (default 1.0)
+- BACKEND_WRITE_MAX_PENDING: Buffered writes that trigger an immediate flush (default 200)
+- BACKEND_WRITE_CONCURRENCY: Entries written concurrently per flush (default 8)
+- BACKEND_WRITE_SPOOL_PATH: SQLite retry spool (default <tmp>/afriverse-backend-writes.sqlite3)
+- BACKEND_WRITE_RETRY_SECONDS: First retry delay, doubled per attempt (default 5)
+- BACKEND_WRITE_RETRY_MAX_SECONDS: Retry delay cap (default 600)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+import aiohttp
+
+from agents.http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+# Methods whose repeated updates can be merged and safely re-sent
+IDEMPOTENT_METHODS = {"PATCH", "PUT"}
+
+# Client errors other than these will fail the same way on every retry
+_RETRYABLE_4XX = {408, 409, 425, 429}
+
+class PendingWrite:
+    """One (possibly coalesced) update waiting to be sent."""
+    __slots__ = ("method", "url", "endpoint", "entry_id", "data", "seq", "attempts")
+
+    def __init__(self, method: str, url: str, endpoint: str, entry_id: int, data: Dict[str, Any],
+                 seq: int, attempts: int = 0):
+        self.method = method
+        self.url = url
+        self.endpoint = endpoint
+        self.entry_id = entry_id
+        self.data = data
+        self.seq = seq
+        self.attempts = attempts
+
+    @property
+    def idempotent(self) -> bool:
+        return self.method in IDEMPOTENT_METHODS
+
+    @property
+    def key(self) -> str:
+        """Coalescing key: one per endpoint for idempotent writes, one per write otherwise."""
+        if self.idempotent:
+            return f"{self.method} {self.url}"
+        return f"{self.method} {self.url} #{self.seq}"
+
+class WriteSpool:
+    """SQLite store of writes waiting to be retried, or waiting behind one that is."""
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pending_writes (
+                key TEXT PRIMARY KEY,
+                method TEXT NOT NULL,
+                url TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                entry_id INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                attempts INTEGER NOT NULL,
+                retry_at REAL NOT NULL,
+                last_error TEXT
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pending_writes_entry ON pending_writes (entry_id, retry_at)")
+        self._conn.commit()
+
+    def put(self, writes: Iterable[PendingWrite], retry_at: float, error: str):
+        """Store writes for retry at `retry_at`.
+
+        A write whose key is already spooled is merged over the spooled fields
+        and keeps its earlier position, so no field an earlier write carried is lost.
+        """
+        with self._lock:
+            for write in writes:
+                row = self._conn.execute("SELECT data, seq FROM pending_writes WHERE key = ?", (write.key,)).fetchone()
+                data, seq = write.data, write.seq
+                if row is not None:
+                    data = dict(json.loads(row[0]), **write.data)
+                    seq = min(seq, row[1])
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pending_writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (write.key, write.method, write.url, write.endpoint, write.entry_id, json.dumps(data), seq,
+                     write.attempts, retry_at, error)
+                )
+            self._conn.commit()
+
+    def remove(self, keys: Iterable[str]):
+        """Forget writes that have been delivered (or given up on)."""
+        with self._lock:
+            self._conn.executemany("DELETE FROM pending_writes WHERE key = ?", [(key,) for key in keys])
+            self._conn.commit()
+
+    def due(self, now: float) -> List[PendingWrite]:
+        """All writes of every entry that has a write due.
+
+        Rows stay in the spool until `remove` is called after delivery, so a
+        crash or cancellation mid-send never loses them.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT method, url, endpoint, entry_id, data, seq, attempts FROM pending_writes "
+                "WHERE entry_id IN (SELECT entry_id FROM pending_writes WHERE retry_at <= ?)",
+                (now,)
+            ).fetchall()
+        return [
+            PendingWrite(method, url, endpoint, entry_id, json.loads(data), seq, attempts)
+            for method, url, endpoint, entry_id, data, seq, attempts in rows
+        ]
+
+    def retry_times(self, entry_ids: Iterable[int]) -> Dict[int, float]:
+        """Earliest retry time of each given entry that still has spooled writes."""
+        wanted = sorted(set(entry_ids))
+        found: Dict[int, float] = {}
+        with self._lock:
+            for i in range(0, len(wanted), 500):
+                chunk = wanted[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                found.update(self._conn.execute(
+                    f"SELECT entry_id, MIN(retry_at) FROM pending_writes WHERE entry_id IN ({marks}) GROUP BY entry_id",
+                    chunk
+                ).fetchall())
+        return found
+
+    def max_seq(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM pending_writes").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pending_writes").fetchone()[0]
+
+class BackendWriter:
+    """Coalescing write-behind buffer with size/time flushes and a durable retry spool."""
+    def __init__(
+        self,
+        write_behind: bool = None,
+        flush_seconds: float = None,
+        max_pending: int = None,
+        concurrency: int = None,
+        spool_path: str = None,
+        retry_seconds: float = None,
+        retry_max_seconds: float = None
+    ):
+        self.write_behind = write_behind if write_behind is not None else \
+            os.getenv("BACKEND_WRITE_BEHIND", "true").lower() == "true"
+        self.flush_seconds = flush_seconds or float(os.getenv("BACKEND_WRITE_FLUSH_SECONDS", "1.0"))
+        self.max_pending = max_pending or int(os.getenv("BACKEND_WRITE_MAX_PENDING", "200"))
+        self.concurrency = concurrency or int(os.getenv("BACKEND_WRITE_CONCURRENCY", "8"))
+        self.retry_seconds = retry_seconds or float(os.getenv("BACKEND_WRITE_RETRY_SECONDS", "5"))
+        self.retry_max_seconds = retry_max_seconds or float(os.getenv("BACKEND_WRITE_RETRY_MAX_SECONDS", "600"))
+        self.spool = WriteSpool(spool_path or os.getenv(
+            "BACKEND_WRITE_SPOOL_PATH", os.path.join(tempfile.gettempdir(), "afriverse-backend-writes.sqlite3")
+        ))
+        self._pending: "OrderedDict[str, PendingWrite]" = OrderedDict()
+        # Continue after spooled writes so they stay ahead of new ones for the same entry
+        self._seq = self.spool.max_seq()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._closing = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    async def submit(self, method: str, url: str, endpoint: str, entry_id: int, data: Dict[str, Any]):
+        """Queue an update; idempotent updates merge into a pending one for the same method and url.
+
+        In write-through mode the update is sent before returning; a failed
+        idempotent update is spooled for retry, a failed POST raises.
+        """
+        self.submitted += 1
+        write = PendingWrite(method.upper(), url, endpoint, entry_id, dict(data), self._next_seq())
+        if not self.write_behind:
+            await self._write_through(write)
+            return
+        pending = self._pending.get(write.key)
+        if pending is not None:
+            pending.data.update(write.data)
+            self.coalesced += 1
+        else:
+            self._pending[write.key] = write
+        if len(self._pending) >= self.max_pending:
+            await self.flush()
+        else:
+            self._schedule()
+
+    def _next_seq(self) -> int:
+        self._seq += 1
+        return self._seq
+
+    def _schedule(self):
+        if not self._closing and (self._timer is None or self._timer.done()):
+            self._timer = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_seconds)
+        await self.flush()
+        # Keep retrying spooled writes while there are any
+        while not self._closing and await asyncio.to_thread(len, self.spool):
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    def _lock(self) -> asyncio.Lock:
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        return self._flush_lock
+
+    async def _write_through(self, write: PendingWrite):
+        async with self._lock():
+            waiting = await asyncio.to_thread(self.spool.retry_times, [write.entry_id])
+            if waiting:
+                await self._defer([write], waiting)
+            elif await self._send_or_spool(write, raise_errors=True) is None:
+                return
+        self._schedule()
+
+    async def _defer(self, writes: List[PendingWrite], waiting: Dict[int, float]):
+        """Spool new writes behind their entry's spooled ones, due when those are."""
+        by_entry: Dict[int, List[PendingWrite]] = {}
+        for write in writes:
+            by_entry.setdefault(write.entry_id, []).append(write)
+        for entry_id, entry_writes in by_entry.items():
+            await asyncio.to_thread(
+                self.spool.put, entry_writes, waiting[entry_id], "waiting for an earlier write of this entry"
+            )
+
+    async def flush(self) -> Dict[str, int]:
+        """Send everything buffered plus spooled writes that are due; failures go to the spool.
+
+        Spooled writes of an entry are retried together, and an entry's newer
+        writes wait in the spool behind its older ones until they are due, so
+        an entry's status never moves backwards and backoff is respected.
+        """
+        async with self._lock():
+            batch = list(self._pending.values())
+            self._pending = OrderedDict()
+            # Writes this flush is responsible for until they are delivered or spooled
+            writes: Dict[str, PendingWrite] = OrderedDict((write.key, write) for write in batch)
+            in_flight: Dict[str, PendingWrite] = {}
+            delivered: List[str] = []
+            sent_before, failed_before = self.sent, self.failed
+            try:
+                spooled = await asyncio.to_thread(self.spool.due, time.time())
+                due_entries = {write.entry_id for write in spooled}
+                waiting = await asyncio.to_thread(
+                    self.spool.retry_times, {write.entry_id for write in batch} - due_entries
+                )
+                if waiting:
+                    deferred = [write for write in batch if write.entry_id in waiting]
+                    await self._defer(deferred, waiting)
+                    for write in deferred:
+                        del writes[write.key]
+                for write in spooled:
+                    newer = writes.get(write.key)
+                    if newer is not None:
+                        # Newer fields over the spooled ones; keep the older position and attempt count
+                        write.data.update(newer.data)
+                    writes[write.key] = write
+                if not writes:
+                    return {'sent': 0, 'failed': 0}
+
+                # One entry's writes go out in submission order
+                by_entry: Dict[int, List[PendingWrite]] = {}
+                for write in sorted(writes.values(), key=lambda w: w.seq):
+                    by_entry.setdefault(write.entry_id, []).append(write)
+                semaphore = asyncio.Semaphore(self.concurrency)
+
+                async def write_entry(entry_writes: List[PendingWrite]):
+                    async with semaphore:
+                        done = []
+                        for i, write in enumerate(entry_writes):
+                            in_flight[write.key] = write
+                            retry_at = await self._send_or_spool(write)
+                            del in_flight[write.key]
+                            del writes[write.key]
+                            if retry_at is not None:
+                                # Later writes wait behind the failed one
+                                later = entry_writes[i + 1:]
+                                await asyncio.to_thread(
+                                    self.spool.put, later, retry_at, "waiting for an earlier write of this entry"
+                                )
+                                for other in later:
+                                    del writes[other.key]
+                                break
+                            done.append(write.key)
+                            delivered.append(write.key)
+                        if done:
+                            await asyncio.to_thread(self.spool.remove, done)
+                            for key in done:
+                                delivered.remove(key)
+
+                await asyncio.gather(*(write_entry(entry_writes) for entry_writes in by_entry.values()))
+            except asyncio.CancelledError:
+                self._requeue_cancelled(writes, in_flight, delivered)
+                raise
+            return {'sent': self.sent - sent_before, 'failed': self.failed - failed_before}
+
+    def _requeue_cancelled(self, writes: Dict[str, PendingWrite], in_flight: Dict[str, PendingWrite],
+                           delivered: List[str]):
+        """Spool what a cancelled flush did not finish (synchronously: the task is going away)."""
+        requeue = []
+        dropped = list(delivered)
+        for key, write in writes.items():
+            if key in in_flight and not write.idempotent:
+                # It may already have reached the backend; re-sending could duplicate the record
+                self.dropped += 1
+                dropped.append(key)
+                logger.error(f"{write.endpoint} POST for entry {write.entry_id} was interrupted; not retried")
+                continue
+            requeue.append(write)
+        if requeue:
+            self.spool.put(requeue, time.time(), "interrupted by shutdown")
+        if dropped:
+            self.spool.remove(dropped)
+
+    async def _send(self, write: PendingWrite):
+        await get_http_client().request_json(write.method, write.url, json=write.data)
+        self.sent += 1
+
+    async def _send_or_spool(self, write: PendingWrite, raise_errors: bool = False) -> Optional[float]:
+        """Send one write; returns its retry time if it was spooled."""
+        try:
+            await self._send(write)
+        except aiohttp.ClientResponseError as e:
+            if 400 <= e.status < 500 and e.status not in _RETRYABLE_4XX:
+                if raise_errors:
+                    raise
+                self.dropped += 1
+                logger.error(f"Backend rejected {write.endpoint} update for entry {write.entry_id} ({e.status}); dropping it")
+                await asyncio.to_thread(self.spool.remove, [write.key])
+                return None
+            return await self._spool(write, e, raise_errors)
+        except Exception as e:
+            return await self._spool(write, e, raise_errors)
+        return None
+
+    async def _spool(self, write: PendingWrite, error: Exception, raise_errors: bool) -> Optional[float]:
+        self.failed += 1
+        if not write.idempotent:
+            if raise_errors:
+                raise error
+            self.dropped += 1
+            logger.error(f"{write.endpoint} POST for entry {write.entry_id} failed and is not retried: {error}")
+            # It may have been waiting in the spool behind an earlier write
+            await asyncio.to_thread(self.spool.remove, [write.key])
+            return None
+        write.attempts += 1
+        delay = min(self.retry_max_seconds, self.retry_seconds * 2 ** (write.attempts - 1))
+        retry_at = time.time() + delay
+        await asyncio.to_thread(self.spool.put, [write], retry_at, str(error))
+        logger.warning(f"{write.endpoint} update for entry {write.entry_id} failed "
+                       f"(attempt {write.attempts}), retrying in {delay:.1f}s: {error}")
+        return retry_at
+
+    async def close(self):
+        """Flush the buffer, waiting for a flush in progress; anything that still fails stays spooled."""
+        self._closing = True
+        timer, self._timer = self._timer, None
+        if timer is not None and not timer.done():
+            if self._flush_lock is not None and self._flush_lock.locked():
+                # Mid-flush: let it finish rather than abandon the writes it holds
+                await asyncio.gather(timer, return_exceptions=True)
+            else:
+                timer.cancel()
+                await asyncio.gather(timer, return_exceptions=True)
+        await self.flush()
+        self._closing = False
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'submitted': self.submitted,
+            'coalesced': self.coalesced,
+            'sent': self.sent,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'pending': len(self._pending),
+            'spooled': len(self.spool)
+        }
+
+_writer: Optional[BackendWriter] = None
+
+def get_backend_writer() -> BackendWriter:
+    """Return the process-wide shared `BackendWriter`."""
+    global _writer
+    if _writer is None:
+        _writer = BackendWriter()
+    return _writer
+
+async def flush_backend_writer():
+    """Flush buffered backend writes (call on agent shutdown)."""
+    if _writer is not None:
+        await _writer.close()
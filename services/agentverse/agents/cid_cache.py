@@ -0,0 +1,263 @@
+"""CID Cache
+
+Content-addressed on-disk cache for IPFS media. CIDs are immutable, so a file
+fetched once can be served forever; the cache only has to bound its disk use.
+Entries are evicted least-recently-used first once the size budget is
+exceeded, written atomically (temp file + rename), and their SHA-256 is checked
+on every read so a corrupted file is dropped instead of transcribed.
+
+Readers get their own hard link to the cached object (an owned `MediaFile`),
+so evicting or replacing an entry never deletes a file that is still being
+read; the disk space is freed when the last reader cleans up. Temp files left
+by interrupted downloads and links left by dead processes are removed when
+the cache is opened.
+
+Env:
+- CID_CACHE_DIR: Cache directory (default <tmp>/afriverse-cid-cache)
+- CID_CACHE_MAX_BYTES: Size budget in bytes, 0 disables the cache (default 10737418240, 10GB)
+- CID_CACHE_VERIFY: Verify SHA-256 on read, "0" to skip (default 1)
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from agents.media import MediaFile
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+_CID_PATTERN = re.compile(r"^[A-Za-z0-9]+$")
+# Temp files untouched for this long belong to downloads that died
+STALE_TMP_SECONDS = 3600
+
+class CIDCache:
+    """LRU-bounded, hash-verified on-disk cache of IPFS content keyed by CID."""
+    def __init__(self, root: str = None, max_bytes: int = None, verify: bool = None):
+        self.root = root or os.getenv(
+            "CID_CACHE_DIR", os.path.join(tempfile.gettempdir(), "afriverse-cid-cache")
+        )
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv("CID_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES))
+        )
+        self.verify = verify if verify is not None else os.getenv("CID_CACHE_VERIFY", "1") != "0"
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.tmp_dir = os.path.join(self.root, "tmp")
+        self.links_dir = os.path.join(self.root, "links")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        os.makedirs(self.links_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.corrupt = 0
+        self.evictions = 0
+        self._sweep()
+        self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _meta_path(self, cid: str) -> str:
+        return os.path.join(self.objects_dir, f"{cid}.json")
+
+    def _sweep(self):
+        """Delete temp files of crashed writes and reader links of dead processes."""
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+            except OSError:
+                continue
+        for name in os.listdir(self.links_dir):
+            pid = name.split("-", 1)[0]
+            if pid.isdigit() and _pid_alive(int(pid)):
+                continue
+            try:
+                os.unlink(os.path.join(self.links_dir, name))
+            except OSError:
+                continue
+
+    def _load_index(self):
+        """Rebuild the LRU order from metadata files, oldest access first."""
+        found = []
+        for name in os.listdir(self.objects_dir):
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.objects_dir, name)
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                object_path = os.path.join(self.objects_dir, meta["filename"])
+                found.append((os.path.getmtime(meta_path), meta["cid"], meta, object_path))
+            except (OSError, ValueError, KeyError):
+                continue
+        for _, cid, meta, object_path in sorted(found, key=lambda item: item[0]):
+            if os.path.exists(object_path):
+                self._entries[cid] = meta
+                self._total_bytes += meta["size"]
+
+    def _sha256_file(self, path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, cid: str) -> Optional[MediaFile]:
+        """Return a reader link to the cached file for `cid`, or None on a miss or failed hash check."""
+        with self._lock:
+            meta = self._entries.get(cid)
+            if meta is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cid)
+            link = self._link(meta)
+
+        # Verify our own link: eviction or a re-put cannot change it underneath us
+        if link is None or (self.verify and self._sha256_file(link) != meta["sha256"]):
+            if link is not None:
+                _unlink(link)
+            with self._lock:
+                self.corrupt += 1
+                self.misses += 1
+                self._remove(cid, meta)
+            return None
+
+        try:
+            now = time.time()
+            os.utime(self._meta_path(cid), (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return MediaFile(link, meta["size"], meta["sha256"], meta.get("content_type"))
+
+    def put(self, cid: str, media: MediaFile) -> MediaFile:
+        """Move a freshly downloaded file into the cache and return a reader link to it."""
+        if not _CID_PATTERN.match(cid):
+            raise ValueError(f"Invalid CID: {cid!r}")
+
+        filename = cid + os.path.splitext(media.path)[1]
+        object_path = os.path.join(self.objects_dir, filename)
+        meta = {
+            "cid": cid,
+            "filename": filename,
+            "size": media.size,
+            "sha256": media.sha256,
+            "content_type": media.content_type
+        }
+
+        fd, meta_tmp = tempfile.mkstemp(suffix=".json", dir=self.tmp_dir)
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+
+        with self._lock:
+            # Renames happen under the lock so a concurrent eviction of the
+            # previous entry cannot delete the new file
+            os.replace(media.path, object_path)
+            os.replace(meta_tmp, self._meta_path(cid))
+            previous = self._entries.pop(cid, None)
+            if previous is not None:
+                self._total_bytes -= previous["size"]
+                if previous["filename"] != filename:
+                    _unlink(os.path.join(self.objects_dir, previous["filename"]))
+            self._entries[cid] = meta
+            self._total_bytes += meta["size"]
+            link = self._link(meta)
+            self._evict()
+
+        if link is None:
+            raise OSError(f"Cached object for {cid} disappeared")
+        return MediaFile(link, media.size, media.sha256, media.content_type)
+
+    def _link(self, meta: Dict[str, Any]) -> Optional[str]:
+        """Give a reader its own hard link (or copy) of an object (lock held); None if it is gone."""
+        source = os.path.join(self.objects_dir, meta["filename"])
+        link = os.path.join(
+            self.links_dir, f"{os.getpid()}-{uuid.uuid4().hex}{os.path.splitext(meta['filename'])[1]}"
+        )
+        try:
+            os.link(source, link)
+        except FileNotFoundError:
+            return None
+        except OSError:
+            # Filesystem without hard links
+            try:
+                shutil.copyfile(source, link)
+            except FileNotFoundError:
+                return None
+        return link
+
+    def _evict(self):
+        """Drop least-recently-used entries until the size budget is met (lock held)."""
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            cid = next(iter(self._entries))
+            self._remove(cid)
+            self.evictions += 1
+
+    def _remove(self, cid: str, meta: Dict[str, Any] = None):
+        """Forget an entry and delete its files (lock held).
+
+        With `meta`, only that exact entry is removed, so a reader that found
+        a corrupt file cannot delete a fresh one a concurrent `put` stored.
+        """
+        current = self._entries.get(cid)
+        if current is None or (meta is not None and current is not meta):
+            return
+        del self._entries[cid]
+        self._total_bytes -= current["size"]
+        _unlink(os.path.join(self.objects_dir, current["filename"]))
+        _unlink(self._meta_path(cid))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current disk usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "corrupt": self.corrupt,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+_cache: Optional[CIDCache] = None
+
+def get_cid_cache() -> CIDCache:
+    """Return the process-wide shared `CIDCache`."""
+    global _cache
+    if _cache is None:
+        _cache = CIDCache()
+    return _cache
@@ -0,0 +1,177 @@
+"""Circuit Breakers
+
+Per-dependency circuit breakers used to route work away from degraded
+services. A breaker opens when the failure rate over a rolling time window
+crosses a threshold, rejects calls while open, and after a cool-down lets a
+limited number of half-open probe calls through to decide whether to close
+again. `BreakerGroup` keeps one breaker per dependency and orders the
+available ones by failure rate, then latency (EWMA), so callers try the best
+option first and skip open ones without paying their timeout.
+
+Env:
+- BREAKER_WINDOW_SECONDS: Rolling window for the failure rate (default 60)
+- BREAKER_MIN_CALLS: Calls in the window before the rate is evaluated (default 5)
+- BREAKER_FAILURE_RATE: Failure rate that opens the breaker (default 0.5)
+- BREAKER_OPEN_SECONDS: Cool-down before half-open probes (default 30)
+- BREAKER_HALF_OPEN_PROBES: Concurrent probes allowed while half-open (default 1)
+"""
+
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker with a rolling window and half-open probes."""
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = None,
+        min_calls: int = None,
+        failure_rate: float = None,
+        open_seconds: float = None,
+        half_open_probes: int = None,
+        latency_alpha: float = 0.3
+    ):
+        self.name = name
+        self.window_seconds = window_seconds or float(os.getenv("BREAKER_WINDOW_SECONDS", "60"))
+        self.min_calls = min_calls or int(os.getenv("BREAKER_MIN_CALLS", "5"))
+        self.failure_rate = failure_rate or float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+        self.open_seconds = open_seconds or float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+        self.half_open_probes = half_open_probes or int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+        self.latency_alpha = latency_alpha
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.ewma_latency: Optional[float] = None
+        self.times_opened = 0
+        self._calls: Deque[Tuple[float, bool]] = deque()
+        self._probes_in_flight = 0
+
+    def _prune(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _refresh(self, now: float):
+        """Move an open breaker to half-open once its cool-down has elapsed."""
+        if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self._probes_in_flight = 0
+
+    def is_available(self) -> bool:
+        """Whether a call could currently be attempted (does not reserve a probe)."""
+        self._refresh(time.monotonic())
+        if self.state == CLOSED:
+            return True
+        return self.state == HALF_OPEN and self._probes_in_flight < self.half_open_probes
+
+    def try_acquire(self) -> bool:
+        """Reserve permission for one call; half-open breakers hand out limited probes."""
+        if not self.is_available():
+            return False
+        if self.state == HALF_OPEN:
+            self._probes_in_flight += 1
+        return True
+
+    def release(self):
+        """Give back a reservation whose call ended without an outcome (e.g. cancelled)."""
+        if self.state == HALF_OPEN and self._probes_in_flight > 0:
+            self._probes_in_flight -= 1
+
+    def window_failure_rate(self) -> float:
+        """Failure rate of the calls in the rolling window (0.0 with no calls)."""
+        self._prune(time.monotonic())
+        if not self._calls:
+            return 0.0
+        return sum(1 for _, ok in self._calls if not ok) / len(self._calls)
+
+    def _observe_latency(self, latency: Optional[float]):
+        if latency is None:
+            return
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency += self.latency_alpha * (latency - self.ewma_latency)
+
+    def record_success(self, latency: float = None):
+        now = time.monotonic()
+        self._observe_latency(latency)
+        if self.state == HALF_OPEN:
+            self.state = CLOSED
+            self._calls.clear()
+        self._calls.append((now, True))
+        self._prune(now)
+
+    def record_failure(self, latency: float = None):
+        now = time.monotonic()
+        # Failures are usually slow (timeouts), so they also count against latency
+        self._observe_latency(latency)
+        if self.state == HALF_OPEN:
+            self._trip(now)
+            return
+        self._calls.append((now, False))
+        self._prune(now)
+        failures = sum(1 for _, ok in self._calls if not ok)
+        if len(self._calls) >= self.min_calls and failures / len(self._calls) >= self.failure_rate:
+            self._trip(now)
+
+    def _trip(self, now: float):
+        self.state = OPEN
+        self.opened_at = now
+        self.times_opened += 1
+        self._calls.clear()
+        self._probes_in_flight = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the breaker state for health checks and metrics."""
+        self._refresh(time.monotonic())
+        failure_rate = self.window_failure_rate()
+        return {
+            "state": self.state,
+            "window_calls": len(self._calls),
+            "window_failure_rate": failure_rate,
+            "ewma_latency": self.ewma_latency,
+            "times_opened": self.times_opened
+        }
+
+class BreakerGroup:
+    """One breaker per named dependency, with health- and latency-aware ordering.
+
+    Dependencies are ranked by breaker state, then by window failure rate in
+    `failure_step` buckets. Within a bucket, measured dependencies come before
+    unmeasured ones, which keep their configured order. Each dependency's
+    preference position (index in `names`) inflates its latency score by
+    `priority_weight` per step, so the configured order wins between similar
+    engines but a clearly slower one is moved back.
+    """
+    def __init__(self, names: List[str], priority_weight: float = 0.5, failure_step: float = 0.1,
+                 **breaker_kwargs):
+        self.names = list(names)
+        self.priority_weight = priority_weight
+        self.failure_step = failure_step
+        self.breakers = {name: CircuitBreaker(name, **breaker_kwargs) for name in self.names}
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        return self.breakers[name]
+
+    def ordered(self) -> List[str]:
+        """Available dependencies: closed before half-open, then by failure rate, then weighted latency."""
+        def score(item):
+            index, name = item
+            breaker = self.breakers[name]
+            state_rank = 0 if breaker.state == CLOSED else 1
+            failure_rank = int(breaker.window_failure_rate() / self.failure_step)
+            if breaker.ewma_latency is None:
+                # Unmeasured: after measured peers with the same failure rate, in configured order
+                return (state_rank, failure_rank, 1, 0.0, index)
+            return (state_rank, failure_rank, 0, breaker.ewma_latency * (1 + self.priority_weight * index), index)
+
+        available = [(i, name) for i, name in enumerate(self.names) if self.breakers[name].is_available()]
+        return [name for _, name in sorted(available, key=score)]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
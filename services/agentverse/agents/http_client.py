@@ -0,0 +1,141 @@
+"""Shared Async HTTP Client
+
+Process-wide aiohttp session used by every agent so that HTTP calls never block
+the uAgents event loop. Connections are kept alive and pooled per host, every
+request has a timeout, and a semaphore bounds how many requests are in flight
+at once so many jobs can run concurrently inside one `Bureau`.
+
+Env:
+- HTTP_MAX_CONNECTIONS: Total pooled connections (default 100)
+- HTTP_MAX_CONNECTIONS_PER_HOST: Pooled connections per host (default 20)
+- HTTP_MAX_CONCURRENCY: Max in-flight requests across all agents (default 64)
+- HTTP_TIMEOUT_SECONDS: Total request timeout (default 120)
+- HTTP_CONNECT_TIMEOUT_SECONDS: Connect timeout (default 10)
+- HTTP_KEEPALIVE_SECONDS: Idle keep-alive time for pooled connections (default 30)
+"""
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import aiohttp
+
+class AsyncHTTPClient:
+    """Pooled, bounded aiohttp client shared by the agents of one process."""
+    def __init__(
+        self,
+        max_connections: int = None,
+        max_connections_per_host: int = None,
+        max_concurrency: int = None,
+        timeout: float = None,
+        connect_timeout: float = None,
+        keepalive: float = None
+    ):
+        self.max_connections = max_connections or int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+        self.max_connections_per_host = max_connections_per_host or int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+        self.max_concurrency = max_concurrency or int(os.getenv("HTTP_MAX_CONCURRENCY", "64"))
+        self.timeout = timeout or float(os.getenv("HTTP_TIMEOUT_SECONDS", "120"))
+        self.connect_timeout = connect_timeout or float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "10"))
+        self.keepalive = keepalive or float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30"))
+
+        # A session and its semaphore are bound to the loop that created them,
+        # so each loop (successive asyncio.run calls, agents on other threads) gets its own
+        self._sessions: Dict[asyncio.AbstractEventLoop, Tuple[aiohttp.ClientSession, asyncio.Semaphore]] = {}
+
+    def _get_session(self) -> Tuple[aiohttp.ClientSession, asyncio.Semaphore]:
+        """Return the running loop's pooled session and semaphore, creating them lazily."""
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.get(loop)
+        if entry is None or entry[0].closed:
+            # Forget sessions of loops that are gone; their connections died with the loop
+            for stale in [other for other in self._sessions if other.is_closed()]:
+                del self._sessions[stale]
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=self.keepalive,
+                ttl_dns_cache=300
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=self.connect_timeout)
+            )
+            entry = (session, asyncio.Semaphore(self.max_concurrency))
+            self._sessions[loop] = entry
+        return entry
+
+    @asynccontextmanager
+    async def request(
+        self,
+        method: str,
+        url: str,
+        raise_for_status: bool = True,
+        **kwargs
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Open a bounded request and yield the response for streaming reads."""
+        session, semaphore = self._get_session()
+        async with semaphore:
+            async with session.request(method, url, **kwargs) as response:
+                if raise_for_status:
+                    response.raise_for_status()
+                yield response
+
+    async def request_json(self, method: str, url: str, **kwargs) -> Any:
+        """Send a request and decode the JSON body (empty body -> {})."""
+        async with self.request(method, url, **kwargs) as response:
+            text = await response.text()
+            return json.loads(text) if text else {}
+
+    async def get_json(self, url: str, **kwargs) -> Any:
+        """GET a URL and return its decoded JSON body."""
+        return await self.request_json("GET", url, **kwargs)
+
+    async def post_json(self, url: str, **kwargs) -> Any:
+        """POST to a URL and return its decoded JSON body."""
+        return await self.request_json("POST", url, **kwargs)
+
+    async def patch_json(self, url: str, **kwargs) -> Any:
+        """PATCH a URL and return its decoded JSON body."""
+        return await self.request_json("PATCH", url, **kwargs)
+
+    async def get_bytes(self, url: str, **kwargs) -> bytes:
+        """GET a URL and return the raw response body."""
+        async with self.request("GET", url, **kwargs) as response:
+            return await response.read()
+
+    async def get_status(self, url: str, **kwargs) -> int:
+        """GET a URL and return its status code without raising on errors."""
+        async with self.request("GET", url, raise_for_status=False, **kwargs) as response:
+            return response.status
+
+    async def close(self):
+        """Close the pooled sessions and release their connections.
+
+        Sessions of other loops still running (on other threads) are closed on
+        their own loop.
+        """
+        current = asyncio.get_running_loop()
+        sessions, self._sessions = self._sessions, {}
+        for loop, (session, _) in sessions.items():
+            if session.closed or loop.is_closed():
+                continue
+            if loop is current:
+                await session.close()
+            elif loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+
+_client: Optional[AsyncHTTPClient] = None
+
+def get_http_client() -> AsyncHTTPClient:
+    """Return the process-wide shared `AsyncHTTPClient`."""
+    global _client
+    if _client is None:
+        _client = AsyncHTTPClient()
+    return _client
+
+async def close_http_client():
+    """Close the shared client (call on agent shutdown)."""
+    if _client is not None:
+        await _client.close()
@@ -4,14 +4,39 @@ Handles incoming submission jobs by downloading media from IPFS, invoking the
 transcription flow, and updating the backend with results. This agent is part
 of the AfriVerse services responsible for cultural knowledge ingestion.
 
+With the job queue enabled, an entry instead runs through the queued pipeline
+ingest -> transcribe -> symbolize -> validate: the ingest stage fetches the
+media into the CID cache, and the other stages run the Transcribe, Symbolizer
+and Validator agents' logic. Each stage has its own worker pool, hands its
+result to the next stage as that stage's job, and stops claiming while the
+next stage's backlog is full. The sender travels with the job, and the final
+`IngestResult` (or the error of a stage that ran out of attempts) is sent to it.
+
 Env:
 - BACKEND_URL: Base URL of AfriVerse backend API (default http://localhost:4000)
+- JOB_QUEUE_ENABLED: Queue jobs durably and process them with a worker pool per stage (default
+  false; see agents/job_queue.py for JOB_QUEUE_PATH, JOB_CONCURRENCY_<STAGE>, JOB_MAX_PENDING,
+  retries and leases)
 """
 
 from uagents import Agent, Bureau, Context, Model
-import requests
+import aiohttp
+import asyncio
 import json
 import os
+from typing import Any, Dict, List
+
+from agents.backend_writer import flush_backend_writer, get_backend_writer
+from agents.cid_cache import get_cid_cache
+from agents.http_client import get_http_client
+from agents.ipfs import MediaFile, download_from_ipfs
+from agents.job_queue import DEAD, DONE, Job, StageHandler, StageWorkerPool, get_job_queue
+from agents.symbolizer_agent import symbolizer_agent
+from agents.transcribe_agent import transcribe_agent
+from agents.validator_agent import validator_agent
+
+# Queued pipeline stages in order; each stage's result is the next stage's job payload
+PIPELINE = ['ingest', 'transcribe', 'symbolize', 'validate']
 
 class IngestJob(Model):
     """Message model: describes a unit of ingestion work.
@@ -35,6 +60,11 @@ class IngestResult(Model):
     success: bool
     transcript: str = None
     error: str = None
+    # True when the job was accepted into the durable queue; a final result follows.
+    # Resubmitting a finished entry returns its stored transcript instead.
+    queued: bool = False
+    # Validation decision, for entries that went through the queued pipeline
+    decision: str = None
 
 class IngestAgent(Agent):
     """Agent that orchestrates download->transcribe->update backend for entries."""
@@ -45,30 +75,92 @@ class IngestAgent(Agent):
             port=8001
         )
         self.backend_url = os.getenv("BACKEND_URL", "http://localhost:4000")
-        
-    @self.on_message(model=IngestJob)
+        self.job_queue = get_job_queue() if os.getenv("JOB_QUEUE_ENABLED", "false").lower() == "true" else None
+        # One pool per PIPELINE stage, created at startup
+        self.pools: List[StageWorkerPool] = []
+        # Registered here rather than with class-body decorators, where `self` does not exist
+        self.on_event("startup")(self.start_workers)
+        self.on_event("shutdown")(self.flush_writes)
+        self.on_message(model=IngestJob)(self.handle_ingest_job)
+
+    async def start_workers(self, ctx: Context):
+        """Start a worker pool per pipeline stage, resuming jobs left over from a previous run."""
+        if self.job_queue is None or self.pools:
+            return
+        handlers = {
+            'ingest': self.run_queued_job,
+            'transcribe': transcribe_agent.run_queued_job,
+            'symbolize': symbolizer_agent.run_queued_job,
+            'validate': validator_agent.run_queued_job
+        }
+        for stage, next_stage in zip(PIPELINE, PIPELINE[1:] + [None]):
+            pool = StageWorkerPool(self.job_queue, stage, self.replying(ctx, stage, handlers[stage]),
+                                   next_stage=next_stage)
+            pool.start()
+            self.pools.append(pool)
+        stats = await asyncio.to_thread(self.job_queue.stats)
+        ctx.logger.info(f"Job queue: {stats}")
+
+    def replying(self, ctx: Context, stage: str, handler: StageHandler) -> StageHandler:
+        """Wrap a stage handler to answer the job's sender through `ctx`.
+
+        The sender gets the final `IngestResult` after the last stage, or the
+        error of a stage whose job has used up its attempts.
+        """
+        async def run(job: Job) -> Dict[str, Any]:
+            sender = job.payload['sender']
+            try:
+                result = await handler(job)
+            except Exception as e:
+                if job.attempts >= job.max_attempts:
+                    await ctx.send(sender, IngestResult(entry_id=job.entry_id, success=False,
+                                                        error=f"{stage} failed: {str(e)}"))
+                raise
+            if stage == PIPELINE[-1]:
+                await ctx.send(sender, IngestResult(
+                    entry_id=job.entry_id,
+                    success=True,
+                    transcript=result.get('transcript'),
+                    decision=result.get('decision')
+                ))
+            return result
+        return run
+
+    async def flush_writes(self, ctx: Context):
+        """Stop the stage workers and flush buffered backend writes before the agent stops."""
+        for pool in self.pools:
+            await pool.stop()
+        await flush_backend_writer()
+
     async def handle_ingest_job(self, ctx: Context, sender: str, job: IngestJob):
-        """Process an ingestion job and reply with an `IngestResult`."""
+        """Process (or durably queue) an ingestion job and reply with an `IngestResult`."""
         ctx.logger.info(f"Received ingest job for entry {job.entry_id}")
-        
+
+        if self.job_queue:
+            payload = {
+                'cid': job.cid,
+                'filename': job.filename,
+                'language': job.language,
+                'content_type': job.content_type,
+                'sender': sender
+            }
+            if await asyncio.to_thread(self.job_queue.enqueue, PIPELINE[0], job.entry_id, payload):
+                if self.pools:
+                    self.pools[0].notify()
+                await ctx.send(sender, IngestResult(entry_id=job.entry_id, success=True, queued=True))
+            else:
+                await ctx.send(sender, await self.existing_job_result(job.entry_id))
+            return
+
         try:
-            # Download file from IPFS
-            file_data = await self.download_from_ipfs(job.cid)
-            
-            # Send to transcription service
-            transcript = await self.transcribe_audio(file_data, job.language)
-            
-            # Update backend with transcript
-            await self.update_backend(job.entry_id, transcript)
-            
-            # Send result
+            transcript = await self.process_entry(job.entry_id, job.cid, job.filename, job.language)
             result = IngestResult(
                 entry_id=job.entry_id,
                 success=True,
                 transcript=transcript
             )
             await ctx.send(sender, result)
-            
+
         except Exception as e:
             ctx.logger.error(f"Ingest failed for {job.entry_id}: {str(e)}")
             result = IngestResult(
@@ -77,29 +169,75 @@ class IngestAgent(Agent):
                 error=str(e)
             )
             await ctx.send(sender, result)
+
+    async def existing_job_result(self, entry_id: int) -> IngestResult:
+        """Reply for an entry that is already in the pipeline: its stored outcome, or an error."""
+        states = await asyncio.to_thread(lambda: [self.job_queue.get(stage, entry_id) for stage in PIPELINE])
+        final = states[-1]
+        if final and final['status'] == DONE:
+            result = final['result'] or {}
+            return IngestResult(entry_id=entry_id, success=True, transcript=result.get('transcript'),
+                                decision=result.get('decision'))
+        for stage, state in zip(PIPELINE, states):
+            if state and state['status'] == DEAD:
+                return IngestResult(entry_id=entry_id, success=False,
+                                    error=f"Entry {entry_id} failed at the {stage} stage: {state['last_error']}")
+        # Still queued or running; the final result goes to the original sender
+        stage = next((stage for stage, state in reversed(list(zip(PIPELINE, states))) if state), PIPELINE[0])
+        return IngestResult(
+            entry_id=entry_id,
+            success=False,
+            error=f"Entry {entry_id} is already being ingested ({stage} stage)"
+        )
+
+    async def run_queued_job(self, job: Job) -> Dict[str, Any]:
+        """Worker handler for the 'ingest' stage; returns the 'transcribe' payload.
+
+        Fetches the media into the CID cache so the transcribe stage reads it
+        from disk; with the cache disabled the transcribe stage downloads it.
+        """
+        if get_cid_cache().enabled:
+            media = await self.download_from_ipfs(job.payload['cid'], job.payload.get('filename'))
+            media.cleanup()
+        return job.payload
+
+    async def process_entry(self, entry_id: int, cid: str, filename: str, language: str) -> str:
+        """Download, transcribe and update the backend for one entry; returns the transcript."""
+        media = None
+        try:
+            # Stream file from IPFS to a spool file
+            media = await self.download_from_ipfs(cid, filename)
+
+            # Send to transcription service
+            transcript = await self.transcribe_audio(media, language)
+
+            # Update backend with transcript
+            await self.update_backend(entry_id, transcript)
+            return transcript
+        finally:
+            if media is not None:
+                media.cleanup()
+
+    async def download_from_ipfs(self, cid: str, filename: str = None) -> MediaFile:
+        """Stream the file for `cid` from IPFS to disk, keeping its extension."""
+        suffix = os.path.splitext(filename)[1] if filename else None
+        return await download_from_ipfs(cid, suffix=suffix or None)
     
-    async def download_from_ipfs(self, cid: str) -> bytes:
-        """Download file bytes from IPFS via Pinata gateway."""
-        pinata_gateway = f"https://gateway.pinata.cloud/ipfs/{cid}"
-        response = requests.get(pinata_gateway)
-        response.raise_for_status()
-        return response.content
-    
-    async def transcribe_audio(self, audio_data: bytes, language: str) -> str:
-        """Send audio to backend transcription endpoint and return transcript text."""
+    async def transcribe_audio(self, media: MediaFile, language: str) -> str:
+        """Stream audio to backend transcription endpoint and return transcript text."""
         transcription_url = f"{self.backend_url}/api/transcribe"
         
-        files = {'file': ('audio.wav', audio_data, 'audio/wav')}
-        data = {'language': language}
-        
-        response = requests.post(transcription_url, files=files, data=data)
-        response.raise_for_status()
-        
-        result = response.json()
+        with media.open() as audio_file:
+            form = aiohttp.FormData()
+            form.add_field('file', audio_file, filename='audio' + os.path.splitext(media.path)[1],
+                           content_type=media.content_type or 'audio/wav')
+            form.add_field('language', language)
+            
+            result = await get_http_client().post_json(transcription_url, data=form)
         return result.get('transcript', '')
     
     async def update_backend(self, entry_id: int, transcript: str):
-        """Update backend entry with transcription result and status."""
+        """Queue a PATCH of the transcription result and status (coalesced by the backend writer)."""
         update_url = f"{self.backend_url}/api/submit/{entry_id}/transcript"
         
         data = {
@@ -107,8 +245,7 @@ class IngestAgent(Agent):
             'status': 'transcribed'
         }
         
-        response = requests.patch(update_url, json=data)
-        response.raise_for_status()
+        await get_backend_writer().submit("PATCH", update_url, 'transcript', entry_id, data)
 
 # Create and run agent
 ingest_agent = IngestAgent()
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""IPFS Media Fetching
+
+Streams IPFS content straight to a spool file on disk instead of buffering the
+whole response in memory. Downloads are capped at a maximum size, hashed while
+they are written, and handed to later stages as a `MediaFile` (a path plus an
+optional read-only memory map) so transcription and upload never copy the
+bytes again. `download_from_ipfs` is the single entry point shared by the
+agents and serves repeat CIDs from the on-disk `CIDCache`.
+
+Gateway selection and hedging live in `agents/ipfs_gateways.py`.
+
+Env:
+- IPFS_MAX_DOWNLOAD_BYTES: Largest accepted download (default 524288000, 500MB)
+- IPFS_CHUNK_SIZE: Streaming chunk size in bytes (default 1048576)
+- MEDIA_SPOOL_DIR: Directory for spooled downloads (default system temp dir)
+- CID_CACHE_*: See `agents/cid_cache.py`
+"""
+
+import asyncio
+import hashlib
+import mimetypes
+import os
+import tempfile
+
+from agents.cid_cache import get_cid_cache
+from agents.http_client import get_http_client
+from agents.ipfs_gateways import get_gateway_pool
+from agents.media import MediaFile, spool_dir
+
+DEFAULT_MAX_DOWNLOAD_BYTES = 500 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+class MediaTooLargeError(Exception):
+    """Raised when a download exceeds the configured size cap."""
+
+def _max_download_bytes() -> int:
+    return int(os.getenv("IPFS_MAX_DOWNLOAD_BYTES", str(DEFAULT_MAX_DOWNLOAD_BYTES)))
+
+def _audio_suffix(content_type: str) -> str:
+    """File suffix for a response's content type: its own for audio types, else `.wav`.
+
+    Gateways often label media `application/octet-stream` or `text/plain`,
+    which would give decoders a `.bin`/`.txt` file.
+    """
+    if content_type and content_type.startswith("audio/"):
+        return mimetypes.guess_extension(content_type) or ".wav"
+    return ".wav"
+
+async def spool_response(response, max_bytes: int = None, suffix: str = None, dest_dir: str = None) -> MediaFile:
+    """Write an open response body to a spool file, enforcing `max_bytes`."""
+    max_bytes = max_bytes or _max_download_bytes()
+    chunk_size = int(os.getenv("IPFS_CHUNK_SIZE", str(DEFAULT_CHUNK_SIZE)))
+    url = str(response.url)
+
+    declared = response.content_length
+    if declared is not None and declared > max_bytes:
+        raise MediaTooLargeError(f"{url} is {declared} bytes (limit {max_bytes})")
+
+    content_type = response.content_type
+    if suffix is None:
+        suffix = _audio_suffix(content_type)
+
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=dest_dir or spool_dir())
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in response.content.iter_chunked(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise MediaTooLargeError(f"{url} exceeded {max_bytes} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    return MediaFile(path, size, digest.hexdigest(), content_type)
+
+async def stream_to_file(url: str, max_bytes: int = None, suffix: str = None, dest_dir: str = None) -> MediaFile:
+    """Stream a URL to a spool file, enforcing `max_bytes`, and return a `MediaFile`."""
+    async with get_http_client().request("GET", url) as response:
+        return await spool_response(response, max_bytes=max_bytes, suffix=suffix, dest_dir=dest_dir)
+
+async def fetch_from_gateway(cid: str, max_bytes: int = None, suffix: str = None, dest_dir: str = None) -> MediaFile:
+    """Stream `cid` from the fastest gateway in the pool to disk, bypassing the cache."""
+    gateway, request, response = await get_gateway_pool().open(cid)
+    try:
+        return await spool_response(response, max_bytes=max_bytes, suffix=suffix, dest_dir=dest_dir)
+    except MediaTooLargeError:
+        raise
+    except Exception:
+        get_gateway_pool().record_failure(gateway)
+        raise
+    finally:
+        await request.__aexit__(None, None, None)
+
+async def download_from_ipfs(cid: str, max_bytes: int = None, suffix: str = None) -> MediaFile:
+    """Return the content for `cid`, served from the CID cache when possible.
+
+    Either way the caller owns the returned file and must `cleanup()` it;
+    for a cached CID that only removes the caller's link to the cache entry.
+    """
+    cache = get_cid_cache()
+    if not cache.enabled:
+        return await fetch_from_gateway(cid, max_bytes=max_bytes, suffix=suffix)
+
+    cached = await asyncio.to_thread(cache.get, cid)
+    if cached is not None:
+        return cached
+
+    media = await fetch_from_gateway(cid, max_bytes=max_bytes, suffix=suffix, dest_dir=cache.tmp_dir)
+    try:
+        return cache.put(cid, media)
+    except ValueError:
+        return media
@@ -0,0 +1,243 @@
+"""IPFS Gateway Pool
+
+Fetches IPFS content from a configurable pool of gateways instead of a single
+hard-coded one. Each gateway's time-to-headers is tracked with an EWMA and the
+fastest healthy gateway is tried first. When it has not answered within the
+pool's observed p95 latency, a hedged request is sent to the next gateway and
+whichever responds first wins; the loser is cancelled. Gateways that fail
+repeatedly are benched for a cooldown period. A 404/410 means the gateway
+does not have the content, not that it is unhealthy, so the next gateway is
+tried without penalising it.
+
+Gateways are plain base URLs, so the pool can be pointed at local stub HTTP
+servers (e.g. `http://127.0.0.1:9001/ipfs`) for testing.
+
+Env:
+- IPFS_GATEWAYS: Comma-separated gateway base URLs (default Pinata, ipfs.io, dweb.link;
+  a single legacy IPFS_GATEWAY_URL is honoured when unset)
+- IPFS_HEDGE_QUANTILE: Latency quantile that triggers a hedge (default 0.95)
+- IPFS_HEDGE_DEFAULT_DELAY: Hedge delay before enough samples exist, seconds (default 1.0)
+- IPFS_GATEWAY_COOLDOWN: Seconds a failing gateway is benched (default 30)
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import aiohttp
+
+from agents.http_client import get_http_client
+
+# Statuses meaning the gateway works but does not have the content
+CONTENT_MISS_STATUSES = {404, 410}
+
+DEFAULT_GATEWAYS = [
+    "https://gateway.pinata.cloud/ipfs",
+    "https://ipfs.io/ipfs",
+    "https://dweb.link/ipfs"
+]
+
+class GatewayStats:
+    """Latency and health bookkeeping for a single gateway."""
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.ewma_latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.benched_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.misses = 0
+        self.wins = 0
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.benched_until
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "ewma_latency": self.ewma_latency,
+            "healthy": self.is_healthy(time.monotonic()),
+            "requests": self.requests,
+            "failures": self.failures,
+            "misses": self.misses,
+            "wins": self.wins
+        }
+
+class GatewayPool:
+    """Latency-ranked gateway pool with hedged requests."""
+    def __init__(
+        self,
+        gateways: List[str] = None,
+        ewma_alpha: float = 0.2,
+        hedge_quantile: float = None,
+        default_hedge_delay: float = None,
+        min_hedge_delay: float = 0.05,
+        failure_threshold: int = 3,
+        cooldown: float = None,
+        window: int = 200,
+        min_samples: int = 20
+    ):
+        if gateways is None:
+            configured = os.getenv("IPFS_GATEWAYS") or os.getenv("IPFS_GATEWAY_URL")
+            gateways = [g.strip() for g in configured.split(",") if g.strip()] if configured else DEFAULT_GATEWAYS
+        if not gateways:
+            raise ValueError("GatewayPool needs at least one gateway")
+
+        self.gateways = [GatewayStats(url) for url in gateways]
+        self.ewma_alpha = ewma_alpha
+        self.hedge_quantile = hedge_quantile or float(os.getenv("IPFS_HEDGE_QUANTILE", "0.95"))
+        self.default_hedge_delay = default_hedge_delay or float(os.getenv("IPFS_HEDGE_DEFAULT_DELAY", "1.0"))
+        self.min_hedge_delay = min_hedge_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown if cooldown is not None else float(os.getenv("IPFS_GATEWAY_COOLDOWN", "30"))
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def ranked(self) -> List[GatewayStats]:
+        """Healthy gateways fastest first (unmeasured ones first, to probe them),
+        followed by benched gateways as a last resort."""
+        now = time.monotonic()
+        healthy = [g for g in self.gateways if g.is_healthy(now)]
+        benched = sorted((g for g in self.gateways if not g.is_healthy(now)), key=lambda g: g.benched_until)
+        healthy.sort(key=lambda g: -1.0 if g.ewma_latency is None else g.ewma_latency)
+        return healthy + benched
+
+    def hedge_delay(self) -> float:
+        """Delay after which a hedged request is sent: the observed latency quantile."""
+        if len(self._latencies) < self.min_samples:
+            return self.default_hedge_delay
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, math.ceil(self.hedge_quantile * len(ordered)) - 1)
+        return max(self.min_hedge_delay, ordered[index])
+
+    def _update_ewma(self, gateway: GatewayStats, latency: float):
+        if gateway.ewma_latency is None:
+            gateway.ewma_latency = latency
+        else:
+            gateway.ewma_latency += self.ewma_alpha * (latency - gateway.ewma_latency)
+
+    def record_success(self, gateway: GatewayStats, latency: float):
+        gateway.consecutive_failures = 0
+        gateway.benched_until = 0.0
+        self._update_ewma(gateway, latency)
+        self._latencies.append(latency)
+
+    def record_failure(self, gateway: GatewayStats):
+        gateway.failures += 1
+        gateway.consecutive_failures += 1
+        if gateway.consecutive_failures >= self.failure_threshold:
+            gateway.benched_until = time.monotonic() + self.cooldown
+
+    async def _open(self, gateway: GatewayStats, cid: str):
+        """Open a request to one gateway and return it once headers arrive."""
+        gateway.requests += 1
+        started = time.monotonic()
+        request = get_http_client().request("GET", f"{gateway.url}/{cid}")
+        try:
+            response = await request.__aenter__()
+        except asyncio.CancelledError:
+            # Lost a hedge race: the elapsed time is only a lower bound on its
+            # latency, so it may raise the estimate but never lower it
+            elapsed = time.monotonic() - started
+            if gateway.ewma_latency is not None and elapsed > gateway.ewma_latency:
+                self._update_ewma(gateway, elapsed)
+            raise
+        except aiohttp.ClientResponseError as e:
+            if e.status in CONTENT_MISS_STATUSES:
+                gateway.misses += 1
+            else:
+                self.record_failure(gateway)
+            raise
+        except Exception:
+            self.record_failure(gateway)
+            raise
+        self.record_success(gateway, time.monotonic() - started)
+        return gateway, request, response
+
+    async def open(self, cid: str):
+        """Race gateways for `cid` and return `(gateway, request, response)` for the winner.
+
+        The caller owns the returned request context and must close it with
+        `await request.__aexit__(None, None, None)` after reading the body.
+        """
+        candidates = self.ranked()
+        pending: Dict[asyncio.Task, bool] = {}
+        errors = []
+        next_index = 0
+
+        def launch(hedge: bool = False):
+            nonlocal next_index
+            gateway = candidates[next_index]
+            next_index += 1
+            pending[asyncio.ensure_future(self._open(gateway, cid))] = hedge
+
+        launch()
+        try:
+            while pending:
+                can_hedge = next_index < len(candidates)
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_delay() if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Primary is slower than the hedge threshold: send a backup request
+                    self.hedges_sent += 1
+                    launch(hedge=True)
+                    continue
+
+                for task in done:
+                    hedge = pending.pop(task)
+                    if task.exception() is None:
+                        gateway, request, response = task.result()
+                        gateway.wins += 1
+                        if hedge:
+                            self.hedges_won += 1
+                        return gateway, request, response
+                    errors.append(task.exception())
+
+                if not pending and next_index < len(candidates):
+                    launch()
+        finally:
+            await self._discard(pending)
+
+        raise errors[-1] if errors else RuntimeError(f"No IPFS gateway could serve {cid}")
+
+    async def _discard(self, pending: Dict[asyncio.Task, bool]):
+        """Cancel losing requests, closing any that already got a response.
+
+        Only the losers' own errors are ignored; cancellation of the caller propagates.
+        """
+        if not pending:
+            return
+        for task in pending:
+            task.cancel()
+        try:
+            await asyncio.wait(pending)
+        finally:
+            for task in pending:
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    _, request, _ = task.result()
+                    await request.__aexit__(None, None, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedge_delay": self.hedge_delay(),
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "gateways": [g.to_dict() for g in self.ranked()]
+        }
+
+_pool: Optional[GatewayPool] = None
+
+def get_gateway_pool() -> GatewayPool:
+    """Return the process-wide shared `GatewayPool`."""
+    global _pool
+    if _pool is None:
+        _pool = GatewayPool()
+    return _pool
@@ -0,0 +1,402 @@
+"""Job Queue
+
+Durable SQLite-backed job queue for the ingest -> transcribe -> symbolize ->
+validate pipeline, plus an asyncio worker pool per stage. Jobs are unique per
+(stage, entry_id), so resubmitting a queued, running or finished entry is a
+no-op; only `dead` jobs are queued again. Workers claim jobs under a lease that
+is renewed while they run; a job whose worker died (lease expired) is claimed
+again, so in-flight work survives restarts. Only the current lease holder can
+complete or fail a job, and a worker that loses its lease abandons the job.
+Failures are retried with exponential backoff until `max_attempts`, then
+parked as `dead`. A pool that feeds another stage stops claiming while that
+stage's backlog is over a limit, which gives backpressure between stages.
+Pools run the blocking SQLite calls in a worker thread, off the event loop.
+
+Env:
+- JOB_QUEUE_PATH: SQLite file (default <tmp>/afriverse-jobs.sqlite3)
+- JOB_MAX_ATTEMPTS: Attempts before a job is marked dead (default 5)
+- JOB_BACKOFF_SECONDS: First retry delay, doubled per attempt (default 2)
+- JOB_BACKOFF_MAX_SECONDS: Retry delay cap (default 300)
+- JOB_LEASE_SECONDS: Claim lease, renewed while the job runs (default 120)
+- JOB_CONCURRENCY_<STAGE>: Workers for a stage, e.g. JOB_CONCURRENCY_INGEST (default 2)
+- JOB_MAX_PENDING: Backlog in the next stage at which a pool pauses (default 100)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+DEAD = "dead"
+
+class Job(NamedTuple):
+    """A claimed unit of work."""
+    id: int
+    stage: str
+    entry_id: int
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+    # Lease token of this claim; complete() and fail() only apply while it is current
+    worker: str
+
+class JobQueue:
+    """SQLite job table with idempotent enqueue, leased claims and retry backoff."""
+    def __init__(
+        self,
+        path: str = None,
+        max_attempts: int = None,
+        backoff_seconds: float = None,
+        backoff_max_seconds: float = None,
+        lease_seconds: float = None
+    ):
+        self.path = path or os.getenv(
+            "JOB_QUEUE_PATH", os.path.join(tempfile.gettempdir(), "afriverse-jobs.sqlite3")
+        )
+        self.max_attempts = max_attempts or int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+        self.backoff_seconds = backoff_seconds if backoff_seconds is not None else float(
+            os.getenv("JOB_BACKOFF_SECONDS", "2")
+        )
+        self.backoff_max_seconds = backoff_max_seconds if backoff_max_seconds is not None else float(
+            os.getenv("JOB_BACKOFF_MAX_SECONDS", "300")
+        )
+        self.lease_seconds = lease_seconds or float(os.getenv("JOB_LEASE_SECONDS", "120"))
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                stage TEXT NOT NULL,
+                entry_id INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                available_at REAL NOT NULL,
+                lease_until REAL,
+                worker TEXT,
+                last_error TEXT,
+                result TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (stage, entry_id)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (stage, status, available_at)")
+
+    @contextmanager
+    def _transaction(self):
+        """Serialize writers in-process and take SQLite's write lock up front."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def enqueue(self, stage: str, entry_id: int, payload: Dict[str, Any], max_attempts: int = None) -> bool:
+        """Queue a job; returns False if (stage, entry_id) is already queued, running or done.
+
+        A `dead` job is queued again with the new payload and a fresh attempt budget.
+        """
+        with self._transaction() as conn:
+            return self._insert(conn, stage, entry_id, payload, max_attempts)
+
+    def _insert(self, conn, stage: str, entry_id: int, payload: Dict[str, Any], max_attempts: int = None) -> bool:
+        now = time.time()
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO jobs (stage, entry_id, payload, status, max_attempts, available_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (stage, entry_id, json.dumps(payload), QUEUED, max_attempts or self.max_attempts, now, now, now)
+        )
+        if cursor.rowcount == 1:
+            return True
+        cursor = conn.execute(
+            "UPDATE jobs SET payload = ?, status = ?, attempts = 0, max_attempts = ?, available_at = ?, "
+            "lease_until = NULL, worker = NULL, updated_at = ? WHERE stage = ? AND entry_id = ? AND status = ?",
+            (json.dumps(payload), QUEUED, max_attempts or self.max_attempts, now, now, stage, entry_id, DEAD)
+        )
+        return cursor.rowcount == 1
+
+    def claim(self, stage: str, worker: str) -> Optional[Job]:
+        """Lease the next due job of `stage`, including jobs whose previous lease expired."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, entry_id, payload, attempts, max_attempts FROM jobs "
+                "WHERE stage = ? AND ((status = ? AND available_at <= ?) OR (status = ? AND lease_until < ?)) "
+                "ORDER BY available_at, id LIMIT 1",
+                (stage, QUEUED, now, RUNNING, now)
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, entry_id, payload, attempts, max_attempts = row
+            # Unique per claim, so a worker that reclaims its own expired job gets a new lease
+            lease = f"{worker}#{attempts + 1}"
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, lease_until = ?, worker = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, attempts + 1, now + self.lease_seconds, lease, now, job_id)
+            )
+        return Job(job_id, stage, entry_id, json.loads(payload), attempts + 1, max_attempts, lease)
+
+    def renew(self, job: Job) -> bool:
+        """Extend the lease of a running job; False if another worker took it over."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND status = ? AND worker = ?",
+                (now + self.lease_seconds, now, job.id, RUNNING, job.worker)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job: Job, result: Dict[str, Any] = None, next_stage: str = None,
+                 next_payload: Dict[str, Any] = None) -> bool:
+        """Mark a job done and, in the same transaction, queue its follow-up stage.
+
+        Returns False (and changes nothing) if the caller no longer holds the lease.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, lease_until = NULL, last_error = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND worker = ?",
+                (DONE, json.dumps(result) if result is not None else None, now, job.id, RUNNING, job.worker)
+            )
+            if cursor.rowcount != 1:
+                return False
+            if next_stage and next_payload is not None:
+                self._insert(conn, next_stage, job.entry_id, next_payload)
+        return True
+
+    def fail(self, job: Job, error: str) -> Optional[str]:
+        """Schedule a retry with exponential backoff, or mark the job dead.
+
+        Returns the new status, or None if the caller no longer holds the lease.
+        """
+        now = time.time()
+        if job.attempts >= job.max_attempts:
+            status, available_at = DEAD, now
+        else:
+            delay = min(self.backoff_max_seconds, self.backoff_seconds * 2 ** (job.attempts - 1))
+            status, available_at = QUEUED, now + delay * random.uniform(0.8, 1.2)
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, lease_until = NULL, last_error = ?, updated_at = ? "
+                "WHERE id = ? AND status = ? AND worker = ?",
+                (status, available_at, error, now, job.id, RUNNING, job.worker)
+            )
+            if cursor.rowcount != 1:
+                return None
+        return status
+
+    def retry_dead(self, stage: str, entry_id: int = None) -> int:
+        """Put dead jobs back in the queue with a fresh attempt budget."""
+        now = time.time()
+        query = "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, updated_at = ? WHERE stage = ? AND status = ?"
+        params: List[Any] = [QUEUED, now, now, stage, DEAD]
+        if entry_id is not None:
+            query += " AND entry_id = ?"
+            params.append(entry_id)
+        with self._transaction() as conn:
+            return conn.execute(query, params).rowcount
+
+    def depth(self, stage: str) -> int:
+        """Jobs of `stage` waiting or running (the backlog used for backpressure)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE stage = ? AND status IN (?, ?)", (stage, QUEUED, RUNNING)
+            ).fetchone()[0]
+
+    def get(self, stage: str, entry_id: int) -> Optional[Dict[str, Any]]:
+        """Current state of the job for (stage, entry_id)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, attempts, last_error, result FROM jobs WHERE stage = ? AND entry_id = ?",
+                (stage, entry_id)
+            ).fetchone()
+        if row is None:
+            return None
+        status, attempts, last_error, result = row
+        return {
+            'status': status,
+            'attempts': attempts,
+            'last_error': last_error,
+            'result': json.loads(result) if result else None
+        }
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Job counts per stage and status."""
+        with self._lock:
+            rows = self._conn.execute("SELECT stage, status, COUNT(*) FROM jobs GROUP BY stage, status").fetchall()
+        counts: Dict[str, Dict[str, int]] = {}
+        for stage, status, count in rows:
+            counts.setdefault(stage, {})[status] = count
+        return counts
+
+# Handler result: stored with the job and, for a pool with a `next_stage`, that stage's payload
+StageHandler = Callable[[Job], Awaitable[Optional[Dict[str, Any]]]]
+
+class StageWorkerPool:
+    """Bounded pool of asyncio workers draining one stage of a `JobQueue`."""
+    def __init__(
+        self,
+        queue: JobQueue,
+        stage: str,
+        handler: StageHandler,
+        concurrency: int = None,
+        next_stage: str = None,
+        max_pending: int = None,
+        poll_interval: float = 1.0
+    ):
+        self.queue = queue
+        self.stage = stage
+        self.handler = handler
+        self.concurrency = concurrency or int(os.getenv(f"JOB_CONCURRENCY_{stage.upper()}", "2"))
+        self.next_stage = next_stage
+        self.max_pending = max_pending or int(os.getenv("JOB_MAX_PENDING", "100"))
+        self.poll_interval = poll_interval
+        self.worker_id = f"{stage}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.processed = 0
+        self.failed = 0
+        self.lost_leases = 0
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self):
+        """Spawn the workers on the running event loop (idempotent)."""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._worker(i)) for i in range(self.concurrency)]
+
+    def notify(self):
+        """Wake idle workers after enqueueing instead of waiting for the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self):
+        """Cancel the workers; running jobs keep their lease and are retried after it expires."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _idle(self):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _worker(self, index: int):
+        worker = f"{self.worker_id}-{index}"
+        errors = 0
+        while True:
+            try:
+                if self.next_stage and await asyncio.to_thread(self.queue.depth, self.next_stage) >= self.max_pending:
+                    # Backpressure: let the downstream stage catch up
+                    await self._idle()
+                    continue
+                job = await asyncio.to_thread(self.queue.claim, self.stage, worker)
+                errors = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # e.g. the database is locked by another process; keep the worker alive
+                errors += 1
+                delay = min(60.0, self.poll_interval * 2 ** errors)
+                logger.error(f"{self.stage} worker could not claim a job, retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                continue
+            if job is None:
+                await self._idle()
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Job):
+        handler = asyncio.ensure_future(self.handler(job))
+        heartbeat = asyncio.ensure_future(self._heartbeat(job, handler))
+        try:
+            try:
+                result = await handler
+            except asyncio.CancelledError:
+                if heartbeat.done() and not heartbeat.cancelled() and heartbeat.result() is False:
+                    self.lost_leases += 1
+                    logger.warning(f"{self.stage} job for entry {job.entry_id} lost its lease; abandoned")
+                    return
+                raise
+            except Exception as e:
+                status = await asyncio.to_thread(self.queue.fail, job, str(e))
+                self.failed += 1
+                if status is None:
+                    self.lost_leases += 1
+                    logger.warning(f"{self.stage} job for entry {job.entry_id} failed after losing its lease: {e}")
+                else:
+                    logger.warning(f"{self.stage} job for entry {job.entry_id} failed "
+                                   f"(attempt {job.attempts}/{job.max_attempts}, now {status}): {e}")
+                return
+            completed = await asyncio.to_thread(
+                self.queue.complete, job, result,
+                next_stage=self.next_stage, next_payload=result
+            )
+            if completed:
+                self.processed += 1
+            else:
+                self.lost_leases += 1
+                logger.warning(f"{self.stage} job for entry {job.entry_id} finished after losing its lease; "
+                               f"result discarded")
+        finally:
+            heartbeat.cancel()
+            handler.cancel()
+
+    async def _heartbeat(self, job: Job, handler: asyncio.Future) -> bool:
+        """Renew the lease while the handler runs; cancel the handler once it is lost."""
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                renewed = await asyncio.to_thread(self.queue.renew, job)
+            except Exception as e:
+                logger.warning(f"Could not renew lease of {self.stage} job for entry {job.entry_id}: {e}")
+                continue
+            if not renewed:
+                handler.cancel()
+                return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'stage': self.stage,
+            'workers': len(self._tasks),
+            'processed': self.processed,
+            'failed': self.failed,
+            'lost_leases': self.lost_leases,
+            'depth': self.queue.depth(self.stage)
+        }
+
+_queue: Optional[JobQueue] = None
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide shared `JobQueue`."""
+    global _queue
+    if _queue is None:
+        _queue = JobQueue()
+    return _queue
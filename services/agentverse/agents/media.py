@@ -0,0 +1,73 @@
+"""Media Files
+
+`MediaFile` is the hand-off type between the download, cache, transcription
+and upload stages: a file spooled to disk, its size and SHA-256, and whether
+the holder is responsible for deleting it.
+
+Env:
+- MEDIA_SPOOL_DIR: Directory for spooled media (default system temp dir)
+"""
+
+import hashlib
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional
+
+class MediaFile:
+    """A media file spooled to disk and passed between stages by path."""
+    def __init__(self, path: str, size: int, sha256: str, content_type: str = None, owned: bool = True):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.content_type = content_type
+        self.owned = owned
+
+    @classmethod
+    def from_bytes(cls, data: bytes, suffix: str = ".wav", content_type: str = None) -> "MediaFile":
+        """Spool a small in-memory payload (health checks, tests) to disk."""
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=spool_dir())
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return cls(path, len(data), hashlib.sha256(data).hexdigest(), content_type)
+
+    def open(self) -> BinaryIO:
+        """Open the file for streaming reads (e.g. as an upload body)."""
+        return open(self.path, "rb")
+
+    @contextmanager
+    def buffer(self) -> Iterator[memoryview]:
+        """Yield a zero-copy read-only view of the file contents."""
+        if self.size == 0:
+            yield memoryview(b"")
+            return
+        with open(self.path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(mapped)
+            try:
+                yield view
+            finally:
+                view.release()
+                mapped.close()
+
+    def cleanup(self):
+        """Delete the spooled file if this handle owns it."""
+        if self.owned:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self) -> "MediaFile":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+def spool_dir() -> Optional[str]:
+    """Return the configured spool directory, creating it if needed."""
+    path = os.getenv("MEDIA_SPOOL_DIR")
+    if path:
+        os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,44 @@
+"""Shared MeTTa Pool
+
+Process-wide `MeTTaClientPool` shared by the agents of one process: the Query
+Agent answers pattern queries from its reader replicas and the Orchestrator
+Agent loads approved atoms through its single writer, so only one client owns
+the snapshot directory. The pool is created on first use, so agents start
+(and run without MeTTa) when services/metta-integration or hyperon is missing.
+
+Env:
+- METTA_LOCAL_POOL_SIZE: Reader replicas (default 0; the pool is still created
+  with one reader when an agent needs it for loading)
+- METTA_SNAPSHOT_DIR: Snapshot directory the pool's writer restores and appends to
+"""
+
+import logging
+import os
+import threading
+from typing import Optional
+
+try:
+    from client_pool import MeTTaClientPool
+except ImportError:
+    MeTTaClientPool = None
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional["MeTTaClientPool"] = None
+_pool_lock = threading.Lock()
+
+def metta_available() -> bool:
+    """Whether services/metta-integration is importable."""
+    return MeTTaClientPool is not None
+
+def get_metta_pool() -> Optional["MeTTaClientPool"]:
+    """Return the process-wide shared pool, creating it on first use (None without MeTTa)."""
+    global _pool
+    if MeTTaClientPool is None:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            size = max(1, int(os.getenv("METTA_LOCAL_POOL_SIZE", "0")))
+            _pool = MeTTaClientPool(size)
+            logger.info(f"Created shared MeTTa pool with {size} reader(s)")
+        return _pool
@@ -0,0 +1,246 @@
+"""Orchestrator Agent
+
+Runs the whole ingestion pipeline for an `IngestJob` in one process:
+download -> transcribe -> symbolize -> validate -> load into MeTTa -> persist.
+Stages hand each other the spooled media, transcript and atom lists in memory
+and reuse the other agents' logic directly (engines, caches and circuit
+breakers of the Transcribe Agent, atom repair of the Symbolizer, checks of the
+Validator) instead of messaging them or round-tripping through the backend.
+Backend updates are written once the entry has been processed. Every run
+reports per-stage latency, and running totals are logged periodically.
+
+Env:
+- BACKEND_URL: Backend base URL (default http://localhost:4000)
+- PIPELINE_LOAD_METTA: Load approved atoms through the shared MeTTa pool
+  (`agents/metta_pool.py`) when services/metta-integration is importable (default true)
+- PIPELINE_PERSIST: Write transcript, atoms and validation to the backend (default true)
+"""
+
+from uagents import Agent, Context, Model
+import os
+import time
+from typing import Any, Dict, List
+
+from agents.ingest_agent import IngestJob
+from agents.ipfs import download_from_ipfs
+from agents.metta_pool import get_metta_pool, metta_available
+from agents.symbolizer_agent import symbolizer_agent
+from agents.transcribe_agent import transcribe_agent
+from agents.validator_agent import validator_agent
+
+STAGES = ["download", "transcribe", "symbolize", "validate", "load", "persist"]
+
+class PipelineResult(Model):
+    """Message model: outcome of a full pipeline run with per-stage latency in ms."""
+    entry_id: int
+    success: bool
+    transcript: str = None
+    atoms: List[str] = []
+    approved_atoms: List[str] = []
+    decision: str = None
+    confidence: float = 0.0
+    loaded: int = 0
+    loaded_atoms: List[str] = []
+    load_failed: List[str] = []
+    load_error: str = None
+    stage_ms: Dict[str, float] = {}
+    failed_stage: str = None
+    error: str = None
+
+class StageTimer:
+    """Times pipeline stages for one run and accumulates totals across runs."""
+    def __init__(self):
+        self.runs = 0
+        self.totals: Dict[str, float] = {stage: 0.0 for stage in STAGES}
+        self.maxima: Dict[str, float] = {stage: 0.0 for stage in STAGES}
+
+    def record(self, stage_ms: Dict[str, float]):
+        self.runs += 1
+        for stage, ms in stage_ms.items():
+            self.totals[stage] += ms
+            self.maxima[stage] = max(self.maxima[stage], ms)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Mean and max latency (ms) per stage over all recorded runs."""
+        return {
+            stage: {
+                'mean_ms': round(self.totals[stage] / self.runs, 1) if self.runs else 0.0,
+                'max_ms': round(self.maxima[stage], 1)
+            }
+            for stage in STAGES
+        }
+
+class OrchestratorAgent(Agent):
+    """Agent that chains transcribe, symbolize, validate and MeTTa loading in-process."""
+    def __init__(self):
+        super().__init__(
+            name="orchestrator_agent",
+            seed="orchestrator_agent_recovery_phrase_afriverse",
+            port=8006
+        )
+        self.backend_url = os.getenv("BACKEND_URL", "http://localhost:4000")
+        self.persist = os.getenv("PIPELINE_PERSIST", "true").lower() == "true"
+        # The pool itself is created on the first load, not at import time
+        self.load_metta = metta_available() and os.getenv("PIPELINE_LOAD_METTA", "true").lower() == "true"
+        self.timer = StageTimer()
+        # Registered here rather than with class-body decorators, where `self` does not exist
+        self.on_message(model=IngestJob)(self.handle_ingest_job)
+        self.on_interval(period=60.0)(self.report_latency)
+
+    async def handle_ingest_job(self, ctx: Context, sender: str, job: IngestJob):
+        """Run the full pipeline for an entry and reply with a `PipelineResult`."""
+        ctx.logger.info(f"Running pipeline for entry {job.entry_id}")
+        result = await self.run_pipeline(job)
+        if result.load_error:
+            ctx.logger.warning(f"MeTTa load for entry {job.entry_id} added {len(result.loaded_atoms)} atom(s), "
+                               f"not {len(result.load_failed)}: {result.load_error}")
+        if result.success:
+            ctx.logger.info(f"Pipeline for entry {job.entry_id} done: {result.stage_ms}")
+        else:
+            ctx.logger.error(f"Pipeline failed for {job.entry_id} at {result.failed_stage}: {result.error}")
+        await ctx.send(sender, result)
+
+    async def run_pipeline(self, job: IngestJob, context: Dict[str, Any] = None) -> PipelineResult:
+        """Process one entry through every stage, stopping at the first failure."""
+        context = dict(context or {})
+        context.setdefault('entry_id', job.entry_id)
+        context.setdefault('community', 'general')
+        context.setdefault('language', job.language)
+        stage_ms: Dict[str, float] = {}
+        state: Dict[str, Any] = {
+            'entry_id': job.entry_id, 'atoms': [], 'approved_atoms': [],
+            'load': {'added': [], 'failed': [], 'error': None}
+        }
+        stage = None
+        media = None
+        try:
+            stage = "download"
+            started = time.perf_counter()
+            suffix = os.path.splitext(job.filename)[1] if job.filename else None
+            media = await download_from_ipfs(job.cid, suffix=suffix or None)
+            stage_ms[stage] = _elapsed_ms(started)
+
+            stage = "transcribe"
+            started = time.perf_counter()
+            transcription = await transcribe_agent.transcribe_audio(media, job.language)
+            state['transcription'] = transcription
+            stage_ms[stage] = _elapsed_ms(started)
+            media.cleanup()
+            media = None
+
+            stage = "symbolize"
+            started = time.perf_counter()
+            extracted = await symbolizer_agent.extract_atoms(transcription['transcript'], context)
+            state['atoms'] = await symbolizer_agent.validate_atoms(extracted)
+            stage_ms[stage] = _elapsed_ms(started)
+
+            stage = "validate"
+            started = time.perf_counter()
+            validators = validator_agent.community_validators.get(context['community'], [])
+            results = await validator_agent.validate_atoms(state['atoms'], context)
+            decision = await validator_agent.aggregate_decisions(results, validators)
+            decision.setdefault('approval_rate', 0.0)
+            state['results'] = results
+            state['decision'] = decision
+            state['approved_atoms'] = [atom for result in results for atom in result.validated_atoms]
+            stage_ms[stage] = _elapsed_ms(started)
+
+            stage = "load"
+            started = time.perf_counter()
+            # A failed or partial load is reported, not fatal: the entry is still persisted
+            state['load'] = await self.load_atoms(
+                state['approved_atoms'] if decision['decision'] == 'approved' else []
+            )
+            stage_ms[stage] = _elapsed_ms(started)
+
+            stage = "persist"
+            started = time.perf_counter()
+            if self.persist:
+                await self.persist_results(state)
+            stage_ms[stage] = _elapsed_ms(started)
+        except Exception as e:
+            self.timer.record(stage_ms)
+            return PipelineResult(
+                entry_id=job.entry_id,
+                success=False,
+                transcript=state.get('transcription', {}).get('transcript'),
+                atoms=state['atoms'],
+                loaded=len(state['load']['added']),
+                loaded_atoms=state['load']['added'],
+                load_failed=state['load']['failed'],
+                load_error=state['load']['error'],
+                stage_ms=stage_ms,
+                failed_stage=stage,
+                error=str(e)
+            )
+        finally:
+            if media is not None:
+                media.cleanup()
+
+        self.timer.record(stage_ms)
+        return PipelineResult(
+            entry_id=job.entry_id,
+            success=True,
+            transcript=state['transcription']['transcript'],
+            atoms=state['atoms'],
+            approved_atoms=state['approved_atoms'],
+            decision=state['decision']['decision'],
+            confidence=state['decision']['confidence'],
+            loaded=len(state['load']['added']),
+            loaded_atoms=state['load']['added'],
+            load_failed=state['load']['failed'],
+            load_error=state['load']['error'],
+            stage_ms=stage_ms
+        )
+
+    async def load_atoms(self, atoms: List[str]) -> Dict[str, Any]:
+        """Add approved atoms through the shared pool's writer.
+
+        Returns the atoms that were `added`, those that were not (`failed`)
+        and the `error`, if any. Atoms that fail to parse are skipped without
+        stopping the batch, and an error part-way through keeps the atoms
+        already added.
+        """
+        outcome = {'added': [], 'failed': [], 'error': None}
+        if not self.load_metta or not atoms:
+            return outcome
+        try:
+            pool = get_metta_pool()
+            result = await pool.aadd_atoms(atoms)
+        except Exception as e:
+            outcome.update(failed=list(atoms), error=f"MeTTa load failed: {str(e)}")
+            return outcome
+
+        rejected = {failure['index']: failure for failure in result.get('failed', [])}
+        accepted = [atom for i, atom in enumerate(atoms) if i not in rejected]
+        added = accepted[:result.get('added', 0)]
+        outcome['added'] = added
+        outcome['failed'] = [atom for i, atom in enumerate(atoms) if i in rejected] + accepted[len(added):]
+        if result.get('error'):
+            outcome['error'] = f"MeTTa load failed: {result['error']}"
+        elif rejected:
+            outcome['error'] = "; ".join(f"{f['atom']}: {f['error']}" for f in rejected.values())
+        return outcome
+
+    async def persist_results(self, state: Dict[str, Any]):
+        """Write the transcript, atoms and validation decision to the backend in stage order."""
+        transcription = state['transcription']
+        await transcribe_agent.update_backend(
+            state['entry_id'],
+            transcription['transcript'],
+            transcription.get('language'),
+            transcription.get('duration')
+        )
+        await symbolizer_agent.update_backend(state['entry_id'], state['atoms'])
+        await validator_agent.update_backend(state['entry_id'], state['decision'], state['results'])
+
+    async def report_latency(self, ctx: Context):
+        """Log mean and max latency per stage."""
+        if self.timer.runs:
+            ctx.logger.info(f"Pipeline stage latency over {self.timer.runs} runs: {self.timer.stats()}")
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+# Create agent
+orchestrator_agent = OrchestratorAgent()
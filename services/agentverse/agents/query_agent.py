@@ -2,15 +2,23 @@
 
 Handles natural language knowledge queries by delegating to the backend query
 API and returning structured responses with reasoning traces and confidence.
+Requests whose context carries a MeTTa `pattern` are answered from a local
+`MeTTaClientPool` (shared with the Orchestrator Agent, see `agents/metta_pool.py`)
+when services/metta-integration is importable and a pool is enabled, so pattern
+queries are served in parallel without a backend hop.
 
 Env:
 - BACKEND_URL: Backend base URL (default http://localhost:4000)
+- METTA_LOCAL_POOL_SIZE: Reader replicas for local pattern queries (default 0, disabled)
+- METTA_SNAPSHOT_DIR: Snapshot directory the local pool restores on startup
 """
 
 from uagents import Agent, Context, Model
-import requests
 import os
 
+from agents.http_client import get_http_client
+from agents.metta_pool import get_metta_pool, metta_available
+
 class QueryRequest(Model):
     """Message model describing a user query and optional context."""
     query: str
@@ -35,8 +43,11 @@ class QueryAgent(Agent):
             port=8003
         )
         self.backend_url = os.getenv("BACKEND_URL", "http://localhost:4000")
+        self.local_patterns = metta_available() and int(os.getenv("METTA_LOCAL_POOL_SIZE", "0")) > 0
+        # Registered here rather than with class-body decorators, where `self` does not exist
+        self.on_message(model=QueryRequest)(self.handle_query)
+        self.on_interval(period=30.0)(self.health_check)
         
-    @self.on_message(model=QueryRequest)
     async def handle_query(self, ctx: Context, sender: str, request: QueryRequest):
         """Process incoming `QueryRequest` via backend and reply with `QueryResponse`."""
         ctx.logger.info(f"Processing query: {request.query}")
@@ -59,6 +70,9 @@ class QueryAgent(Agent):
     
     async def process_query(self, query: str, context: dict) -> QueryResponse:
         """Forward the query to the backend query endpoint and parse response."""
+        if self.local_patterns and context.get('pattern'):
+            return await self.process_pattern_query(context['pattern'])
+        
         query_url = f"{self.backend_url}/api/entries/query"
         
         data = {
@@ -66,10 +80,7 @@ class QueryAgent(Agent):
             'context': context
         }
         
-        response = requests.post(query_url, json=data)
-        response.raise_for_status()
-        
-        result = response.json()
+        result = await get_http_client().post_json(query_url, json=data)
         
         return QueryResponse(
             success=True,
@@ -79,12 +90,26 @@ class QueryAgent(Agent):
             confidence=result.get('confidence', 0.0)
         )
     
-    @self.on_interval(period=30.0)
+    async def process_pattern_query(self, pattern: str) -> QueryResponse:
+        """Answer a MeTTa pattern from the local client pool on a reader thread."""
+        result = await get_metta_pool().aquery(pattern)
+        if not result['success']:
+            return QueryResponse(success=False, answer="", error=result['error'])
+        
+        matches = result['matches']
+        return QueryResponse(
+            success=True,
+            answer=f"{len(matches)} match(es) for {pattern}",
+            reasoning_trace=[{'step': 'metta_pattern_match', 'pattern': pattern}],
+            sources=matches,
+            confidence=1.0 if matches else 0.0
+        )
+    
     async def health_check(self, ctx: Context):
         """Periodic connectivity check against the backend health endpoint."""
         try:
-            response = requests.get(f"{self.backend_url}/health")
-            if response.status_code == 200:
+            status = await get_http_client().get_status(f"{self.backend_url}/health")
+            if status == 200:
                 ctx.logger.info("Query agent healthy - backend connected")
             else:
                 ctx.logger.warning("Backend health check failed")
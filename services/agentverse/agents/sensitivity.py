@@ -0,0 +1,160 @@
+"""Cultural Sensitivity Screening
+
+Multi-pattern matcher for sensitive terms. Each community's terms (plus the
+shared `general` list) are compiled into one Aho-Corasick automaton, so
+screening costs one pass over the text no matter how many terms there are.
+Automata are rebuilt only when a community's list changes. A batch of atoms
+is scanned in a single pass and every hit is reported per atom.
+
+Env:
+- SENSITIVE_TERMS_FILE: JSON file of `{community: [terms]}`, merged over the defaults
+  and reloaded when its modification time changes
+"""
+
+import json
+import os
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_TERMS = {
+    'general': [
+        'sacred', 'secret', 'restricted', 'initiation',
+        'elder_only', 'gender_restricted'
+    ]
+}
+
+# Never part of a term, so hits cannot span two atoms of a batch
+_SEPARATOR = "\n"
+
+class AhoCorasick:
+    """Aho-Corasick automaton over a fixed set of lowercase terms."""
+    def __init__(self, terms: Iterable[str]):
+        self.terms = sorted({term.lower() for term in terms if term and _SEPARATOR not in term})
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Terms ending at each state, including those inherited through fail links
+        self._out: List[Tuple[str, ...]] = [()]
+        for term in self.terms:
+            self._insert(term)
+        self._link()
+
+    def _insert(self, term: str):
+        state = 0
+        for ch in term:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[state][ch] = next_state
+            state = next_state
+        self._out[state] = self._out[state] + (term,)
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def iter_matches(self, text: str):
+        """Yield `(end_offset, term)` for every occurrence in lowercase `text`."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for term in out[state]:
+                    yield i, term
+
+class SensitivityScreen:
+    """Per-community term lists with lazily (re)built automata."""
+    def __init__(self, terms: Dict[str, List[str]] = None, terms_file: str = None):
+        self.terms_file = terms_file if terms_file is not None else os.getenv("SENSITIVE_TERMS_FILE")
+        self._terms: Dict[str, frozenset] = {}
+        self._automata: Dict[str, AhoCorasick] = {}
+        self._file_mtime: Optional[float] = None
+        self.rebuilds = 0
+        for community, community_terms in (terms or DEFAULT_TERMS).items():
+            self.set_terms(community, community_terms)
+        self._reload_file()
+
+    def set_terms(self, community: str, terms: Iterable[str]) -> bool:
+        """Replace a community's terms; returns True if anything changed."""
+        new_terms = frozenset(term.lower() for term in terms if term)
+        if self._terms.get(community) == new_terms:
+            return False
+        self._terms[community] = new_terms
+        # The general list is part of every community's automaton
+        stale = list(self._automata) if community == 'general' else [community]
+        for name in stale:
+            self._automata.pop(name, None)
+        return True
+
+    def _reload_file(self):
+        if not self.terms_file:
+            return
+        try:
+            mtime = os.path.getmtime(self.terms_file)
+        except OSError:
+            return
+        if mtime == self._file_mtime:
+            return
+        with open(self.terms_file, "r", encoding="utf-8") as f:
+            configured = json.load(f)
+        self._file_mtime = mtime
+        for community, terms in configured.items():
+            self.set_terms(community, list(DEFAULT_TERMS.get(community, [])) + list(terms))
+
+    def automaton(self, community: str) -> AhoCorasick:
+        self._reload_file()
+        automaton = self._automata.get(community)
+        if automaton is None:
+            terms = self._terms.get('general', frozenset()) | self._terms.get(community, frozenset())
+            automaton = AhoCorasick(terms)
+            self._automata[community] = automaton
+            self.rebuilds += 1
+        return automaton
+
+    def scan(self, atom: str, community: str = 'general') -> List[str]:
+        """All sensitive terms found in one atom, in order of appearance."""
+        return self.scan_batch([atom], community)[0]
+
+    def scan_batch(self, atoms: List[str], community: str = 'general') -> List[List[str]]:
+        """Hits for every atom, from a single pass over the joined batch."""
+        automaton = self.automaton(community)
+        hits: List[List[str]] = [[] for _ in atoms]
+        if not atoms or not automaton.terms:
+            return hits
+        # Lowercase per atom: offsets must follow the lowered text, whose length can differ
+        lowered = [atom.lower() for atom in atoms]
+        starts = []
+        offset = 0
+        for atom in lowered:
+            starts.append(offset)
+            offset += len(atom) + len(_SEPARATOR)
+        text = _SEPARATOR.join(lowered)
+        for end, term in automaton.iter_matches(text):
+            atom_hits = hits[bisect_right(starts, end) - 1]
+            if term not in atom_hits:
+                atom_hits.append(term)
+        return hits
+
+_screen: Optional[SensitivityScreen] = None
+
+def get_sensitivity_screen() -> SensitivityScreen:
+    """Return the process-wide sensitivity screen, creating it on first use."""
+    global _screen
+    if _screen is None:
+        _screen = SensitivityScreen()
+    return _screen
@@ -9,9 +9,14 @@ Env:
 """
 
 from uagents import Agent, Context, Model
-import requests
 import os
 import json
+from typing import Any, Dict
+
+from agents.atom_syntax import fix_atom_syntax, parse_atom
+from agents.backend_writer import flush_backend_writer, get_backend_writer
+from agents.http_client import get_http_client
+from agents.job_queue import Job
 
 class SymbolizeJob(Model):
     """Message model: a request to symbolize a transcript into atoms."""
@@ -35,8 +40,10 @@ class SymbolizerAgent(Agent):
             port=8002
         )
         self.backend_url = os.getenv("BACKEND_URL", "http://localhost:4000")
+        # Registered here rather than with class-body decorators, where `self` does not exist
+        self.on_message(model=SymbolizeJob)(self.handle_symbolize_job)
+        self.on_event("shutdown")(self.flush_writes)
         
-    @self.on_message(model=SymbolizeJob)
     async def handle_symbolize_job(self, ctx: Context, sender: str, job: SymbolizeJob):
         """Extract and validate atoms for the given transcript, update backend, reply."""
         ctx.logger.info(f"Symbolizing entry {job.entry_id}")
@@ -68,6 +75,18 @@ class SymbolizerAgent(Agent):
             )
             await ctx.send(sender, result)
     
+    async def run_queued_job(self, job: Job) -> Dict[str, Any]:
+        """Worker handler for the queued 'symbolize' stage; returns the 'validate' payload."""
+        context = {
+            'entry_id': job.entry_id,
+            'community': job.payload.get('community', 'general'),
+            'language': job.payload.get('language', 'sw')
+        }
+        atoms = await self.extract_atoms(job.payload['transcript'], context)
+        valid_atoms = await self.validate_atoms(atoms)
+        await self.update_backend(job.entry_id, valid_atoms)
+        return {**job.payload, 'atoms': valid_atoms}
+    
     async def extract_atoms(self, transcript: str, context: dict) -> list:
         """Call backend symbolizer endpoint to extract MeTTa atoms from transcript."""
         symbolizer_url = f"{self.backend_url}/api/submit/symbolize"
@@ -77,19 +96,17 @@ class SymbolizerAgent(Agent):
             'context': context
         }
         
-        response = requests.post(symbolizer_url, json=data)
-        response.raise_for_status()
-        
-        result = response.json()
+        result = await get_http_client().post_json(symbolizer_url, json=data)
         return result.get('atoms', [])
     
     async def validate_atoms(self, atoms: list) -> list:
-        """Ensure atoms follow basic MeTTa syntax; attempt trivial fixes where possible."""
+        """Keep atoms that parse as MeTTa (repairing missing parentheses), in canonical form."""
         valid_atoms = []
         
         for atom in atoms:
-            if self.is_valid_atom(atom):
-                valid_atoms.append(atom)
+            parsed = parse_atom(atom)
+            if parsed.valid:
+                valid_atoms.append(parsed.canonical)
             else:
                 # Try to fix common syntax issues
                 fixed_atom = self.fix_atom_syntax(atom)
@@ -99,22 +116,15 @@ class SymbolizerAgent(Agent):
         return valid_atoms
     
     def is_valid_atom(self, atom: str) -> bool:
-        """Return True if atom looks like a parenthesized token sequence."""
-        return (atom.startswith('(') and 
-                atom.endswith(')') and 
-                len(atom.split()) >= 2)
+        """Return True if atom is one balanced expression with at least two elements."""
+        return parse_atom(atom).valid
     
     def fix_atom_syntax(self, atom: str) -> str:
-        """Best-effort fix for missing parentheses around an atom string."""
-        atom = atom.strip()
-        if not atom.startswith('('):
-            atom = '(' + atom
-        if not atom.endswith(')'):
-            atom = atom + ')'
-        return atom if self.is_valid_atom(atom) else None
+        """Best-effort fix for missing parentheses; returns the canonical atom or None."""
+        return fix_atom_syntax(atom)
     
     async def update_backend(self, entry_id: int, atoms: list):
-        """PATCH extracted atoms and status to backend entry."""
+        """Queue a PATCH of extracted atoms and status (coalesced by the backend writer)."""
         update_url = f"{self.backend_url}/api/submit/{entry_id}/atoms"
         
         data = {
@@ -122,8 +132,11 @@ class SymbolizerAgent(Agent):
             'status': 'symbolized'
         }
         
-        response = requests.patch(update_url, json=data)
-        response.raise_for_status()
+        await get_backend_writer().submit("PATCH", update_url, 'atoms', entry_id, data)
+    
+    async def flush_writes(self, ctx: Context):
+        """Flush buffered backend writes before the agent stops."""
+        await flush_backend_writer()
 
 # Create agent
 symbolizer_agent = SymbolizerAgent()
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""Tests for the coalescing backend writer against a local stub backend.
+
+Run from services/agentverse: `python -m pytest agents`
+"""
+
+import asyncio
+
+from aiohttp import web
+
+from agents.backend_writer import BackendWriter
+from agents.http_client import close_http_client
+
+class StubBackend:
+    """Records every request; `failures` makes the next N requests answer 503."""
+    def __init__(self):
+        self.requests = []
+        self.failures = 0
+        self.runner = None
+        self.url = None
+
+    async def handle(self, request):
+        if self.failures:
+            self.failures -= 1
+            return web.Response(status=503)
+        self.requests.append((request.method, request.path, await request.json()))
+        return web.json_response({"ok": True})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route("*", "/api/{path:.*}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+def run_with_backend(scenario):
+    async def main():
+        backend = StubBackend()
+        await backend.start()
+        try:
+            await scenario(backend)
+        finally:
+            await close_http_client()
+            await backend.runner.cleanup()
+    asyncio.run(main())
+
+def test_updates_to_the_same_entry_are_coalesced(tmp_path):
+    async def scenario(backend):
+        writer = BackendWriter(flush_seconds=0.05, spool_path=str(tmp_path / "spool.sqlite3"))
+        for entry_id in range(10):
+            url = f"{backend.url}/api/submit/{entry_id}/transcript"
+            await writer.submit("PATCH", url, "transcript", entry_id, {"transcript": "a", "status": "transcribed"})
+            await writer.submit("PATCH", url, "transcript", entry_id, {"transcript": "b", "language": "sw"})
+            await writer.submit("PATCH", f"{backend.url}/api/submit/{entry_id}/atoms", "atoms", entry_id,
+                                {"atoms": [], "status": "symbolized"})
+        await writer.close()
+
+        assert writer.stats()['coalesced'] == 10
+        assert len(backend.requests) == 20
+        transcript = [r for r in backend.requests if r[1] == "/api/submit/3/transcript"]
+        # One request per entry and endpoint; later fields win
+        assert transcript == [("PATCH", "/api/submit/3/transcript",
+                               {"transcript": "b", "status": "transcribed", "language": "sw"})]
+        # An entry's writes go out in submission order
+        assert [r[1] for r in backend.requests if "/submit/3/" in r[1]] == \
+            ["/api/submit/3/transcript", "/api/submit/3/atoms"]
+    run_with_backend(scenario)
+
+def test_posts_are_sent_as_submitted(tmp_path):
+    async def scenario(backend):
+        writer = BackendWriter(flush_seconds=0.05, spool_path=str(tmp_path / "spool.sqlite3"))
+        await writer.submit("POST", f"{backend.url}/api/validate/5", "validation", 5, {"decision": "approved"})
+        await writer.submit("POST", f"{backend.url}/api/validate/5", "validation", 5, {"decision": "rejected"})
+        await writer.close()
+        assert [body for _, _, body in backend.requests] == [{"decision": "approved"}, {"decision": "rejected"}]
+        assert writer.stats()['coalesced'] == 0
+    run_with_backend(scenario)
+
+def test_max_pending_flushes_without_waiting_for_the_timer(tmp_path):
+    async def scenario(backend):
+        writer = BackendWriter(flush_seconds=60, max_pending=5, spool_path=str(tmp_path / "spool.sqlite3"))
+        for entry_id in range(5):
+            await writer.submit("PATCH", f"{backend.url}/api/submit/{entry_id}/atoms", "atoms", entry_id, {"atoms": []})
+        assert len(backend.requests) == 5
+        assert writer.stats()['pending'] == 0
+        await writer.close()
+    run_with_backend(scenario)
+
+def test_failed_update_is_spooled_and_retried_after_restart(tmp_path):
+    spool = str(tmp_path / "spool.sqlite3")
+
+    async def scenario(backend):
+        writer = BackendWriter(flush_seconds=0.05, spool_path=spool, retry_seconds=0.05)
+        backend.failures = 100
+        await writer.submit("PATCH", f"{backend.url}/api/submit/1/atoms", "atoms", 1, {"atoms": ["(a b)"]})
+        await writer.close()
+        assert backend.requests == []
+        assert writer.stats()['spooled'] == 1
+
+        backend.failures = 0
+        restarted = BackendWriter(flush_seconds=0.05, spool_path=spool, retry_seconds=0.05)
+        await asyncio.sleep(0.1)
+        await restarted.flush()
+        assert backend.requests == [("PATCH", "/api/submit/1/atoms", {"atoms": ["(a b)"]})]
+        assert restarted.stats()['spooled'] == 0
+    run_with_backend(scenario)
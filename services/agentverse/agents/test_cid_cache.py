@@ -0,0 +1,108 @@
+"""Tests for the on-disk CID cache, fetching through a local stub gateway.
+
+Run from services/agentverse: `python -m pytest agents`
+"""
+
+import asyncio
+import os
+
+import pytest
+from aiohttp import web
+
+from agents import cid_cache, ipfs_gateways
+from agents.cid_cache import CIDCache
+from agents.http_client import close_http_client
+from agents.ipfs import download_from_ipfs
+from agents.ipfs_gateways import GatewayPool
+from agents.media import MediaFile
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = CIDCache(root=str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    monkeypatch.setattr(cid_cache, "_cache", cache)
+    return cache
+
+def run_with_gateway(content: bytes, scenario):
+    """Serve `content` for every CID from a stub gateway and run `scenario(requests)`."""
+    requests = []
+
+    async def serve(request):
+        requests.append(request.match_info["cid"])
+        return web.Response(body=content, content_type="audio/wav")
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/ipfs/{cid}", serve)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/ipfs"
+        ipfs_gateways._pool = GatewayPool([url])
+        try:
+            await scenario(requests)
+        finally:
+            ipfs_gateways._pool = None
+            await close_http_client()
+            await runner.cleanup()
+    asyncio.run(main())
+
+async def read(cid: str) -> bytes:
+    media = await download_from_ipfs(cid)
+    try:
+        with media.open() as f:
+            return f.read()
+    finally:
+        media.cleanup()
+
+def test_repeat_cid_is_served_from_disk(cache):
+    async def scenario(requests):
+        assert await read("QmAudio") == b"RIFF-audio"
+        assert await read("QmAudio") == b"RIFF-audio"
+        assert requests == ["QmAudio"]
+        assert (cache.stats()["hits"], cache.stats()["entries"]) == (1, 1)
+    run_with_gateway(b"RIFF-audio", scenario)
+
+def test_corrupt_entry_is_dropped_and_fetched_again(cache):
+    async def scenario(requests):
+        await read("QmAudio")
+        (name,) = [n for n in os.listdir(cache.objects_dir) if not n.endswith(".json")]
+        with open(os.path.join(cache.objects_dir, name), "wb") as f:
+            f.write(b"garbage!!!")
+        assert await read("QmAudio") == b"RIFF-audio"
+        assert requests == ["QmAudio", "QmAudio"]
+        assert cache.stats()["corrupt"] == 1
+    run_with_gateway(b"RIFF-audio", scenario)
+
+def test_eviction_keeps_open_readers_intact(tmp_path):
+    cache = CIDCache(root=str(tmp_path / "cache"), max_bytes=10)
+    first = cache.put("QmFirst", MediaFile.from_bytes(b"aaaaaa"))
+    second = cache.put("QmSecond", MediaFile.from_bytes(b"bbbbbb"))
+    # Over budget: the least recently used entry goes, but its reader keeps its link
+    assert cache.get("QmFirst") is None
+    assert cache.stats()["evictions"] == 1
+    with first.open() as f:
+        assert f.read() == b"aaaaaa"
+    first.cleanup()
+    second.cleanup()
+    assert os.listdir(cache.links_dir) == []
+
+def test_reopened_cache_keeps_entries_and_drops_leftovers(tmp_path):
+    root = str(tmp_path / "cache")
+    CIDCache(root=root).put("QmKept", MediaFile.from_bytes(b"kept")).cleanup()
+    stale_tmp = os.path.join(root, "tmp", "interrupted")
+    with open(stale_tmp, "wb") as f:
+        f.write(b"partial")
+    os.utime(stale_tmp, (0, 0))
+    # A link left behind by a process that no longer exists
+    dead_link = os.path.join(root, "links", "999999999-dead.wav")
+    with open(dead_link, "wb") as f:
+        f.write(b"kept")
+
+    reopened = CIDCache(root=root)
+    assert not os.path.exists(stale_tmp)
+    assert not os.path.exists(dead_link)
+    media = reopened.get("QmKept")
+    with media.open() as f:
+        assert f.read() == b"kept"
+    media.cleanup()
@@ -0,0 +1,103 @@
+"""Tests for the hedged IPFS gateway pool against local stub gateways.
+
+Run from services/agentverse: `python -m pytest agents`
+"""
+
+import asyncio
+import time
+
+from aiohttp import web
+
+from agents.http_client import close_http_client
+from agents.ipfs_gateways import GatewayPool
+
+async def start_gateway(handler):
+    """Serve `GET /ipfs/{cid}` with `handler`; returns the runner and the gateway base URL."""
+    app = web.Application()
+    app.router.add_get("/ipfs/{cid}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/ipfs"
+
+async def missing(request):
+    return web.Response(status=404)
+
+async def broken(request):
+    return web.Response(status=502)
+
+async def fast(request):
+    return web.Response(body=b"fast")
+
+async def slow(request):
+    await asyncio.sleep(0.5)
+    return web.Response(body=b"slow")
+
+def run_with_gateways(handlers, scenario):
+    """Start one stub gateway per handler, run `scenario(urls)` and clean up."""
+    async def main():
+        started = [await start_gateway(handler) for handler in handlers]
+        try:
+            return await scenario([url for _, url in started])
+        finally:
+            await close_http_client()
+            for runner, _ in started:
+                await runner.cleanup()
+    return asyncio.run(main())
+
+async def fetch(pool: GatewayPool, cid: str):
+    gateway, request, response = await pool.open(cid)
+    try:
+        return gateway, await response.read()
+    finally:
+        await request.__aexit__(None, None, None)
+
+def test_content_miss_tries_next_gateway_without_penalty():
+    async def scenario(urls):
+        pool = GatewayPool(urls, default_hedge_delay=5)
+        for _ in range(5):
+            gateway, body = await fetch(pool, "QmTest")
+            assert (gateway.url, body) == (urls[1], b"fast")
+        miss = pool.gateways[0]
+        assert (miss.misses, miss.failures, miss.benched_until) == (5, 0, 0.0)
+    run_with_gateways([missing, fast], scenario)
+
+def test_failing_gateway_is_benched():
+    async def scenario(urls):
+        pool = GatewayPool(urls, default_hedge_delay=5, failure_threshold=3, cooldown=30)
+        for _ in range(3):
+            gateway, _ = await fetch(pool, "QmTest")
+            assert gateway.url == urls[1]
+        failing = pool.gateways[0]
+        assert failing.failures == 3
+        assert not failing.is_healthy(time.monotonic())
+        assert [g.url for g in pool.ranked()] == [urls[1], urls[0]]
+    run_with_gateways([broken, fast], scenario)
+
+def test_slow_primary_is_hedged_and_loser_estimate_only_rises():
+    async def scenario(urls):
+        pool = GatewayPool(urls, default_hedge_delay=0.05)
+        slow_gateway, fast_gateway = pool.gateways
+        # Rank the slow gateway first
+        slow_gateway.ewma_latency, fast_gateway.ewma_latency = 0.001, 0.01
+        gateway, body = await fetch(pool, "QmTest")
+        assert (gateway.url, body) == (urls[1], b"fast")
+        assert (pool.hedges_sent, pool.hedges_won) == (1, 1)
+        # The cancelled request's elapsed time is a lower bound: it may raise the estimate
+        assert slow_gateway.ewma_latency > 0.001
+        assert slow_gateway.failures == 0
+    run_with_gateways([slow, fast], scenario)
+
+def test_caller_cancellation_propagates():
+    async def scenario(urls):
+        pool = GatewayPool(urls, default_hedge_delay=5)
+        task = asyncio.ensure_future(pool.open("QmTest"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return
+        raise AssertionError("cancelling the caller must cancel open()")
+    run_with_gateways([slow], scenario)
@@ -0,0 +1,113 @@
+"""Tests for the SQLite job queue: idempotent enqueue, leases, retries and stage handoff.
+
+Run from services/agentverse: `python -m pytest agents`
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from agents.job_queue import DEAD, DONE, QUEUED, RUNNING, JobQueue, StageWorkerPool
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(path=str(tmp_path / "jobs.sqlite3"), max_attempts=2, backoff_seconds=0.01,
+                    backoff_max_seconds=0.01, lease_seconds=0.2)
+
+def test_enqueue_is_idempotent_until_dead(queue):
+    assert queue.enqueue("ingest", 1, {"cid": "QmA"})
+    assert not queue.enqueue("ingest", 1, {"cid": "QmB"})
+    job = queue.claim("ingest", "w1")
+    assert job.payload == {"cid": "QmA"}
+    assert not queue.enqueue("ingest", 1, {"cid": "QmB"})
+
+    queue.fail(job, "boom")
+    time.sleep(0.02)
+    assert queue.fail(queue.claim("ingest", "w1"), "boom") == DEAD
+    # Only a dead job is queued again, with the new payload and a fresh budget
+    assert queue.enqueue("ingest", 1, {"cid": "QmB"})
+    job = queue.claim("ingest", "w1")
+    assert (job.payload, job.attempts) == ({"cid": "QmB"}, 1)
+
+def test_expired_lease_is_reclaimed_and_old_holder_is_fenced_off(queue):
+    queue.enqueue("ingest", 1, {})
+    first = queue.claim("ingest", "w1")
+    assert queue.claim("ingest", "w2") is None
+    time.sleep(0.25)
+
+    second = queue.claim("ingest", "w2")
+    assert (second.id, second.attempts) == (first.id, 2)
+    assert second.worker != first.worker
+    # The worker that lost its lease can neither renew, complete nor fail the job
+    assert not queue.renew(first)
+    assert not queue.complete(first, {"stale": True})
+    assert queue.fail(first, "late") is None
+    assert queue.complete(second, {"fresh": True})
+    assert queue.get("ingest", 1) == {'status': DONE, 'attempts': 2, 'last_error': None, 'result': {"fresh": True}}
+
+def test_renewed_lease_is_not_reclaimed(queue):
+    queue.enqueue("ingest", 1, {})
+    job = queue.claim("ingest", "w1")
+    for _ in range(3):
+        time.sleep(0.1)
+        assert queue.renew(job)
+    assert queue.claim("ingest", "w2") is None
+    assert queue.get("ingest", 1)['status'] == RUNNING
+
+def test_complete_queues_next_stage_atomically(queue):
+    queue.enqueue("ingest", 1, {"cid": "QmA"})
+    job = queue.claim("ingest", "w1")
+    assert queue.complete(job, {"transcript": "t"}, next_stage="symbolize", next_payload={"transcript": "t"})
+    assert queue.get("symbolize", 1)['status'] == QUEUED
+    assert queue.depth("symbolize") == 1
+    assert queue.claim("symbolize", "w1").payload == {"transcript": "t"}
+
+def test_pool_abandons_job_whose_lease_was_taken_over(queue):
+    async def main():
+        started = asyncio.Event()
+        finished = []
+
+        async def handler(job):
+            started.set()
+            await asyncio.sleep(1.0)
+            finished.append(job.entry_id)
+            return {}
+
+        pool = StageWorkerPool(queue, "ingest", handler, concurrency=1, poll_interval=0.02)
+        queue.enqueue("ingest", 1, {})
+        pool.start()
+        await asyncio.wait_for(started.wait(), 1.0)
+        # Another worker takes the job over, as if this one had stalled past its lease
+        with queue._transaction() as conn:
+            conn.execute("UPDATE jobs SET lease_until = 0")
+        takeover = queue.claim("ingest", "other")
+        await asyncio.sleep(0.2)
+        await pool.stop()
+
+        assert finished == []
+        assert pool.lost_leases == 1
+        assert queue.complete(takeover, {"by": "other"})
+    asyncio.run(main())
+
+def test_pool_hands_results_to_next_stage_with_backpressure(queue):
+    async def main():
+        async def handler(job):
+            return {"entry": job.entry_id}
+
+        pool = StageWorkerPool(queue, "transcribe", handler, concurrency=1, next_stage="symbolize",
+                               max_pending=2, poll_interval=0.02)
+        for entry_id in range(5):
+            queue.enqueue("transcribe", entry_id, {})
+        pool.start()
+        await asyncio.sleep(0.3)
+        # Stops claiming once the downstream backlog is full
+        assert queue.depth("symbolize") == 2
+        assert queue.depth("transcribe") == 3
+
+        queue.complete(queue.claim("symbolize", "consumer"), {})
+        await asyncio.sleep(0.3)
+        await pool.stop()
+        assert queue.depth("symbolize") == 2
+        assert pool.processed == 3
+    asyncio.run(main())
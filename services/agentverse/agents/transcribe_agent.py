@@ -1,27 +1,50 @@
 """Transcribe Agent
 
-Downloads audio from IPFS, performs speech-to-text using OpenAI Whisper with a
-HuggingFace fallback, updates the backend with results, and returns a
+Downloads audio from IPFS, performs speech-to-text through a configurable chain
+of engines (OpenAI Whisper, HuggingFace, or a local CPU model; see
+`agents/asr_engines.py`), updates the backend with results, and returns a
 `TranscribeResult`. Includes a periodic health check.
 
 Env:
 - BACKEND_URL: Backend base URL (default http://localhost:4000)
+- TRANSCRIBE_ENGINES: Engine fallback order (default "openai,huggingface")
 - OPENAI_API_KEY: OpenAI key for Whisper
 - HUGGINGFACE_TOKEN: HF inference token
 """
 
 from uagents import Agent, Bureau, Context, Model
-import requests
+import asyncio
+import logging
 import os
-import tempfile
 import json
+import time
+from typing import Any, Dict
+
+from agents.asr_engines import build_engines
+from agents.audio_chunking import transcribe_chunked
+from agents.cid_cache import get_cid_cache
+from agents.circuit_breaker import BreakerGroup
+from agents.backend_writer import flush_backend_writer, get_backend_writer
+from agents.ipfs import MediaFile, download_from_ipfs
+from agents.job_queue import Job
+from agents.transcription_cache import get_transcription_cache
+
+logger = logging.getLogger(__name__)
 
 class TranscribeJob(Model):
-    """Message model describing a transcription task."""
+    """Message model describing a transcription task.
+
+    Set `chunked` for long recordings to split them into overlapping segments
+    that are transcribed concurrently; `segment_seconds` overrides the default
+    segment length (at least 10 s and longer than the overlap, otherwise the
+    job is rejected).
+    """
     entry_id: int
     cid: str
     language: str = "sw"
     content_type: str = "audio"
+    chunked: bool = False
+    segment_seconds: float = None
 
 class TranscribeResult(Model):
     """Message model containing transcription outcome and metadata."""
@@ -41,19 +64,32 @@ class TranscribeAgent(Agent):
             port=8004
         )
         self.backend_url = os.getenv("BACKEND_URL", "http://localhost:4000")
-        self.openai_key = os.getenv("OPENAI_API_KEY")
+        self.engines = {engine.name: engine for engine in build_engines()}
+        self.breakers = BreakerGroup(list(self.engines))
+        # Registered here rather than with class-body decorators, where `self` does not exist
+        self.on_message(model=TranscribeJob)(self.handle_transcribe_job)
+        self.on_event("shutdown")(self.flush_writes)
+        self.on_interval(period=60.0)(self.health_check)
         
-    @self.on_message(model=TranscribeJob)
     async def handle_transcribe_job(self, ctx: Context, sender: str, job: TranscribeJob):
         """Process an audio transcription job and respond with `TranscribeResult`."""
         ctx.logger.info(f"Processing transcription for entry {job.entry_id}")
         
+        media = None
         try:
-            # Download file from IPFS
-            audio_data = await self.download_from_ipfs(job.cid)
+            # Stream file from IPFS to a spool file
+            media = await self.download_from_ipfs(job.cid)
             
-            # Transcribe audio
-            transcript_result = await self.transcribe_audio(audio_data, job.language)
+            # Transcribe audio, optionally as concurrent overlapping segments
+            if job.chunked:
+                transcript_result = await transcribe_chunked(
+                    media,
+                    job.language,
+                    self.transcribe_audio,
+                    segment_seconds=job.segment_seconds
+                )
+            else:
+                transcript_result = await self.transcribe_audio(media, job.language)
             
             # Update backend with transcript
             await self.update_backend(
@@ -81,77 +117,70 @@ class TranscribeAgent(Agent):
                 error=str(e)
             )
             await ctx.send(sender, result)
+        finally:
+            if media is not None:
+                media.cleanup()
     
-    async def download_from_ipfs(self, cid: str) -> bytes:
-        """Download file bytes from IPFS via Pinata gateway."""
-        pinata_gateway = f"https://gateway.pinata.cloud/ipfs/{cid}"
-        response = requests.get(pinata_gateway)
-        response.raise_for_status()
-        return response.content
-    
-    async def transcribe_audio(self, audio_data: bytes, language: str) -> dict:
-        """Transcribe audio, trying OpenAI Whisper then falling back to HF."""
-        try:
-            # Try OpenAI Whisper first
-            return await self.transcribe_with_openai(audio_data, language)
-        except Exception as e:
-            ctx.logger.warning(f"OpenAI transcription failed, trying HuggingFace: {str(e)}")
-            # Fallback to HuggingFace
-            return await self.transcribe_with_huggingface(audio_data, language)
-    
-    async def transcribe_with_openai(self, audio_data: bytes, language: str) -> dict:
-        """Transcribe audio buffer using OpenAI Whisper API."""
-        # Save audio to temporary file
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-            temp_file.write(audio_data)
-            temp_path = temp_file.name
-        
+    async def run_queued_job(self, job: Job) -> Dict[str, Any]:
+        """Worker handler for the queued 'transcribe' stage; returns the 'symbolize' payload."""
+        media = await self.download_from_ipfs(job.payload['cid'])
         try:
-            # Use OpenAI Whisper API
-            import openai
-            openai.api_key = self.openai_key
-            
-            with open(temp_path, 'rb') as audio_file:
-                response = openai.Audio.transcribe(
-                    "whisper-1",
-                    audio_file,
-                    language=language,
-                    response_format="verbose_json"
-                )
-            
-            return {
-                'transcript': response.text,
-                'language': response.language,
-                'duration': response.duration
-            }
-            
+            transcript_result = await self.transcribe_audio(media, job.payload.get('language', 'sw'))
         finally:
-            # Clean up temporary file
-            os.unlink(temp_path)
+            media.cleanup()
+        await self.update_backend(
+            job.entry_id,
+            transcript_result['transcript'],
+            transcript_result['language'],
+            transcript_result.get('duration')
+        )
+        return {**job.payload, 'transcript': transcript_result['transcript']}
     
-    async def transcribe_with_huggingface(self, audio_data: bytes, language: str) -> dict:
-        """Transcribe using a HuggingFace wav2vec2 model via Inference API."""
-        try:
-            # Use a pre-trained speech recognition model
-            API_URL = "https://api-inference.huggingface.co/models/facebook/wav2vec2-large-xlsr-53"
-            headers = {"Authorization": f"Bearer {os.getenv('HUGGINGFACE_TOKEN')}"}
-            
-            response = requests.post(API_URL, headers=headers, data=audio_data)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            return {
-                'transcript': result.get('text', ''),
-                'language': language,
-                'duration': None
-            }
-            
-        except Exception as e:
-            raise Exception(f"HuggingFace transcription failed: {str(e)}")
+    async def download_from_ipfs(self, cid: str) -> MediaFile:
+        """Stream the file for `cid` from IPFS to disk."""
+        return await download_from_ipfs(cid)
+    
+    async def transcribe_audio(self, media: MediaFile, language: str) -> dict:
+        """Transcribe audio, serving cached results by audio hash first, then
+        trying engines whose circuit breaker is not open, healthiest and
+        fastest first, until one succeeds."""
+        cache = get_transcription_cache()
+        use_cache = cache.enabled and media.size > 0
+        if use_cache:
+            cached = await asyncio.to_thread(cache.get, media.sha256, language, list(self.engines))
+            if cached is not None:
+                return cached
+        
+        errors = []
+        for name in self.breakers.ordered():
+            breaker = self.breakers.breaker(name)
+            if not breaker.try_acquire():
+                continue
+            started = time.monotonic()
+            try:
+                result = await self.engines[name].transcribe(media, language)
+            except Exception as e:
+                breaker.record_failure(time.monotonic() - started)
+                logger.warning(f"{name} transcription failed, trying next engine: {str(e)}")
+                errors.append(f"{name}: {str(e)}")
+                continue
+            except BaseException:
+                # Cancelled or timed out mid-call: free a half-open probe slot without judging the engine
+                breaker.release()
+                raise
+            breaker.record_success(time.monotonic() - started)
+            break
+        else:
+            if not errors:
+                raise Exception("No transcription engine available: all circuit breakers are open")
+            raise Exception(f"All transcription engines failed: {'; '.join(errors)}")
+        
+        if use_cache:
+            await asyncio.to_thread(cache.put, media.sha256, language, result['engine'], result)
+        return result
     
     async def update_backend(self, entry_id: int, transcript: str, language: str, duration: float = None):
-        """PATCH transcription results and status to backend entry."""
+        """Queue a PATCH of transcription results and status (coalesced by the backend writer)."""
         update_url = f"{self.backend_url}/api/submit/{entry_id}/transcript"
         
         data = {
@@ -163,17 +192,26 @@ class TranscribeAgent(Agent):
         if duration is not None:
             data['duration'] = duration
         
-        response = requests.patch(update_url, json=data)
-        response.raise_for_status()
+        await get_backend_writer().submit("PATCH", update_url, 'transcript', entry_id, data)
+    
+    def engine_states(self) -> dict:
+        """Return per-engine circuit breaker state for metrics."""
+        return self.breakers.snapshot()
+    
+    async def flush_writes(self, ctx: Context):
+        """Flush buffered backend writes before the agent stops."""
+        await flush_backend_writer()
     
-    @self.on_interval(period=60.0)
     async def health_check(self, ctx: Context):
-        """Perform a periodic no-op to verify dependencies are reachable."""
+        """Report engine circuit breaker states; healthy while any engine is usable."""
         try:
-            # Test transcription with a small audio sample
-            test_audio = b''  # Empty for now, just check connectivity
-            await self.transcribe_audio(test_audio, "en")
+            states = self.engine_states()
+            ctx.logger.info(f"Transcription engine states: {states}")
+            if not self.breakers.ordered():
+                raise Exception("all transcription engine circuit breakers are open")
             ctx.logger.info("Transcribe agent healthy")
+            ctx.logger.info(f"CID cache stats: {get_cid_cache().stats()}")
+            ctx.logger.info(f"Transcription cache stats: {get_transcription_cache().stats()}")
         except Exception as e:
             ctx.logger.error(f"Transcribe agent health check failed: {str(e)}")
 
@@ -0,0 +1,150 @@
+"""Transcription Cache
+
+Persistent cache of speech-to-text results keyed by (audio SHA-256, requested
+language, engine/model). Resubmitted or re-run recordings are answered from
+SQLite instead of paying for another Whisper/HuggingFace call. Entries expire
+after a TTL and the least recently used ones are evicted past a size limit.
+
+Env:
+- TRANSCRIPTION_CACHE_PATH: SQLite file (default <tmp>/afriverse-transcripts.sqlite3)
+- TRANSCRIPTION_CACHE_TTL_SECONDS: Entry lifetime, 0 = never expire (default 2592000, 30 days)
+- TRANSCRIPTION_CACHE_MAX_ENTRIES: Size limit, 0 disables the cache (default 100000)
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+class TranscriptionCache:
+    """SQLite-backed transcript cache with TTL and LRU size eviction."""
+    def __init__(self, path: str = None, ttl: float = None, max_entries: int = None):
+        self.path = path or os.getenv(
+            "TRANSCRIPTION_CACHE_PATH", os.path.join(tempfile.gettempdir(), "afriverse-transcripts.sqlite3")
+        )
+        self.ttl = ttl if ttl is not None else float(os.getenv("TRANSCRIPTION_CACHE_TTL_SECONDS", "2592000"))
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.getenv("TRANSCRIPTION_CACHE_MAX_ENTRIES", "100000")
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS transcripts (
+                audio_sha256 TEXT NOT NULL,
+                language TEXT NOT NULL,
+                engine TEXT NOT NULL,
+                transcript TEXT NOT NULL,
+                detected_language TEXT,
+                duration REAL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                PRIMARY KEY (audio_sha256, language, engine)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_transcripts_lru ON transcripts (last_used_at)")
+        self._conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, audio_sha256: str, language: str, engines: List[str]) -> Optional[Dict[str, Any]]:
+        """Return the cached result from the first engine in `engines` that has one."""
+        now = time.time()
+        with self._lock:
+            for engine in engines:
+                row = self._conn.execute(
+                    "SELECT transcript, detected_language, duration, created_at FROM transcripts "
+                    "WHERE audio_sha256 = ? AND language = ? AND engine = ?",
+                    (audio_sha256, language, engine)
+                ).fetchone()
+                if row is None:
+                    continue
+                transcript, detected_language, duration, created_at = row
+                if self.ttl and now - created_at > self.ttl:
+                    self._conn.execute(
+                        "DELETE FROM transcripts WHERE audio_sha256 = ? AND language = ? AND engine = ?",
+                        (audio_sha256, language, engine)
+                    )
+                    self._conn.commit()
+                    continue
+                self._conn.execute(
+                    "UPDATE transcripts SET last_used_at = ? WHERE audio_sha256 = ? AND language = ? AND engine = ?",
+                    (now, audio_sha256, language, engine)
+                )
+                self._conn.commit()
+                self.hits += 1
+                return {
+                    'transcript': transcript,
+                    'language': detected_language,
+                    'duration': duration,
+                    'engine': engine
+                }
+            self.misses += 1
+            return None
+
+    def put(self, audio_sha256: str, language: str, engine: str, result: Dict[str, Any]):
+        """Store a transcription result and evict expired / least recently used rows."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcripts "
+                "(audio_sha256, language, engine, transcript, detected_language, duration, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    audio_sha256, language, engine,
+                    result.get('transcript') or '',
+                    result.get('language'),
+                    result.get('duration'),
+                    now, now
+                )
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Delete expired rows, then the oldest-used rows above `max_entries` (lock held)."""
+        if self.ttl:
+            cursor = self._conn.execute("DELETE FROM transcripts WHERE created_at < ?", (now - self.ttl,))
+            self.evictions += cursor.rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM transcripts WHERE rowid IN "
+                "(SELECT rowid FROM transcripts ORDER BY last_used_at ASC LIMIT ?)",
+                (excess,)
+            )
+            self.evictions += cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current entry count."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': entries,
+                'max_entries': self.max_entries
+            }
+
+_cache: Optional[TranscriptionCache] = None
+
+def get_transcription_cache() -> TranscriptionCache:
+    """Return the process-wide shared `TranscriptionCache`."""
+    global _cache
+    if _cache is None:
+        _cache = TranscriptionCache()
+    return _cache
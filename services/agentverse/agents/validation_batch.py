@@ -0,0 +1,39 @@
+"""Validation Batch Encoding
+
+Columnar encoding of per-atom validation results, so that a whole entry's
+decisions travel in one agent message instead of one message per atom. Each
+per-atom field becomes a parallel list. Notes repeat heavily (most atoms share
+a handful of reasons), so they are stored once in `notes` and referenced by
+position from `note_ids`.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+def columns_from_results(atoms: Sequence[str], results: Sequence[Any]) -> Dict[str, List[Any]]:
+    """Encode `ValidationResult`-like objects (one per atom, in order) as columns."""
+    note_positions: Dict[str, int] = {}
+    note_ids = []
+    for result in results:
+        note_ids.append(note_positions.setdefault(result.notes, len(note_positions)))
+    return {
+        'atoms': list(atoms),
+        'approved': [result.decision == 'approved' for result in results],
+        'confidences': [result.confidence for result in results],
+        'note_ids': note_ids,
+        'notes': list(note_positions)
+    }
+
+def results_from_columns(columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Decode columns back into one `ValidationResult`-shaped dict per atom."""
+    notes = columns['notes']
+    return [
+        {
+            'decision': 'approved' if approved else 'rejected',
+            'confidence': confidence,
+            'notes': notes[note_id],
+            'validated_atoms': [atom] if approved else []
+        }
+        for atom, approved, confidence, note_id in zip(
+            columns['atoms'], columns['approved'], columns['confidences'], columns['note_ids']
+        )
+    ]
@@ -5,13 +5,37 @@ aggregates decisions, and posts validation outcomes to the backend.
 
 Env:
 - BACKEND_URL: Backend base URL (default http://localhost:4000)
+- SENSITIVE_TERMS_FILE: Per-community sensitive term lists (see agents/sensitivity.py)
+- CONSISTENCY_BATCH_PATH: Backend path for batched consistency queries
+  (default /api/entries/query/batch; empty disables batching)
+- CONSISTENCY_BATCH_SIZE: Atoms per batched consistency request (default 100)
+- CONSISTENCY_CONCURRENCY: Concurrent per-atom requests when batching is unavailable (default 8)
 """
 
 from uagents import Agent, Bureau, Context, Model
-import requests
+import asyncio
+import logging
 import os
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
+
+import aiohttp
+
+from agents.atom_syntax import parse_atom
+from agents.backend_writer import flush_backend_writer, get_backend_writer
+from agents.http_client import get_http_client
+from agents.job_queue import Job
+from agents.sensitivity import get_sensitivity_screen
+from agents.validation_batch import columns_from_results
+
+logger = logging.getLogger(__name__)
+
+# Statuses meaning the backend has no batch endpoint; stop trying it
+_BATCH_UNSUPPORTED = {404, 405, 501}
+
+# Entry-level approval thresholds used by aggregate_decisions
+APPROVAL_RATE_THRESHOLD = 0.7
+CONFIDENCE_THRESHOLD = 0.6
 
 class ValidationRequest(Model):
     """Message model describing a validation request for an entry."""
@@ -19,6 +43,8 @@ class ValidationRequest(Model):
     validators: List[str]
     atoms: List[str]
     context: Dict[str, Any] = {}
+    # Opt in to one ValidationResult message per atom instead of a ValidationBatchResult
+    single_messages: bool = False
 
 class ValidationResult(Model):
     """Message model with a validator's decision and details."""
@@ -29,6 +55,21 @@ class ValidationResult(Model):
     notes: str = ""
     validated_atoms: List[str] = []
 
+class ValidationBatchResult(Model):
+    """Message model with the aggregate decision and every per-atom decision, column-wise."""
+    entry_id: int
+    validator: str
+    decision: str  # aggregate: 'approved' or 'rejected'
+    confidence: float
+    approval_rate: float = 0.0
+    # Parallel per-atom columns (see agents/validation_batch.py)
+    atoms: List[str] = []
+    approved: List[bool] = []
+    confidences: List[float] = []
+    note_ids: List[int] = []
+    notes: List[str] = []
+    error: str = None
+
 class ValidatorAgent(Agent):
     """Agent that runs syntax, sensitivity, and consistency checks for atoms."""
     def __init__(self):
@@ -39,10 +80,17 @@ class ValidatorAgent(Agent):
         )
         self.backend_url = os.getenv("BACKEND_URL", "http://localhost:4000")
         self.community_validators = self.load_community_validators()
+        self.consistency_batch_path = os.getenv("CONSISTENCY_BATCH_PATH", "/api/entries/query/batch")
+        self.consistency_batch_size = int(os.getenv("CONSISTENCY_BATCH_SIZE", "100"))
+        self.consistency_concurrency = int(os.getenv("CONSISTENCY_CONCURRENCY", "8"))
+        self.batch_consistency_supported = bool(self.consistency_batch_path)
+        # Registered here rather than with class-body decorators, where `self` does not exist
+        self.on_message(model=ValidationRequest)(self.handle_validation_request)
+        self.on_event("shutdown")(self.flush_writes)
+        self.on_interval(period=120.0)(self.update_validator_list)
         
-    @self.on_message(model=ValidationRequest)
     async def handle_validation_request(self, ctx: Context, sender: str, request: ValidationRequest):
-        """Validate given atoms, aggregate results, update backend, and reply."""
+        """Validate given atoms, aggregate results, update backend, and reply in one message."""
         ctx.logger.info(f"Processing validation for entry {request.entry_id}")
         
         try:
@@ -65,148 +113,200 @@ class ValidatorAgent(Agent):
                 validation_results
             )
             
-            # Send results back
-            for result in validation_results:
-                await ctx.send(sender, result)
+            # Send results back: one columnar message unless the caller opted out
+            if request.single_messages:
+                for result in validation_results:
+                    await ctx.send(sender, result)
+            else:
+                await ctx.send(sender, ValidationBatchResult(
+                    entry_id=request.entry_id,
+                    validator=self.address,
+                    decision=aggregated_decision['decision'],
+                    confidence=aggregated_decision['confidence'],
+                    approval_rate=aggregated_decision.get('approval_rate', 0.0),
+                    **columns_from_results(request.atoms, validation_results)
+                ))
                 
         except Exception as e:
             ctx.logger.error(f"Validation failed for entry {request.entry_id}: {str(e)}")
             # Send error result
-            error_result = ValidationResult(
-                entry_id=request.entry_id,
-                validator=self.address,
-                decision="rejected",
-                confidence=0.0,
-                notes=f"Validation error: {str(e)}"
-            )
+            if request.single_messages:
+                error_result = ValidationResult(
+                    entry_id=request.entry_id,
+                    validator=self.address,
+                    decision="rejected",
+                    confidence=0.0,
+                    notes=f"Validation error: {str(e)}"
+                )
+            else:
+                error_result = ValidationBatchResult(
+                    entry_id=request.entry_id,
+                    validator=self.address,
+                    decision="rejected",
+                    confidence=0.0,
+                    error=f"Validation error: {str(e)}"
+                )
             await ctx.send(sender, error_result)
     
+    async def run_queued_job(self, job: Job) -> Dict[str, Any]:
+        """Worker handler for the queued 'validate' stage, the last one; returns the entry's outcome."""
+        context = {
+            'entry_id': job.entry_id,
+            'community': job.payload.get('community', 'general'),
+            'language': job.payload.get('language', 'sw')
+        }
+        atoms = job.payload.get('atoms', [])
+        results = await self.validate_atoms(atoms, context)
+        decision = await self.aggregate_decisions(results, self.community_validators.get(context['community'], []))
+        await self.update_backend(job.entry_id, decision, results)
+        return {
+            **job.payload,
+            'decision': decision['decision'],
+            'confidence': decision['confidence'],
+            'approved_atoms': [atom for result in results for atom in result.validated_atoms]
+        }
+    
     async def validate_atoms(self, atoms: List[str], context: Dict[str, Any]) -> List[ValidationResult]:
-        """Run syntax, sensitivity, and consistency checks over each atom."""
-        results = []
+        """Run local checks over the batch, then remote consistency checks concurrently.
+
+        Remote checks stop early once the entry is certain to be rejected;
+        atoms left unchecked are rejected with a note saying so.
+        """
+        entry_id = context.get('entry_id', 0)
+        results: List[Optional[ValidationResult]] = [None] * len(atoms)
         
-        for atom in atoms:
-            try:
-                # Check atom syntax
-                if not self.is_valid_atom_syntax(atom):
-                    results.append(ValidationResult(
-                        entry_id=context.get('entry_id', 0),
-                        validator=self.address,
-                        decision="rejected",
-                        confidence=0.9,
-                        notes=f"Invalid atom syntax: {atom}",
-                        validated_atoms=[]
-                    ))
-                    continue
-                
-                # Check for cultural sensitivity
-                sensitivity_check = await self.check_cultural_sensitivity(atom, context)
-                if not sensitivity_check['approved']:
-                    results.append(ValidationResult(
-                        entry_id=context.get('entry_id', 0),
-                        validator=self.address,
-                        decision="rejected",
-                        confidence=0.8,
-                        notes=f"Culturally sensitive content: {sensitivity_check['reason']}",
-                        validated_atoms=[]
-                    ))
-                    continue
-                
-                # Check knowledge consistency
-                consistency_check = await self.check_knowledge_consistency(atom, context)
-                
-                # If all checks pass, approve the atom
-                if consistency_check['consistent']:
-                    results.append(ValidationResult(
-                        entry_id=context.get('entry_id', 0),
-                        validator=self.address,
-                        decision="approved",
-                        confidence=consistency_check['confidence'],
-                        notes="Atom validated successfully",
-                        validated_atoms=[atom]
-                    ))
-                else:
-                    results.append(ValidationResult(
-                        entry_id=context.get('entry_id', 0),
-                        validator=self.address,
-                        decision="rejected",
-                        confidence=consistency_check['confidence'],
-                        notes=f"Knowledge inconsistency: {consistency_check['reason']}",
-                        validated_atoms=[]
-                    ))
-                    
-            except Exception as e:
-                ctx.logger.error(f"Atom validation error: {str(e)}")
-                results.append(ValidationResult(
-                    entry_id=context.get('entry_id', 0),
+        # One automaton pass over the whole batch finds every sensitive term
+        sensitive_hits = get_sensitivity_screen().scan_batch(atoms, context.get('community', 'general'))
+        
+        # Local checks first; only the survivors need the backend
+        pending = []
+        for i, (atom, hits) in enumerate(zip(atoms, sensitive_hits)):
+            # Check atom syntax
+            if not self.is_valid_atom_syntax(atom):
+                results[i] = ValidationResult(
+                    entry_id=entry_id,
+                    validator=self.address,
+                    decision="rejected",
+                    confidence=0.9,
+                    notes=f"Invalid atom syntax: {atom}",
+                    validated_atoms=[]
+                )
+                continue
+            
+            # Check for cultural sensitivity
+            sensitivity_check = self.sensitivity_decision(hits)
+            if not sensitivity_check['approved']:
+                results[i] = ValidationResult(
+                    entry_id=entry_id,
+                    validator=self.address,
+                    decision="rejected",
+                    confidence=0.8,
+                    notes=f"Culturally sensitive content: {sensitivity_check['reason']}",
+                    validated_atoms=[]
+                )
+                continue
+            pending.append(i)
+        
+        # Remote consistency checks for the survivors, stopping as soon as the
+        # entry can no longer reach the approval rate aggregate_decisions needs
+        approved = 0
+        undecided = len(pending)
+        
+        def still_reachable(check: Dict[str, Any]) -> bool:
+            nonlocal approved, undecided
+            undecided -= 1
+            approved += 1 if check['consistent'] else 0
+            return (approved + undecided) / len(atoms) >= APPROVAL_RATE_THRESHOLD
+        
+        if pending and len(pending) / len(atoms) >= APPROVAL_RATE_THRESHOLD:
+            checks = await self.check_knowledge_consistency_batch(
+                [atoms[i] for i in pending], context, keep_going=still_reachable
+            )
+        else:
+            checks = [None] * len(pending)
+        
+        for i, consistency_check in zip(pending, checks):
+            if consistency_check is None:
+                results[i] = ValidationResult(
+                    entry_id=entry_id,
                     validator=self.address,
                     decision="rejected",
                     confidence=0.0,
-                    notes=f"Validation error: {str(e)}",
+                    notes="Not checked: entry can no longer reach the approval threshold",
                     validated_atoms=[]
-                ))
+                )
+            elif consistency_check['consistent']:
+                results[i] = ValidationResult(
+                    entry_id=entry_id,
+                    validator=self.address,
+                    decision="approved",
+                    confidence=consistency_check['confidence'],
+                    notes="Atom validated successfully",
+                    validated_atoms=[atoms[i]]
+                )
+            else:
+                results[i] = ValidationResult(
+                    entry_id=entry_id,
+                    validator=self.address,
+                    decision="rejected",
+                    confidence=consistency_check['confidence'],
+                    notes=f"Knowledge inconsistency: {consistency_check['reason']}",
+                    validated_atoms=[]
+                )
         
         return results
     
     def is_valid_atom_syntax(self, atom: str) -> bool:
-        """Return True if atom is a plausible MeTTa expression."""
-        return (atom.startswith('(') and 
-                atom.endswith(')') and 
-                len(atom.split()) >= 2)
+        """Return True if atom is one balanced MeTTa expression with at least two elements."""
+        return parse_atom(atom).valid
     
     async def check_cultural_sensitivity(self, atom: str, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Reject atoms containing basic sensitive terms; otherwise approve."""
-        sensitive_terms = [
-            'sacred', 'secret', 'restricted', 'initiation',
-            'elder_only', 'gender_restricted'
-        ]
-        
-        atom_lower = atom.lower()
-        for term in sensitive_terms:
-            if term in atom_lower:
-                return {
-                    'approved': False,
-                    'reason': f"Contains sensitive term: {term}"
-                }
-        
-        return {'approved': True}
+        """Reject atoms containing the community's sensitive terms; otherwise approve."""
+        hits = get_sensitivity_screen().scan(atom, context.get('community', 'general'))
+        return self.sensitivity_decision(hits)
+    
+    def sensitivity_decision(self, hits: List[str]) -> Dict[str, Any]:
+        """Turn sensitive-term hits for one atom into an approval decision."""
+        if hits:
+            return {
+                'approved': False,
+                'reason': f"Contains sensitive term(s): {', '.join(hits)}",
+                'terms': hits
+            }
+        return {'approved': True, 'terms': []}
+    
+    def consistency_query(self, atom: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Backend query payload used to check one atom for consistency."""
+        return {
+            'query': f"Check consistency for: {atom}",
+            'context': {
+                # Extract key terms from atom for consistency checking
+                'key_terms': self.extract_key_terms(atom),
+                'community': context.get('community', 'general')
+            }
+        }
+    
+    def consistency_from_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Interpret a backend query result as a consistency decision."""
+        # Simple consistency check based on confidence
+        if result.get('confidence', 0) > 0.7:
+            return {
+                'consistent': True,
+                'confidence': result['confidence'],
+                'reason': 'Consistent with existing knowledge'
+            }
+        return {
+            'consistent': False,
+            'confidence': result.get('confidence', 0.3),
+            'reason': 'Low confidence in existing knowledge'
+        }
     
     async def check_knowledge_consistency(self, atom: str, context: Dict[str, Any]) -> Dict[str, Any]:
         """Query backend for a consistency confidence value for the atom."""
         try:
-            # Query existing knowledge for consistency
             query_url = f"{self.backend_url}/api/entries/query"
-            
-            # Extract key terms from atom for consistency checking
-            key_terms = self.extract_key_terms(atom)
-            
-            query_data = {
-                'query': f"Check consistency for: {atom}",
-                'context': {
-                    'key_terms': key_terms,
-                    'community': context.get('community', 'general')
-                }
-            }
-            
-            response = requests.post(query_url, json=query_data)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            # Simple consistency check based on confidence
-            if result.get('confidence', 0) > 0.7:
-                return {
-                    'consistent': True,
-                    'confidence': result['confidence'],
-                    'reason': 'Consistent with existing knowledge'
-                }
-            else:
-                return {
-                    'consistent': False,
-                    'confidence': result.get('confidence', 0.3),
-                    'reason': 'Low confidence in existing knowledge'
-                }
-                
+            result = await get_http_client().post_json(query_url, json=self.consistency_query(atom, context))
+            return self.consistency_from_result(result)
         except Exception as e:
             # If check fails, be conservative and reject
             return {
@@ -215,15 +315,96 @@ class ValidatorAgent(Agent):
                 'reason': f'Consistency check failed: {str(e)}'
             }
     
+    async def check_knowledge_consistency_batch(
+        self,
+        atoms: List[str],
+        context: Dict[str, Any],
+        keep_going: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Consistency decisions for many atoms, in input order.
+
+        Sends the atoms to the batch endpoint in chunks of
+        `consistency_batch_size`; if the backend has no batch endpoint (or a
+        batch call fails) those atoms go through the per-atom endpoint with at
+        most `consistency_concurrency` requests in flight. `keep_going` is
+        called with each decision; once it returns False no further requests
+        are made, in-flight ones are cancelled, and undecided atoms stay None.
+        """
+        checks: List[Optional[Dict[str, Any]]] = [None] * len(atoms)
+        stopped = False
+        
+        def record(i: int, check: Dict[str, Any]):
+            nonlocal stopped
+            checks[i] = check
+            if keep_going is not None and not keep_going(check):
+                stopped = True
+        
+        fallback = []
+        size = max(1, self.consistency_batch_size)
+        for start in range(0, len(atoms), size):
+            if stopped:
+                return checks
+            chunk = list(range(start, min(start + size, len(atoms))))
+            decided = await self._consistency_batch_request([atoms[i] for i in chunk], context)
+            if decided is None:
+                fallback.extend(chunk)
+                continue
+            for i, check in zip(chunk, decided):
+                if check is None:
+                    fallback.append(i)
+                else:
+                    record(i, check)
+        
+        if fallback and not stopped:
+            semaphore = asyncio.Semaphore(max(1, self.consistency_concurrency))
+            
+            async def check_one(i: int):
+                async with semaphore:
+                    if stopped:
+                        # Entry is decided: skip requests not yet sent
+                        return
+                    record(i, await self.check_knowledge_consistency(atoms[i], context))
+            
+            await asyncio.gather(*(check_one(i) for i in fallback), return_exceptions=True)
+        return checks
+    
+    async def _consistency_batch_request(self, atoms: List[str], context: Dict[str, Any]) -> Optional[List[Optional[Dict[str, Any]]]]:
+        """POST one batch; per-atom decisions matched by id (None where missing), or None on failure."""
+        if not atoms or not self.batch_consistency_supported:
+            return None
+        batch_url = f"{self.backend_url}{self.consistency_batch_path}"
+        queries = [dict(self.consistency_query(atom, context), id=i) for i, atom in enumerate(atoms)]
+        try:
+            response = await get_http_client().post_json(batch_url, json={'queries': queries})
+        except aiohttp.ClientResponseError as e:
+            if e.status in _BATCH_UNSUPPORTED:
+                logger.info(f"Batch consistency endpoint unavailable ({e.status}); using per-atom queries")
+                self.batch_consistency_supported = False
+            else:
+                logger.warning(f"Batch consistency request failed: {e}")
+            return None
+        except Exception as e:
+            logger.warning(f"Batch consistency request failed: {e}")
+            return None
+        
+        decided: List[Optional[Dict[str, Any]]] = [None] * len(atoms)
+        items = response.get('results', []) if isinstance(response, dict) else response
+        for position, item in enumerate(items or []):
+            if not isinstance(item, dict):
+                continue
+            index = item.get('id', position)
+            if isinstance(index, int) and 0 <= index < len(atoms) and decided[index] is None:
+                decided[index] = self.consistency_from_result(item)
+        return decided
+    
     def extract_key_terms(self, atom: str) -> List[str]:
         """Extract key terms from an atom, filtering common predicates."""
-        # Remove parentheses and split
-        content = atom[1:-1].strip()
-        terms = content.split()
+        # Top-level elements from the shared (cached) parse
+        terms = parse_atom(atom).terms
         
         # Filter out common predicates
         common_predicates = ['is_a', 'has', 'treats', 'found_in', 'used_for']
-        key_terms = [term.strip('"') for term in terms if term not in common_predicates]
+        key_terms = [term for term in terms if term not in common_predicates]
         
         return key_terms
     
@@ -241,7 +422,7 @@ class ValidatorAgent(Agent):
         avg_confidence = sum(r.confidence for r in results) / total_count if total_count > 0 else 0
         
         # Make decision based on approval rate and confidence
-        if approval_rate >= 0.7 and avg_confidence >= 0.6:
+        if approval_rate >= APPROVAL_RATE_THRESHOLD and avg_confidence >= CONFIDENCE_THRESHOLD:
             decision = 'approved'
         else:
             decision = 'rejected'
@@ -255,7 +436,7 @@ class ValidatorAgent(Agent):
         }
     
     async def update_backend(self, entry_id: int, decision: Dict[str, Any], results: List[ValidationResult]):
-        """POST aggregate validation decision and metadata to backend."""
+        """Queue a POST of the aggregate decision and metadata (coalesced by the backend writer)."""
         update_url = f"{self.backend_url}/api/validate/{entry_id}"
         
         data = {
@@ -265,8 +446,7 @@ class ValidatorAgent(Agent):
             'confidence': decision['confidence']
         }
         
-        response = requests.post(update_url, json=data)
-        response.raise_for_status()
+        await get_backend_writer().submit("POST", update_url, 'validation', entry_id, data)
     
     def load_community_validators(self) -> Dict[str, List[str]]:
         """Return a static mapping of communities to validator sets (placeholder)."""
@@ -277,16 +457,18 @@ class ValidatorAgent(Agent):
             'maasai': ['maasai_elder1', 'maasai_elder2']
         }
     
-    @self.on_interval(period=120.0)
+    async def flush_writes(self, ctx: Context):
+        """Flush buffered backend writes before the agent stops."""
+        await flush_backend_writer()
+    
     async def update_validator_list(self, ctx: Context):
         """Fetch updated validator lists from backend periodically."""
         try:
             validators_url = f"{self.backend_url}/api/validators"
-            response = requests.get(validators_url)
-            
-            if response.status_code == 200:
-                new_validators = response.json()
-                self.community_validators = new_validators
+            async with get_http_client().request("GET", validators_url, raise_for_status=False) as response:
+                if response.status == 200:
+                    new_validators = await response.json()
+                    self.community_validators = new_validators
                 ctx.logger.info("Updated validator list from backend")
                 
         except Exception as e:
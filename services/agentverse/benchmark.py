@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the AfriVerse agents
+Run from services/agentverse so the `agents` package is importable.
+
+Usage:
+    python benchmark.py atoms --atoms 50000
+    python benchmark.py sensitivity --atoms 20000 --terms 3000
+    python benchmark.py consistency --atoms 50 --latency-ms 20
+    python benchmark.py messages --atoms 100 --entries 200
+    python benchmark.py writes --entries 500 --updates 4 --latency-ms 5
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+from agents.atom_syntax import parse_atom
+from agents.sensitivity import DEFAULT_TERMS, SensitivityScreen
+from agents.validation_batch import columns_from_results, results_from_columns
+
+PREDICATES = ["plant", "property", "treats", "used_for", "found_in", "has_local_name"]
+TERMS = ["aloe_vera", "neem", "moringa", "soothing", "burn", "malaria", "eastern_africa", "first_aid"]
+
+def generate_atoms(count: int, invalid_ratio: float = 0.1, seed: int = 7) -> List[str]:
+    """Symbolizer-style atoms with irregular spacing and some malformed ones."""
+    rng = random.Random(seed)
+    atoms = []
+    for i in range(count):
+        predicate = rng.choice(PREDICATES)
+        args = " ".join(f'"{rng.choice(TERMS)}_{i % 500}"' for _ in range(rng.randint(1, 3)))
+        atom = f"({predicate}  {args} )"
+        roll = rng.random()
+        if roll < invalid_ratio / 2:
+            atom = atom[:-1]
+        elif roll < invalid_ratio:
+            atom = f"({predicate} (nested {args})"
+        atoms.append(atom)
+    return atoms
+
+def legacy_is_valid_atom(atom: str) -> bool:
+    """The original first/last character and split() check."""
+    return (atom.startswith('(') and
+            atom.endswith(')') and
+            len(atom.split()) >= 2)
+
+def _time(label: str, fn: Callable[[], object], units: int, unit: str) -> Dict[str, float]:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    rate = units / elapsed if elapsed else float("inf")
+    print(f"{label:<32} {elapsed:8.3f}s  {rate:12.0f} {unit}/s")
+    return {"seconds": elapsed, "rate": rate}
+
+def bench_atoms(atom_count: int):
+    """Throughput of the shared atom parser (cold and cached) against the old check."""
+    atoms = generate_atoms(atom_count)
+    print(f"Validating {len(atoms)} atoms (cache holds {parse_atom.cache_info().maxsize})")
+
+    _time("legacy startswith/split check", lambda: [legacy_is_valid_atom(a) for a in atoms], len(atoms), "atoms")
+    parse_atom.cache_clear()
+    _time("parse_atom (cold cache)", lambda: [parse_atom(a) for a in atoms], len(atoms), "atoms")
+    # The Validator re-checks the atoms the Symbolizer already parsed
+    _time("parse_atom (warm cache)", lambda: [parse_atom(a) for a in atoms], len(atoms), "atoms")
+
+    legacy_accepted = sum(legacy_is_valid_atom(a) for a in atoms)
+    accepted = sum(parse_atom(a).valid for a in atoms)
+    print(f"accepted: legacy {legacy_accepted}, parser {accepted} "
+          f"({legacy_accepted - accepted} unbalanced atoms no longer let through)")
+    print(f"cache: {parse_atom.cache_info()}")
+
+def bench_sensitivity(atom_count: int, term_count: int):
+    """Batch Aho-Corasick screening against the per-term substring loop."""
+    terms = DEFAULT_TERMS['general'] + [f"taboo_{i}" for i in range(term_count)]
+    screen = SensitivityScreen({'general': DEFAULT_TERMS['general'], 'bench': terms}, terms_file="")
+    atoms = generate_atoms(atom_count)
+    # Sprinkle hits so both paths do real work
+    atoms = [f'{a[:-1]} "taboo_{i * 7 % (term_count * 2)}")' if i % 10 == 0 else a for i, a in enumerate(atoms)]
+    print(f"Screening {len(atoms)} atoms against {len(terms)} terms")
+
+    def substring_loop():
+        return [[t for t in terms if t in atom.lower()] for atom in atoms]
+
+    screen.automaton('bench')
+    loop = _time("per-term substring loop", substring_loop, len(atoms), "atoms")
+    batch = _time("scan_batch (one pass)", lambda: screen.scan_batch(atoms, 'bench'), len(atoms), "atoms")
+    print(f"speedup: {batch['rate'] / loop['rate']:.1f}x, automaton builds: {screen.rebuilds}")
+
+async def _start_stub_backend(latency: float, batch_route: bool):
+    """Local aiohttp backend with the per-atom consistency endpoint and, optionally, a batch one.
+
+    services/backend/src/routes/entries.js only has `POST /api/entries/query`,
+    so `batch_route=False` is what the validator meets in production.
+    """
+    from aiohttp import web
+
+    requests = {"single": 0, "batch": 0}
+
+    def answer(query: dict) -> dict:
+        # Deterministic confidence so every strategy reaches the same decisions
+        return {"confidence": 0.5 + (len(query.get("query", "")) % 5) / 10}
+
+    async def single(request):
+        requests["single"] += 1
+        await asyncio.sleep(latency)
+        return web.json_response(answer(await request.json()))
+
+    async def batch(request):
+        requests["batch"] += 1
+        await asyncio.sleep(latency)
+        queries = (await request.json())["queries"]
+        return web.json_response({"results": [dict(answer(q), id=q["id"]) for q in queries]})
+
+    app = web.Application()
+    app.router.add_post("/api/entries/query", single)
+    if batch_route:
+        app.router.add_post("/api/entries/query/batch", batch)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", requests
+
+async def _bench_consistency(atom_count: int, latency: float, concurrency: int):
+    from agents.http_client import close_http_client
+    from agents.validator_agent import validator_agent
+
+    atoms = [a for a in generate_atoms(atom_count * 2, invalid_ratio=0) if parse_atom(a).valid][:atom_count]
+    context = {"community": "general"}
+    backends = {batch_route: await _start_stub_backend(latency, batch_route) for batch_route in (False, True)}
+
+    async def sequential():
+        return [await validator_agent.check_knowledge_consistency(a, context) for a in atoms]
+
+    async def batch_or_fallback():
+        # Fresh per run: a 404 from the batch endpoint switches batching off
+        validator_agent.batch_consistency_supported = True
+        return await validator_agent.check_knowledge_consistency_batch(atoms, context)
+
+    strategies = (
+        ("sequential per-atom checks", False, sequential),
+        (f"no batch route, fallback (x{concurrency})", False, batch_or_fallback),
+        ("batch endpoint", True, batch_or_fallback)
+    )
+    validator_agent.consistency_concurrency = concurrency
+    try:
+        print(f"Consistency checks for {len(atoms)} atoms, {latency * 1000:.0f} ms backend latency")
+        decisions = {}
+        for label, batch_route, strategy in strategies:
+            _, base, requests = backends[batch_route]
+            validator_agent.backend_url = base
+            before = dict(requests)
+            started = time.perf_counter()
+            checks = await strategy()
+            elapsed = time.perf_counter() - started
+            sent = {kind: requests[kind] - before[kind] for kind in requests}
+            print(f"{label:<36} {elapsed:8.3f}s  requests: {sent['single']} per-atom, {sent['batch']} batch")
+            decisions[label] = [(c["consistent"], c["confidence"]) for c in checks]
+        print("results match:", len({tuple(d) for d in decisions.values()}) == 1)
+    finally:
+        await close_http_client()
+        for runner, _, _ in backends.values():
+            await runner.cleanup()
+
+def bench_consistency(atom_count: int, latency_ms: float, concurrency: int):
+    """The Validator Agent's consistency checks against stub backends with and without a batch route."""
+    asyncio.run(_bench_consistency(atom_count, latency_ms / 1000, concurrency))
+
+def bench_messages(atom_count: int, entry_count: int):
+    """Messages and JSON serialization: one ValidationResult per atom vs one columnar batch."""
+    rng = random.Random(3)
+    validator = "agent1q" + "x" * 56
+    reasons = [
+        "Atom validated successfully",
+        "Knowledge inconsistency: Low confidence in existing knowledge",
+        "Culturally sensitive content: Contains sensitive term(s): sacred"
+    ]
+    entries = []
+    for entry_id in range(entry_count):
+        atoms = generate_atoms(atom_count, invalid_ratio=0, seed=entry_id)
+        results = []
+        for atom in atoms:
+            approved = rng.random() < 0.8
+            results.append(SimpleNamespace(
+                entry_id=entry_id, validator=validator,
+                decision="approved" if approved else "rejected",
+                confidence=round(rng.uniform(0.5, 1.0), 3),
+                notes=reasons[0] if approved else rng.choice(reasons[1:]),
+                validated_atoms=[atom] if approved else []
+            ))
+        entries.append((entry_id, atoms, results))
+
+    def single_messages():
+        return [json.dumps(vars(result)) for _, _, results in entries for result in results]
+
+    def batch_messages():
+        return [json.dumps(dict(
+            entry_id=entry_id, validator=validator, decision="approved", confidence=0.8, approval_rate=0.8,
+            error=None, **columns_from_results(atoms, results)
+        )) for entry_id, atoms, results in entries]
+
+    print(f"{entry_count} entries x {atom_count} atoms")
+    single_payloads = single_messages()
+    batch_payloads = batch_messages()
+    single = _time("per-atom ValidationResult", single_messages, len(single_payloads), "msgs")
+    batch = _time("ValidationBatchResult", batch_messages, len(batch_payloads), "msgs")
+    print(f"messages: {len(single_payloads)} -> {len(batch_payloads)}; "
+          f"bytes: {sum(map(len, single_payloads))} -> {sum(map(len, batch_payloads))}; "
+          f"serialization time: {single['seconds'] / batch['seconds']:.1f}x faster")
+
+    decoded = results_from_columns(json.loads(batch_payloads[0]))
+    _, _, results = entries[0]
+    assert [(d['decision'], d['confidence'], d['notes']) for d in decoded] == \
+        [(r.decision, r.confidence, r.notes) for r in results]
+
+async def _bench_writes(entry_count: int, updates: int, latency: float):
+    from aiohttp import web
+    from agents.backend_writer import BackendWriter
+    from agents.http_client import close_http_client, get_http_client
+
+    received = []
+
+    async def update(request):
+        await asyncio.sleep(latency)
+        received.append(request.path)
+        return web.json_response({"success": True})
+
+    app = web.Application()
+    app.router.add_patch("/api/submit/{entry_id}/{field}", update)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    # Bulk reprocessing: each entry's transcript and atoms are rewritten several times
+    writes = [
+        (f"{base}/api/submit/{entry_id}/{field}", entry_id, {"status": f"{field}-{i}"})
+        for i in range(updates) for entry_id in range(entry_count) for field in ("transcript", "atoms")
+    ]
+    try:
+        print(f"{len(writes)} updates for {entry_count} entries, {latency * 1000:.0f} ms backend latency")
+        started = time.perf_counter()
+        for url, _, data in writes:
+            await get_http_client().patch_json(url, json=data)
+        direct = time.perf_counter() - started
+        direct_requests = len(received)
+        received.clear()
+
+        with tempfile.TemporaryDirectory() as spool_dir:
+            writer = BackendWriter(write_behind=True, flush_seconds=60, max_pending=10 ** 6,
+                                   spool_path=f"{spool_dir}/spool.sqlite3")
+            started = time.perf_counter()
+            for url, entry_id, data in writes:
+                await writer.submit("PATCH", url, url.rsplit("/", 1)[1], entry_id, data)
+            await writer.close()
+            buffered = time.perf_counter() - started
+        print(f"{'one PATCH per update':<32} {direct:8.3f}s  {direct_requests} requests")
+        print(f"{'coalescing backend writer':<32} {buffered:8.3f}s  {len(received)} requests")
+        print(f"stats: {writer.stats()}")
+    finally:
+        await close_http_client()
+        await runner.cleanup()
+
+def bench_writes(entry_count: int, updates: int, latency_ms: float):
+    """Per-update PATCHes against the coalescing write-behind buffer on a stub backend."""
+    asyncio.run(_bench_writes(entry_count, updates, latency_ms / 1000))
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    atoms = sub.add_parser("atoms", help="atom syntax validation throughput")
+    atoms.add_argument("--atoms", type=int, default=50000)
+
+    sensitivity = sub.add_parser("sensitivity", help="sensitive-term screening throughput")
+    sensitivity.add_argument("--atoms", type=int, default=20000)
+    sensitivity.add_argument("--terms", type=int, default=3000)
+
+    consistency = sub.add_parser("consistency", help="consistency-check round trips against a stub backend")
+    consistency.add_argument("--atoms", type=int, default=50)
+    consistency.add_argument("--latency-ms", type=float, default=20)
+    consistency.add_argument("--concurrency", type=int, default=8)
+
+    messages = sub.add_parser("messages", help="validation result message count and serialization")
+    messages.add_argument("--atoms", type=int, default=100)
+    messages.add_argument("--entries", type=int, default=200)
+
+    writes = sub.add_parser("writes", help="backend update requests with and without the write-behind buffer")
+    writes.add_argument("--entries", type=int, default=500)
+    writes.add_argument("--updates", type=int, default=4)
+    writes.add_argument("--latency-ms", type=float, default=5)
+
+    args = parser.parse_args()
+    if args.command == "atoms":
+        bench_atoms(args.atoms)
+    elif args.command == "sensitivity":
+        bench_sensitivity(args.atoms, args.terms)
+    elif args.command == "consistency":
+        bench_consistency(args.atoms, args.latency_ms, args.concurrency)
+    elif args.command == "messages":
+        bench_messages(args.atoms, args.entries)
+    elif args.command == "writes":
+        bench_writes(args.entries, args.updates, args.latency_ms)
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ Main script to run all AfriVerse agents
 from agents.ingest_agent import ingest_agent
 from agents.symbolizer_agent import symbolizer_agent
 from agents.query_agent import query_agent
+from agents.orchestrator_agent import orchestrator_agent
 from uagents import Bureau
 
 def main():
@@ -15,11 +16,13 @@ def main():
     bureau.add(ingest_agent)
     bureau.add(symbolizer_agent)
     bureau.add(query_agent)
+    bureau.add(orchestrator_agent)
     
     print("Starting AfriVerse Agent Bureau...")
     print(f" - Ingest Agent: {ingest_agent.address}")
     print(f" - Symbolizer Agent: {symbolizer_agent.address}")
     print(f" - Query Agent: {query_agent.address}")
+    print(f" - Orchestrator Agent: {orchestrator_agent.address}")
     print("Agents are running...")
     
     # Run all agents
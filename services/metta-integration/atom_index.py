@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Secondary indexes over the AfriVerse knowledge base
+Maps predicate -> facts and (predicate, first argument) -> facts so counts and
+per-entity lookups avoid full AtomSpace match scans
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, Hashable, List, Set, Tuple
+
+Fact = Tuple[Any, ...]
+
+def _key(value: Any) -> Hashable:
+    """Index key for an argument value (unhashable values fall back to str)."""
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return str(value)
+
+class AtomIndex:
+    def __init__(self):
+        """Create empty predicate and (predicate, subject) indexes"""
+        self._by_predicate: Dict[Hashable, List[Fact]] = defaultdict(list)
+        self._by_subject: Dict[Tuple[Hashable, Hashable], List[Fact]] = defaultdict(list)
+        self.size = 0
+
+    def add(self, fact: Any) -> bool:
+        """Index a fact given as a value tuple `(predicate, arg1, ...)`"""
+        if not isinstance(fact, tuple) or not fact:
+            return False
+        predicate = _key(fact[0])
+        self._by_predicate[predicate].append(fact)
+        if len(fact) > 1:
+            self._by_subject[(predicate, _key(fact[1]))].append(fact)
+        self.size += 1
+        return True
+
+    def count(self, predicate: str) -> int:
+        """Number of facts with this predicate, O(1)"""
+        facts = self._by_predicate.get(predicate)
+        return len(facts) if facts else 0
+
+    def facts(self, predicate: str) -> List[Fact]:
+        """All facts with this predicate"""
+        return list(self._by_predicate.get(predicate, ()))
+
+    def lookup(self, predicate: str, subject: Any) -> List[Fact]:
+        """Facts `(predicate subject ...)`, O(k) in the number of matches"""
+        return list(self._by_subject.get((predicate, _key(subject)), ()))
+
+    def objects(self, predicate: str, subject: Any) -> List[Any]:
+        """Second arguments of `(predicate subject object)` facts"""
+        return [fact[2] for fact in self._by_subject.get((predicate, _key(subject)), ()) if len(fact) > 2]
+
+    def objects_many(self, predicates: List[str], subjects: List[Any]) -> Dict[Any, Dict[str, List[Any]]]:
+        """`{subject: {predicate: [objects]}}` for every subject/predicate pair"""
+        by_subject = self._by_subject
+        result = {}
+        for subject in subjects:
+            key = _key(subject)
+            result[subject] = {
+                predicate: [fact[2] for fact in by_subject.get((predicate, key), ()) if len(fact) > 2]
+                for predicate in predicates
+            }
+        return result
+
+    def has_subject(self, predicate: str, subject: Any) -> bool:
+        return (predicate, _key(subject)) in self._by_subject
+
+    def subjects(self) -> Set[Hashable]:
+        """Distinct first arguments over all predicates"""
+        return {subject for _, subject in self._by_subject}
+
+    def predicates(self) -> Dict[Hashable, int]:
+        """Fact count per predicate"""
+        return {predicate: len(facts) for predicate, facts in self._by_predicate.items()}
+
+    def clear(self):
+        """Drop all indexed facts"""
+        self._by_predicate.clear()
+        self._by_subject.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
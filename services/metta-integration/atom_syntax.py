@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Text-level MeTTa atom syntax helpers for the AfriVerse knowledge base
+Splits expressions into tokens (parentheses, string literals and other
+tokens) for the query cache and shard routing, and reads the value tuple of a
+flat atom `(predicate arg ...)` straight from its text with one regex match,
+so the loaders do not have to walk the parsed hyperon atom through the FFI
+just to index it
+"""
+
+import re
+from typing import Any, List, Optional, Tuple
+
+_STRING = r'"(?:[^"\\]|\\.)*"'
+_TOKEN = re.compile(_STRING + r'|[()]|[^\s()"]+')
+_FLAT = re.compile(r'\s*\(\s*([^\s()"$]+)((?:\s+(?:' + _STRING + r'|[^\s()"]+))+)\s*\)\s*')
+_FLAT_ARG = re.compile(_STRING + r'|[^\s()"]+')
+# Tokens the runtime turns into grounded values (numbers, booleans); their
+# Python value is left to atom_to_value
+_GROUNDED_LITERAL = re.compile(r'[+-]?\d|True$|False$')
+
+def tokenize(text: str) -> List[str]:
+    """Tokens of a MeTTa expression: `(`, `)`, string literals (with their quotes) and other tokens"""
+    return _TOKEN.findall(text)
+
+def flat_fact(text: str) -> Optional[Tuple[Any, ...]]:
+    """Value tuple of a flat atom with symbol/string arguments, or None.
+
+    Gives the same tuple as `atom_to_value` on the parsed atom: symbols by
+    name, string literals without their quotes. Nested expressions, numbers
+    and booleans return None so the caller converts the parsed atom instead.
+    """
+    match = _FLAT.fullmatch(text)
+    if match is None or _GROUNDED_LITERAL.match(match.group(1)):
+        return None
+    fact = [match.group(1)]
+    for token in _FLAT_ARG.findall(match.group(2)):
+        if token[0] == '"':
+            fact.append(token[1:-1])
+        elif _GROUNDED_LITERAL.match(token):
+            return None
+        else:
+            fact.append(token)
+    return tuple(fact)
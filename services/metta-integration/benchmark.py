@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the AfriVerse MeTTa client
+Runs against a synthetic plant-medicine corpus; requires hyperon.
+
+Usage:
+    python benchmark.py ingest --atoms 20000
+    python benchmark.py warmstart --atoms 200000
+    python benchmark.py profiles --atoms 20000 --plants 200
+    python benchmark.py shards --atoms 20000
+"""
+
+import argparse
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from atom_syntax import flat_fact
+from metta_client import AfriVerseMeTTa, MeTTaClient
+from sharding import COMMUNITY, REGION, ShardedMeTTaClient
+
+PROPERTIES = ["antibacterial", "antifungal", "soothing", "cooling", "bitter"]
+CONDITIONS = ["burn", "malaria", "skin_disease", "fever", "cough", "headache"]
+USES = ["first_aid", "traditional_tea", "pesticide", "toothcare"]
+REGIONS = ["eastern_africa", "western_africa", "dry_regions", "highlands"]
+
+def generate_corpus(atom_count: int) -> List[str]:
+    """Generate roughly `atom_count` plant-medicine atoms (8 per plant)."""
+    atoms = []
+    plant = 0
+    while len(atoms) < atom_count:
+        name = f"plant_{plant}"
+        atoms.extend([
+            f'(plant "{name}")',
+            f'(has_local_name "{name}" "local_{plant}")',
+            f'(property "{name}" "{PROPERTIES[plant % len(PROPERTIES)]}")',
+            f'(property "{name}" "{PROPERTIES[(plant + 2) % len(PROPERTIES)]}")',
+            f'(treats "{name}" "{CONDITIONS[plant % len(CONDITIONS)]}")',
+            f'(used_for "{name}" "{USES[plant % len(USES)]}")',
+            f'(found_in "{name}" "{REGIONS[plant % len(REGIONS)]}")',
+            f'(found_in "{name}" "{REGIONS[(plant + 1) % len(REGIONS)]}")'
+        ])
+        plant += 1
+    return atoms[:atom_count]
+
+def legacy_add_atoms(client: MeTTaClient, atoms: List[str]):
+    """The original ingestion loop: one `metta.run` per atom."""
+    for atom in atoms:
+        client.metta.run(atom)
+        client.atom_count += 1
+
+def _time(label: str, fn: Callable[[], object], units: int, unit: str) -> Dict[str, float]:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    rate = units / elapsed if elapsed else float("inf")
+    print(f"{label:<28} {elapsed:8.3f}s  {rate:12.0f} {unit}/s")
+    return {"seconds": elapsed, "rate": rate}
+
+def bench_ingest(atom_count: int):
+    """Compare per-atom `metta.run` against the batched `add_atoms` loader."""
+    atoms = generate_corpus(atom_count)
+    print(f"Ingesting {len(atoms)} atoms")
+
+    legacy = _time("per-atom metta.run loop", lambda: legacy_add_atoms(MeTTaClient(), atoms), len(atoms), "atoms")
+    batched = _time("batched add_atoms", lambda: MeTTaClient().add_atoms(atoms), len(atoms), "atoms")
+    print(f"speedup: {batched['rate'] / legacy['rate']:.1f}x")
+
+    # Where the batched loader spends its time
+    client = MeTTaClient()
+    chunks = [atoms[i:i + client.batch_size] for i in range(0, len(atoms), client.batch_size)]
+    parsed = []
+    _time("  parse_all per batch", lambda: [parsed.extend(client.metta.parse_all("\n".join(chunk))) for chunk in chunks], len(atoms), "atoms")
+    _time("  space.add_atom", lambda: [client.space.add_atom(atom) for atom in parsed], len(atoms), "atoms")
+    _time("  flat_fact + index.add", lambda: [client.index.add(flat_fact(text)) for text in atoms], len(atoms), "atoms")
+
+def bench_warmstart(atom_count: int):
+    """Compare replaying the corpus through add_atoms with restoring a snapshot."""
+    atoms = generate_corpus(atom_count)
+    with tempfile.TemporaryDirectory() as directory:
+        client = MeTTaClient(snapshot_dir=directory)
+        client.add_atoms(atoms)
+        written = client.save_snapshot()
+        print(f"Snapshot of {written['atoms']} atoms: {written['bytes']} bytes")
+
+        replay = _time("replay via add_atoms", lambda: MeTTaClient().add_atoms(atoms), len(atoms), "atoms")
+        restore = _time("restore from snapshot", lambda: MeTTaClient(snapshot_dir=directory), len(atoms), "atoms")
+    print(f"speedup: {restore['rate'] / replay['rate']:.1f}x")
+
+def legacy_plant_properties(client: MeTTaClient, plant: str) -> Dict[str, List]:
+    """The original per-plant lookup: three match queries against the space."""
+    def objects(predicate: str) -> List:
+        return [m['value'] for m in client.iter_query(f'({predicate} "{plant}" ?value)')]
+    return {
+        'plant': plant,
+        'properties': objects('property'),
+        'uses': objects('used_for'),
+        'regions': objects('found_in')
+    }
+
+def bench_profiles(atom_count: int, plant_count: int):
+    """Compare the per-plant query loop with batched get_plant_profiles."""
+    metta = AfriVerseMeTTa()
+    metta.add_cultural_knowledge(generate_corpus(atom_count))
+    plants = [f"plant_{i}" for i in range(plant_count)]
+    print(f"Profiles for {len(plants)} plants over {metta.client.get_atom_count()} atoms")
+
+    loop = _time("per-plant query loop", lambda: [legacy_plant_properties(metta.client, p) for p in plants], len(plants), "plants")
+    batch = _time("get_plant_profiles", lambda: metta.get_plant_profiles(plants), len(plants), "plants")
+    print(f"speedup: {batch['rate'] / loop['rate']:.1f}x")
+
+def _sorted_matches(result: Dict) -> List:
+    return sorted(tuple(sorted(m.items())) for m in result["matches"])
+
+def bench_shards(atom_count: int):
+    """In-process harness: sharded results must equal a single space, and routing must skip shards."""
+    atoms = generate_corpus(atom_count)
+    communities = ["general", "kikuyu", "maasai"]
+    patterns = [
+        '(treats ?plant "burn")',
+        '(property "plant_7" ?value)',
+        '(found_in ?plant "highlands")',
+        '(used_for "plant_3" ?use)',
+        '(no_such_predicate ?x)'
+    ]
+    single = MeTTaClient(snapshot_dir="")
+    single.add_atoms(atoms)
+
+    for key, shard_names in ((COMMUNITY, communities), (REGION, REGIONS + ["general"])):
+        sharded = ShardedMeTTaClient(shard_names, key=key, default_shard="general", snapshot_dir="")
+        if key == COMMUNITY:
+            # Round-robin plants across communities, 8 atoms per plant
+            for i in range(0, len(atoms), 8):
+                sharded.add_atoms(atoms[i:i + 8], community=communities[(i // 8) % len(communities)])
+        else:
+            sharded.add_atoms(atoms)
+        print(f"{key} shards: {sharded.stats()['atoms']}")
+
+        _check_shards(single, sharded, patterns)
+
+        _time(f"  single space ({key} patterns)", lambda: [list(single.iter_query(p)) for p in patterns], len(patterns), "queries")
+        _time(f"  sharded ({key} patterns)", lambda: [
+            [list(sharded.shards[n].iter_query(p)) for n in sharded._candidate_shards(p)] for p in patterns
+        ], len(patterns), "queries")
+        stats = sharded.stats()
+        print(f"  shards queried {stats['shards_queried']}, skipped {stats['shards_skipped']}")
+
+    # Region placement must survive a restart: reopen from snapshots, add the
+    # second half of the corpus in another order, and compare again
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        half = len(atoms) // 2
+        first = ShardedMeTTaClient(REGIONS + ["general"], key=REGION, default_shard="general", snapshot_dir=snapshot_dir)
+        first.add_atoms(atoms[:half])
+        reopened = ShardedMeTTaClient(REGIONS + ["general"], key=REGION, default_shard="general", snapshot_dir=snapshot_dir)
+        reopened.add_atoms(atoms[half:][::-1])
+        print("region shards after restart:")
+        _check_shards(single, reopened, patterns)
+
+def _check_shards(single: MeTTaClient, sharded: ShardedMeTTaClient, patterns: List[str]):
+    """Sharded query results must equal the single space's; fails loudly otherwise."""
+    mismatches = []
+    for pattern in patterns:
+        expected = _sorted_matches(single.query(pattern))
+        result = sharded.query(pattern)
+        ok = _sorted_matches(result) == expected
+        if not ok:
+            mismatches.append(pattern)
+        print(f"  {pattern:<32} {len(expected):6d} matches  shards={result['shards']}  {'ok' if ok else 'MISMATCH'}")
+    if mismatches:
+        raise AssertionError(f"sharded results differ from a single space for: {', '.join(mismatches)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="MeTTa client benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest", help="atoms/sec of add_atoms vs the per-atom loop")
+    ingest.add_argument("--atoms", type=int, default=20000)
+
+    warmstart = sub.add_parser("warmstart", help="restart time: snapshot restore vs replaying add_atoms")
+    warmstart.add_argument("--atoms", type=int, default=200000)
+
+    profiles = sub.add_parser("profiles", help="plant profile retrieval: batch vs per-plant queries")
+    profiles.add_argument("--atoms", type=int, default=20000)
+    profiles.add_argument("--plants", type=int, default=200)
+
+    shards = sub.add_parser("shards", help="sharded vs single-space query results and routing")
+    shards.add_argument("--atoms", type=int, default=20000)
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        bench_ingest(args.atoms)
+    elif args.command == "warmstart":
+        bench_warmstart(args.atoms)
+    elif args.command == "profiles":
+        bench_profiles(args.atoms, args.plants)
+    elif args.command == "shards":
+        bench_shards(args.atoms)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Thread-safe pool of MeTTa clients for concurrent query serving
+A single writer client applies ingest batches; reader replicas are checked out
+exclusively, one per thread, and catch up on committed batches when checked
+out, so every read sees one consistent snapshot of the space. Async callers go
+through a thread pool executor.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from metta_client import MeTTaClient
+from query_cache import is_pure_expression
+
+class _Replica:
+    def __init__(self, client: MeTTaClient, version: int):
+        self.client = client
+        # Number of committed batches already applied to this replica
+        self.version = version
+
+class MeTTaClientPool:
+    def __init__(self, size: int = None, snapshot_dir: str = None, checkout_timeout: float = 30.0):
+        """Create a writer plus `size` reader replicas (METTA_POOL_SIZE, default 4).
+
+        The writer restores `snapshot_dir` (or METTA_SNAPSHOT_DIR) if set;
+        replicas never touch the snapshot files and are seeded from the
+        writer's space.
+        """
+        self.size = size or int(os.getenv("METTA_POOL_SIZE", "4"))
+        self.checkout_timeout = checkout_timeout
+        self.writer = MeTTaClient(snapshot_dir=snapshot_dir)
+        self._write_lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        # Committed batches not yet applied by every replica; entry i is version base + i + 1
+        self._log: List[List[str]] = []
+        self._log_base = 0
+        self.version = 0
+
+        seed = [str(atom) for atom in self.writer.space.get_atoms()]
+        self._replicas: List[_Replica] = []
+        self._idle: "queue.Queue[_Replica]" = queue.Queue()
+        for _ in range(self.size):
+            client = MeTTaClient(snapshot_dir="")
+            if seed:
+                seeded = client.add_atoms(seed)
+                if seeded.get("added", 0) != len(seed):
+                    print(f"Warning: replica seeded with {seeded.get('added', 0)} of {len(seed)} atoms: {seeded['error']}")
+            replica = _Replica(client, 0)
+            self._replicas.append(replica)
+            self._idle.put(replica)
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="metta-reader")
+
+    # Writes -----------------------------------------------------------------
+
+    def add_atoms(self, atoms: List[str]) -> Dict[str, Any]:
+        """Ingest a batch through the single writer and commit it for readers"""
+        with self._write_lock:
+            result = self.writer.add_atoms(atoms)
+            rejected = {failure["index"] for failure in result.get("failed", [])}
+            committed = [atom for i, atom in enumerate(atoms) if i not in rejected]
+            if result.get("added"):
+                with self._log_lock:
+                    self._log.append(committed[:result["added"]])
+                    self.version += 1
+        return result
+
+    def save_snapshot(self) -> Dict[str, Any]:
+        with self._write_lock:
+            return self.writer.save_snapshot()
+
+    # Reads ------------------------------------------------------------------
+
+    @contextmanager
+    def reader(self) -> Iterator[MeTTaClient]:
+        """Check out a replica brought up to the latest committed version.
+
+        Batches committed while it is checked out are not applied until the
+        next checkout, so all reads inside the block see the same snapshot.
+        """
+        try:
+            replica = self._idle.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"no MeTTa reader available after {self.checkout_timeout}s")
+        try:
+            self._catch_up(replica)
+            yield replica.client
+        finally:
+            self._idle.put(replica)
+
+    def _catch_up(self, replica: _Replica):
+        with self._log_lock:
+            pending = self._log[replica.version - self._log_base:]
+            target = self.version
+        for batch in pending:
+            replica.client.add_atoms(batch)
+        replica.version = target
+        self._trim_log()
+
+    def _trim_log(self):
+        """Drop batches every replica has applied"""
+        with self._log_lock:
+            applied = min(replica.version for replica in self._replicas)
+            if applied > self._log_base:
+                del self._log[:applied - self._log_base]
+                self._log_base = applied
+
+    def query(self, pattern: str) -> Dict[str, Any]:
+        with self.reader() as client:
+            return client.query(pattern)
+
+    def evaluate(self, expression: str) -> Dict[str, Any]:
+        """Evaluate a side-effect-free expression on a replica"""
+        if not is_pure_expression(expression):
+            return {
+                "success": False,
+                "error": "expression may modify the space or have side effects; use add_atoms on the writer",
+                "result": None
+            }
+        with self.reader() as client:
+            return client.evaluate(expression)
+
+    # Asyncio ----------------------------------------------------------------
+
+    async def aquery(self, pattern: str) -> Dict[str, Any]:
+        """`query` on a reader thread, so concurrent callers run in parallel"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.query, pattern)
+
+    async def aevaluate(self, expression: str) -> Dict[str, Any]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.evaluate, expression)
+
+    async def aadd_atoms(self, atoms: List[str]) -> Dict[str, Any]:
+        # Writes use the default executor so they never wait behind queued reads
+        return await asyncio.get_running_loop().run_in_executor(None, self.add_atoms, atoms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._log_lock:
+            return {
+                "readers": self.size,
+                "idle_readers": self._idle.qsize(),
+                "version": self.version,
+                "pending_batches": len(self._log),
+                "replica_versions": [replica.version for replica in self._replicas]
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Rule-based inference for the AfriVerse knowledge base
+Rules are ordinary atoms of the form `(implies <premise> <conclusion>)` or
+`(implies (and <premise> ...) <conclusion>)` with `?var`/`$var` variables.
+In eager mode derived facts are materialized into the space and kept up to
+date incrementally as atoms arrive, so reads are index lookups; in lazy mode
+goals are proved on demand by backward chaining, memoized per space
+generation
+"""
+
+import itertools
+import json
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from query_cache import QueryCache
+
+EAGER = "eager"
+LAZY = "lazy"
+MODES = (EAGER, LAZY)
+
+Fact = Tuple[Any, ...]
+Bindings = Dict[str, Any]
+
+def is_variable(value: Any) -> bool:
+    return isinstance(value, str) and len(value) > 1 and value[0] in "?$"
+
+def unify(pattern: Any, value: Any, bindings: Bindings) -> Optional[Bindings]:
+    """Extend `bindings` so that `pattern` matches the ground `value`, or None"""
+    if is_variable(pattern):
+        name = pattern[1:]
+        if name in bindings:
+            return bindings if bindings[name] == value else None
+        extended = dict(bindings)
+        extended[name] = value
+        return extended
+    if isinstance(pattern, tuple):
+        if not isinstance(value, tuple) or len(pattern) != len(value):
+            return None
+        for p, v in zip(pattern, value):
+            bindings = unify(p, v, bindings)
+            if bindings is None:
+                return None
+        return bindings
+    return bindings if pattern == value else None
+
+def substitute(pattern: Any, bindings: Bindings) -> Any:
+    if is_variable(pattern):
+        return bindings.get(pattern[1:], pattern)
+    if isinstance(pattern, tuple):
+        return tuple(substitute(p, bindings) for p in pattern)
+    return pattern
+
+def is_ground(value: Any) -> bool:
+    if isinstance(value, tuple):
+        return all(is_ground(v) for v in value)
+    return not is_variable(value)
+
+def to_atom_text(value: Any, head: bool = False) -> str:
+    """MeTTa text for a value tuple: head symbols bare, other strings as literals"""
+    if isinstance(value, tuple):
+        return "(" + " ".join(to_atom_text(v, head=(i == 0)) for i, v in enumerate(value)) + ")"
+    if isinstance(value, str):
+        return value if head else json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+class Rule:
+    def __init__(self, premises: List[Fact], conclusion: Fact, source: Fact):
+        self.premises = premises
+        self.conclusion = conclusion
+        self.source = source
+
+    @classmethod
+    def from_fact(cls, fact: Fact) -> Optional["Rule"]:
+        """Build a rule from an `(implies body conclusion)` value tuple"""
+        if len(fact) != 3 or fact[0] != "implies":
+            return None
+        body, conclusion = fact[1], fact[2]
+        if not isinstance(body, tuple) or not isinstance(conclusion, tuple) or not body:
+            return None
+        premises = list(body[1:]) if body[0] == "and" else [body]
+        if not premises or any(not isinstance(p, tuple) or not p or is_variable(p[0]) for p in premises):
+            return None
+        return cls(premises, conclusion, fact)
+
+    def rename(self, suffix: str) -> "Rule":
+        """Copy with variables renamed apart, for use inside a proof"""
+        def walk(value):
+            if is_variable(value):
+                return f"${value[1:]}#{suffix}"
+            if isinstance(value, tuple):
+                return tuple(walk(v) for v in value)
+            return value
+        return Rule([walk(p) for p in self.premises], walk(self.conclusion), self.source)
+
+class InferenceEngine:
+    def __init__(self, client, mode: str = EAGER, cache_size: int = 1024):
+        """Attach to a MeTTaClient, registering the rules already in its index.
+
+        In eager mode every rule is run to a fixpoint over the existing facts
+        right away; afterwards only newly added atoms are propagated.
+        """
+        if mode not in MODES:
+            raise ValueError(f"inference mode must be one of {MODES}, got {mode!r}")
+        self.client = client
+        self.mode = mode
+        self.rules: List[Rule] = []
+        # premise predicate -> (rule, premise position), to find rules a new fact can fire
+        self._by_premise: Dict[Any, List[Tuple[Rule, int]]] = defaultdict(list)
+        self._rule_sources: Set[Fact] = set()
+        self._pending: List[Fact] = []
+        self._running = False
+        self._renames = itertools.count()
+        self.memo = QueryCache(cache_size)
+        self.derived = 0
+
+        client.inference = self
+        rules = [rule for rule in map(self._register, client.index.facts("implies")) if rule]
+        if self.mode == EAGER:
+            self._materialize(rules)
+
+    def _register(self, fact: Fact) -> Optional[Rule]:
+        if fact in self._rule_sources:
+            return None
+        rule = Rule.from_fact(fact)
+        if rule is None:
+            return None
+        self._rule_sources.add(fact)
+        self.rules.append(rule)
+        for i, premise in enumerate(rule.premises):
+            self._by_premise[premise[0]].append((rule, i))
+        return rule
+
+    def set_mode(self, mode: str):
+        """Switch between eager materialization and lazy backward chaining"""
+        if mode not in MODES:
+            raise ValueError(f"inference mode must be one of {MODES}, got {mode!r}")
+        previous, self.mode = self.mode, mode
+        if mode == EAGER and previous != EAGER:
+            self._materialize(self.rules)
+
+    # Index access -----------------------------------------------------------
+
+    def _candidates(self, pattern: Fact) -> List[Fact]:
+        """Indexed facts that could match `pattern` (narrowed by subject if bound)"""
+        index = self.client.index
+        if len(pattern) > 1 and is_ground(pattern[1]):
+            return index.lookup(pattern[0], pattern[1])
+        return index.facts(pattern[0])
+
+    def _known(self, fact: Fact) -> bool:
+        if len(fact) > 1:
+            return fact in self.client.index.lookup(fact[0], fact[1])
+        return fact in self.client.index.facts(fact[0])
+
+    def _join(self, premises: List[Fact], bindings: Bindings) -> Iterator[Bindings]:
+        """Bindings satisfying every premise against the indexed facts"""
+        if not premises:
+            yield bindings
+            return
+        pattern = substitute(premises[0], bindings)
+        for fact in self._candidates(pattern):
+            extended = unify(pattern, fact, bindings)
+            if extended is not None:
+                yield from self._join(premises[1:], extended)
+
+    # Eager forward chaining -------------------------------------------------
+
+    def on_added(self, facts: List[Fact]):
+        """Called by the client with the value tuples of newly added atoms"""
+        self._pending.extend(facts)
+        if self._running:
+            # Derived facts are fed back through add_atoms; the outer loop picks them up
+            return
+        self._running = True
+        try:
+            while self._pending:
+                batch, self._pending = self._pending, []
+                new_rules = [rule for rule in map(self._register, batch) if rule]
+                if self.mode != EAGER:
+                    continue
+                self._materialize(new_rules)
+                self._emit(self._derive_from(batch))
+        finally:
+            self._running = False
+
+    def _derive_from(self, facts: List[Fact]) -> Set[Fact]:
+        """Conclusions of rule firings that use at least one of `facts`"""
+        derived = set()
+        for fact in facts:
+            for rule, i in self._by_premise.get(fact[0], ()):
+                bindings = unify(rule.premises[i], fact, {})
+                if bindings is None:
+                    continue
+                rest = rule.premises[:i] + rule.premises[i + 1:]
+                for solution in self._join(rest, bindings):
+                    conclusion = substitute(rule.conclusion, solution)
+                    if is_ground(conclusion):
+                        derived.add(conclusion)
+        return derived
+
+    def _materialize(self, rules: List[Rule]):
+        """Fire `rules` over all current facts; new conclusions propagate via on_added"""
+        derived = set()
+        for rule in rules:
+            for solution in self._join(rule.premises, {}):
+                conclusion = substitute(rule.conclusion, solution)
+                if is_ground(conclusion):
+                    derived.add(conclusion)
+        self._emit(derived)
+
+    def _emit(self, derived: Set[Fact]):
+        new = [fact for fact in derived if not self._known(fact)]
+        if not new:
+            return
+        result = self.client.add_atoms([to_atom_text(fact) for fact in sorted(new, key=repr)])
+        self.derived += result.get("added", 0)
+
+    # Lazy backward chaining -------------------------------------------------
+
+    def prove(self, goal: Fact) -> List[Fact]:
+        """All ground facts matching `goal`, stored or derivable"""
+        if self.mode == EAGER:
+            return [fact for fact in self._candidates(goal) if unify(goal, fact, {}) is not None]
+        return sorted(self._answers(goal, frozenset()), key=repr)
+
+    def _answers(self, goal: Fact, in_progress: frozenset) -> Set[Fact]:
+        key = _canonical(goal)
+        cached = self.memo.get(key, self.client.generation)
+        if cached is not None:
+            return cached
+
+        answers = {fact for fact in self._candidates(goal) if unify(goal, fact, {}) is not None}
+        if key in in_progress:
+            # Recursive rule hit the same goal: stop at the stored facts
+            return answers
+        in_progress = in_progress | {key}
+        for rule in self.rules:
+            renamed = rule.rename(str(next(self._renames)))
+            bindings = _unify_patterns(renamed.conclusion, goal)
+            if bindings is None:
+                continue
+            for solution in self._prove_all(renamed.premises, bindings, in_progress):
+                conclusion = substitute(renamed.conclusion, solution)
+                if is_ground(conclusion) and unify(goal, conclusion, {}) is not None:
+                    answers.add(conclusion)
+        self.memo.put(key, self.client.generation, answers)
+        return answers
+
+    def _prove_all(self, premises: List[Fact], bindings: Bindings, in_progress: frozenset) -> Iterator[Bindings]:
+        if not premises:
+            yield bindings
+            return
+        pattern = substitute(premises[0], bindings)
+        for fact in self._answers(pattern, in_progress):
+            extended = unify(pattern, fact, bindings)
+            if extended is not None:
+                yield from self._prove_all(premises[1:], extended, in_progress)
+
+    def reset(self):
+        """Forget all rules (the client's knowledge base was cleared)"""
+        self.rules.clear()
+        self._by_premise.clear()
+        self._rule_sources.clear()
+        self._pending.clear()
+        self.memo.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "rules": len(self.rules),
+            "derived": self.derived,
+            "memo": self.memo.stats()
+        }
+
+def _canonical(goal: Fact) -> Fact:
+    """Goal with variables renamed by first occurrence, for memo keys"""
+    names: Dict[str, str] = {}
+    def walk(value):
+        if is_variable(value):
+            return names.setdefault(value[1:], f"${len(names)}")
+        if isinstance(value, tuple):
+            return tuple(walk(v) for v in value)
+        return value
+    return walk(goal)
+
+def _unify_patterns(left: Any, right: Any) -> Optional[Bindings]:
+    """Bindings for `left`'s variables such that it matches `right`.
+
+    Variables in `right` (an unbound goal position) match anything and are
+    left unbound; the answers are filtered against the goal afterwards.
+    """
+    bindings: Bindings = {}
+    def walk(a, b) -> bool:
+        if is_variable(b):
+            return True
+        if is_variable(a):
+            name = a[1:]
+            if name in bindings:
+                return bindings[name] == b
+            bindings[name] = b
+            return True
+        if isinstance(a, tuple) and isinstance(b, tuple):
+            return len(a) == len(b) and all(walk(x, y) for x, y in zip(a, b))
+        return a == b
+    return bindings if walk(left, right) else None
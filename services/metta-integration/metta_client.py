@@ -5,38 +5,133 @@ Uses Hyperon MeTTa runtime for proper symbolic reasoning
 """
 
 import json
-from typing import List, Dict, Any, Optional
+import os
+import re
+from typing import List, Dict, Any, Iterator, Optional
+
+from atom_index import AtomIndex
+from atom_syntax import flat_fact
+from inference import InferenceEngine, to_atom_text
+from query_cache import QueryCache, is_pure_expression, normalize_pattern
+from snapshot import SnapshotStore
 
 try:
-    from hyperon import MeTTa, AtomSpace
+    from hyperon import MeTTa, AtomSpace, AtomKind
     HYPERON_AVAILABLE = True
 except ImportError:
     HYPERON_AVAILABLE = False
     print("Warning: hyperon not installed. Install with: pip install hyperon")
 
+# Atoms parsed and inserted per parser call in add_atoms
+DEFAULT_BATCH_SIZE = 5000
+
+# `?var` outside of string literals (the client's query syntax) -> MeTTa `$var`
+_QUERY_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|\?([A-Za-z_][\w-]*)')
+
+def to_metta_pattern(pattern: str) -> str:
+    """Rewrite `?var` query variables to MeTTa `$var` variables."""
+    return _QUERY_TOKEN.sub(lambda m: f"${m.group(1)}" if m.group(1) else m.group(0), pattern)
+
+def atom_to_value(atom) -> Any:
+    """Convert a hyperon atom to a plain Python value.
+
+    Symbols become their name, grounded atoms their Python value (string
+    literals without quotes) or, for grounded operations such as `and` that
+    have no Python value, their text; variables `$name`, and expressions tuples.
+    """
+    kind = atom.get_metatype()
+    if kind == AtomKind.EXPR:
+        return tuple(atom_to_value(child) for child in atom.get_children())
+    if kind == AtomKind.SYMBOL:
+        name = atom.get_name()
+        return name[1:-1] if len(name) >= 2 and name[0] == name[-1] == '"' else name
+    if kind == AtomKind.VARIABLE:
+        return f"${atom.get_name()}"
+    try:
+        obj = atom.get_object()
+    except Exception:
+        # "Cannot get Python object of unsupported non-C atom"
+        return str(atom)
+    return getattr(obj, "value", obj)
+
+def _binding_items(bindings) -> Iterator[tuple]:
+    """Yield `(variable name, atom)` pairs from a hyperon bindings object."""
+    for key, value in bindings.items():
+        name = key if isinstance(key, str) else key.get_name()
+        yield name.lstrip("$"), value
+
 class MeTTaClient:
-    def __init__(self):
-        """Initialize MeTTa runtime with AtomSpace"""
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, cache_size: int = None,
+                 snapshot_dir: str = None):
+        """Initialize MeTTa runtime with AtomSpace.
+
+        With a snapshot directory (or METTA_SNAPSHOT_DIR) the space is restored
+        from the last snapshot plus its delta log, and atoms added later are
+        appended to the log. Pass `snapshot_dir=""` to disable persistence.
+        """
         if not HYPERON_AVAILABLE:
             raise RuntimeError("Hyperon MeTTa not installed. Run: pip install hyperon")
         
         self.metta = MeTTa()
         self.space = AtomSpace()
         self.metta.space = self.space
+        self.batch_size = batch_size
+        
+        # Predicate / (predicate, subject) index over atoms added via add_atoms
+        self.index = AtomIndex()
+        
+        # Memoized query/evaluate results, invalidated by bumping `generation`
+        # whenever the space changes
+        if cache_size is None:
+            cache_size = int(os.getenv("METTA_QUERY_CACHE_SIZE", "1024"))
+        self.cache = QueryCache(cache_size)
+        self.generation = 0
+        
+        # Optional InferenceEngine notified of every batch of added atoms
+        self.inference = None
         
         # Track atom count
         self.atom_count = 0
+        
+        if snapshot_dir is None:
+            snapshot_dir = os.getenv("METTA_SNAPSHOT_DIR")
+        self.snapshots = SnapshotStore(snapshot_dir) if snapshot_dir else None
+        if self.snapshots:
+            loaded = self.load_snapshot()
+            if not loaded["success"]:
+                print(f"Warning: snapshot restore failed: {loaded['error']}")
     
     def evaluate(self, expression: str) -> Dict[str, Any]:
-        """Evaluate a MeTTa expression"""
+        """Evaluate a MeTTa expression.
+
+        Side-effect-free `!` evaluations are memoized per space generation;
+        anything that may mutate the space (`add-atom`, `remove-atom`, ...)
+        runs uncached, bumps the generation and rebuilds the index and atom
+        count from the space, since it bypasses `add_atoms`.
+        """
+        pure = is_pure_expression(expression)
+        key = ("evaluate", normalize_pattern(expression))
+        if pure:
+            cached = self.cache.get(key, self.generation)
+            if cached is not None:
+                return dict(cached)
+        
         try:
             result = self.metta.run(expression)
-            return {
+            response = {
                 "success": True,
                 "result": str(result),
                 "error": None
             }
+            if pure:
+                self.cache.put(key, self.generation, response)
+            else:
+                self._reindex()
+            return dict(response)
         except Exception as e:
+            if not pure:
+                # A failed program may still have changed the space part-way
+                self._reindex()
             return {
                 "success": False,
                 "error": str(e),
@@ -44,43 +139,112 @@ class MeTTaClient:
             }
     
     def add_atoms(self, atoms: List[str]) -> Dict[str, Any]:
-        """Add multiple atoms to the knowledge base"""
+        """Add multiple atoms to the knowledge base.
+
+        Atoms are parsed a batch at a time with a single parser call and
+        inserted straight into the AtomSpace, skipping per-atom evaluation;
+        flat atoms are indexed from their text. Atoms that fail to parse or convert are reported in `failed` (with
+        their index) while the rest of the batch is still added.
+        """
+        added = 0
+        failed = []
+        logged = []
+        facts = []
         try:
-            added = 0
-            for atom in atoms:
-                self.metta.run(atom)
-                added += 1
-                self.atom_count += 1
-            
-            return {
-                "success": True,
-                "added": added,
-                "error": None
-            }
+            for start in range(0, len(atoms), self.batch_size):
+                group = list(enumerate(atoms[start:start + self.batch_size], start))
+                for (index, text), (_, parsed, error) in zip(group, self._parse_group(group)):
+                    if error is None:
+                        # Convert first so the space and the index change together
+                        fact = flat_fact(text)
+                        if fact is None:
+                            try:
+                                fact = atom_to_value(parsed)
+                            except Exception as e:
+                                error = str(e)
+                    if error is not None:
+                        failed.append({"index": index, "atom": text, "error": error})
+                        continue
+                    self.space.add_atom(parsed)
+                    self.index.add(fact)
+                    facts.append(fact)
+                    added += 1
+                    self.atom_count += 1
+                    if self.snapshots:
+                        logged.append(text if "\n" not in text else str(parsed))
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
-                "added": 0
+                "added": added,
+                "failed": failed
             }
+        finally:
+            if added:
+                self._bump_generation()
+            if logged:
+                self.snapshots.append_delta(logged)
+        
+        if self.inference and facts:
+            self.inference.on_added(facts)
+        
+        return {
+            "success": not failed,
+            "added": added,
+            "failed": failed,
+            "error": f"{len(failed)} atom(s) failed to parse" if failed else None
+        }
+    
+    def _parse_group(self, group: List[tuple]) -> List[tuple]:
+        """Parse `(index, text)` pairs, returning `(index, atom, error)` per input.
+
+        The whole group is parsed with one parser call; only if that raises or
+        does not give exactly one atom per input is each text parsed on its own,
+        so that just the malformed inputs are reported.
+        """
+        try:
+            parsed = self.metta.parse_all("\n".join(text for _, text in group))
+            if len(parsed) == len(group):
+                return [(index, atom, None) for (index, _), atom in zip(group, parsed)]
+        except Exception:
+            pass
+        return [self._parse_one(index, text) for index, text in group]
+    
+    def _parse_one(self, index: int, text: str) -> tuple:
+        try:
+            parsed = self.metta.parse_all(text)
+        except Exception as e:
+            return (index, None, str(e))
+        if len(parsed) != 1:
+            return (index, None, f"expected 1 atom, parsed {len(parsed)}")
+        return (index, parsed[0], None)
+    
+    def iter_query(self, pattern: str) -> Iterator[Dict[str, Any]]:
+        """Yield one `{variable: value}` dict per match of `pattern`.
+
+        Variables may be written `?name` or `$name`. Results are read from
+        the AtomSpace bindings directly, without stringifying the result set.
+        """
+        pattern_atom = self.metta.parse_single(to_metta_pattern(pattern))
+        for bindings in self.space.query(pattern_atom):
+            yield {name: atom_to_value(value) for name, value in _binding_items(bindings)}
     
     def query(self, pattern: str) -> Dict[str, Any]:
-        """Query the knowledge base with a pattern"""
+        """Query the knowledge base with a pattern; `matches` holds typed bindings.
+
+        Results are memoized by normalized pattern until the space changes.
+        """
+        key = ("query", normalize_pattern(pattern))
+        cached = self.cache.get(key, self.generation)
+        if cached is not None:
+            return {"success": True, "matches": [dict(m) for m in cached], "error": None}
+        
         try:
-            # Use match for pattern matching
-            query_expr = f"(match &self {pattern} $result)"
-            result = self.metta.run(query_expr)
-            
-            # Parse results
-            matches = []
-            if result:
-                # Convert result to list of matches
-                result_str = str(result)
-                matches = [result_str]
-            
+            matches = list(self.iter_query(pattern))
+            self.cache.put(key, self.generation, matches)
             return {
                 "success": True,
-                "matches": matches,
+                "matches": [dict(m) for m in matches],
                 "error": None
             }
         except Exception as e:
@@ -90,6 +254,24 @@ class MeTTaClient:
                 "matches": []
             }
     
+    def _bump_generation(self):
+        """Mark the space as changed so cached results are no longer served"""
+        self.generation += 1
+    
+    def _reindex(self):
+        """Rebuild the index and atom count from the space after an untracked change"""
+        self.index.clear()
+        count = 0
+        for atom in self.space.get_atoms():
+            count += 1
+            try:
+                self.index.add(atom_to_value(atom))
+            except Exception:
+                # Still counted: it is in the space, it just cannot be indexed
+                continue
+        self.atom_count = count
+        self._bump_generation()
+    
     def health_check(self) -> bool:
         """Check if MeTTa runtime is working"""
         try:
@@ -105,7 +287,13 @@ class MeTTaClient:
             # Reinitialize space
             self.space = AtomSpace()
             self.metta.space = self.space
+            self.index.clear()
+            self._bump_generation()
             self.atom_count = 0
+            if self.snapshots:
+                self.snapshots.reset()
+            if self.inference:
+                self.inference.reset()
             return {
                 "success": True,
                 "error": None
@@ -116,14 +304,89 @@ class MeTTaClient:
                 "error": str(e)
             }
     
+    def save_snapshot(self) -> Dict[str, Any]:
+        """Write the whole space to a new snapshot and truncate the delta log"""
+        if not self.snapshots:
+            return {"success": False, "error": "no snapshot directory configured"}
+        try:
+            written = self.snapshots.write_snapshot(str(atom) for atom in self.space.get_atoms())
+            return {"success": True, **written, "error": None}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    def load_snapshot(self) -> Dict[str, Any]:
+        """Restore atoms from the snapshot and delta log into the current space.
+
+        Each streamed chunk of newline-delimited atoms is parsed with a single
+        parser call; a chunk that does not parse cleanly is re-parsed line by
+        line so only the bad lines are skipped.
+        """
+        if not self.snapshots:
+            return {"success": False, "loaded": 0, "error": "no snapshot directory configured"}
+        loaded = 0
+        failed = 0
+        try:
+            for source in (self.snapshots.iter_snapshot_chunks(), self.snapshots.iter_delta_chunks()):
+                for chunk in source:
+                    lines = [(i, line) for i, line in enumerate(chunk.split("\n")) if line]
+                    for (_, line), (_, parsed, error) in zip(lines, self._parse_group(lines)):
+                        if error is None:
+                            fact = flat_fact(line)
+                            if fact is None:
+                                try:
+                                    fact = atom_to_value(parsed)
+                                except Exception:
+                                    error = "unconvertible atom"
+                        if error is not None:
+                            failed += 1
+                            continue
+                        self.space.add_atom(parsed)
+                        self.index.add(fact)
+                        loaded += 1
+                        self.atom_count += 1
+        except Exception as e:
+            return {"success": False, "loaded": loaded, "failed": failed, "error": str(e)}
+        finally:
+            if loaded:
+                self._bump_generation()
+        return {
+            "success": not failed,
+            "loaded": loaded,
+            "failed": failed,
+            "error": f"{failed} snapshot line(s) failed to parse" if failed else None
+        }
+    
     def get_atom_count(self) -> int:
         """Get total number of atoms in knowledge base"""
         return self.atom_count
+    
+    def count_predicate(self, predicate: str) -> int:
+        """Number of indexed atoms with this predicate (no space scan)"""
+        return self.index.count(predicate)
+    
+    def lookup(self, predicate: str, subject: Any) -> List[tuple]:
+        """Indexed atoms `(predicate subject ...)` as value tuples"""
+        return self.index.lookup(predicate, subject)
 
 # Example usage and helper functions
+# Predicate -> profile field returned by AfriVerseMeTTa.get_plant_profiles
+PROFILE_PREDICATES = {
+    'property': 'properties',
+    'used_for': 'uses',
+    'found_in': 'regions'
+}
+
 class AfriVerseMeTTa:
-    def __init__(self):
+    def __init__(self, inference_mode: str = None):
+        """Create the client and its inference engine.
+
+        `inference_mode` (or METTA_INFERENCE_MODE) is "eager" to materialize
+        derived facts as atoms arrive, or "lazy" for memoized backward chaining.
+        """
         self.client = MeTTaClient()
+        self.inference = InferenceEngine(
+            self.client, inference_mode or os.getenv("METTA_INFERENCE_MODE", "eager")
+        )
     
     def add_cultural_knowledge(self, atoms: List[str]) -> bool:
         """Add cultural knowledge atoms to MeTTa"""
@@ -144,48 +407,42 @@ class AfriVerseMeTTa:
     
     def get_plant_properties(self, plant_name: str) -> Dict[str, Any]:
         """Get all properties and uses of a plant"""
-        properties = []
-        uses = []
-        regions = []
-        
-        # Query properties
-        prop_result = self.client.query(f'(property "{plant_name}" ?prop)')
-        properties = [match['prop'] for match in prop_result.get('matches', [])]
-        
-        # Query uses
-        use_result = self.client.query(f'(used_for "{plant_name}" ?use)')
-        uses = [match['use'] for match in use_result.get('matches', [])]
-        
-        # Query regions
-        region_result = self.client.query(f'(found_in "{plant_name}" ?region)')
-        regions = [match['region'] for match in region_result.get('matches', [])]
-        
+        return self.get_plant_profiles([plant_name])[plant_name]
+    
+    def get_plant_profiles(self, plant_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Properties, uses and regions for many plants in one pass.
+
+        All lookups are served from the (predicate, subject) index, so a
+        catalogue page costs one dict lookup per plant and predicate instead
+        of three match queries per plant.
+        """
+        names = list(dict.fromkeys(plant_names))
+        found = self.client.index.objects_many(list(PROFILE_PREDICATES), names)
         return {
-            'plant': plant_name,
-            'properties': properties,
-            'uses': uses,
-            'regions': regions
+            name: {
+                'plant': name,
+                **{field: found[name][predicate] for predicate, field in PROFILE_PREDICATES.items()}
+            }
+            for name in names
         }
     
     def infer_medicinal_uses(self, plant: str) -> List[str]:
-        """Infer medicinal uses based on plant properties"""
-        # This is a simple inference - in production would use more complex reasoning
-        query = f'''
-        (match (plant "{plant}")
-               (property "{plant}" ?prop)
-               (implies (property ?p ?prop) (has_medicinal_use ?p)))
-        '''
-        
-        result = self.client.evaluate(query)
-        return result.get('result', [])
+        """Derived `(has_medicinal_use plant ...)` facts from the `implies` rules.
+
+        In eager mode this is an index lookup over materialized facts; in lazy
+        mode the goal is proved by (memoized) backward chaining.
+        """
+        facts = self.inference.prove(('has_medicinal_use', plant, '$use'))
+        facts += self.inference.prove(('has_medicinal_use', plant))
+        return [to_atom_text(fact) for fact in facts]
     
     def validate_knowledge_graph(self) -> Dict[str, Any]:
         """Run validation checks on the knowledge graph"""
         checks = {
             'total_atoms': self.client.get_atom_count(),
-            'plant_count': len(self.client.query('(plant ?p)').get('matches', [])),
-            'practice_count': len(self.client.query('(practice ?p)').get('matches', [])),
-            'proverb_count': len(self.client.query('(proverb ?p)').get('matches', [])),
+            'plant_count': self.client.count_predicate('plant'),
+            'practice_count': self.client.count_predicate('practice'),
+            'proverb_count': self.client.count_predicate('proverb'),
             'server_healthy': self.client.health_check()
         }
         
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Query result cache for the AfriVerse MeTTa client
+LRU memoization of query/evaluate results keyed by normalized pattern and
+tagged with the AtomSpace generation, so answers computed before a mutation
+are never served afterwards
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from atom_syntax import tokenize
+
+# Builtins whose evaluation changes the space or runtime state
+MUTATING_TOKENS = {
+    "add-atom", "remove-atom", "bind!", "import!", "new-space", "new-state",
+    "change-state!", "add-reduct", "register-module!"
+}
+
+# Builtins whose result can change while the space does not (mutable state,
+# randomness, clock, files/modules); side-effecting `name!` builtins such as
+# `println!` and `trace!` are caught by their suffix
+NONDETERMINISTIC_TOKENS = {
+    "get-state", "random-int", "random-float", "time", "current-time",
+    "include", "load-ascii", "mod-space!", "git-module!"
+}
+
+def normalize_pattern(text: str) -> str:
+    """Canonical spacing for a MeTTa expression, preserving string literals"""
+    out = []
+    for token in tokenize(text):
+        if out and out[-1] not in ("(", "!") and token != ")":
+            out.append(" ")
+        out.append(token)
+    return "".join(out)
+
+def is_pure_expression(text: str) -> bool:
+    """True if evaluating `text` cannot mutate the space.
+
+    Every top-level expression must be a `!` evaluation (a bare expression is
+    added to the space). No mutating or nondeterministic builtin, no `name!`
+    builtin (IO such as `println!`) and no nested `!` may appear anywhere, so a
+    pure result can also be cached and served from any replica.
+    """
+    depth = 0
+    previous = None
+    for token in tokenize(text):
+        if token in MUTATING_TOKENS or token in NONDETERMINISTIC_TOKENS:
+            return False
+        if token.endswith("!") and not token.startswith('"') and (token != "!" or depth > 0):
+            return False
+        if token == "(":
+            if depth == 0 and previous != "!":
+                return False
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and token != "!":
+            return False
+        previous = token
+    return depth == 0
+
+class QueryCache:
+    def __init__(self, max_entries: int = 1024):
+        """Create an empty LRU cache holding up to `max_entries` results"""
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[int, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, key: Hashable, generation: int) -> Optional[Any]:
+        """Return the cached value if it was computed at `generation`"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        cached_generation, value = entry
+        if cached_generation != generation:
+            del self._entries[key]
+            self.stale += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, generation: int, value: Any):
+        """Store a value computed at `generation`, evicting the LRU entry if full"""
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (generation, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries
+        }
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Sharded AfriVerse knowledge base
+Partitions atoms across several in-process MeTTaClient shards, either by
+community (one shard per community, chosen by the caller) or by region (each
+subject goes to the shard of its first `found_in` region in the batch that
+introduces it, or to a shard chosen by a stable hash of the subject when that
+batch names no region). Once placed a subject stays on its shard; the
+placement is rebuilt from the shards' own contents on startup, so it survives
+restarts through the shard snapshots. Queries fan out to the shards whose
+indexes can match and the results are merged.
+"""
+
+import os
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from atom_syntax import tokenize
+from metta_client import MeTTaClient
+from query_cache import is_pure_expression
+
+COMMUNITY = "community"
+REGION = "region"
+DEFAULT_SHARDS = "general,kikuyu,maasai"
+
+def _unquote(token: str) -> str:
+    return token[1:-1] if len(token) >= 2 and token[0] == token[-1] == '"' else token
+
+def atom_head(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """`(predicate, subject)` of a flat atom or pattern; None where not a plain token"""
+    tokens = tokenize(text)
+    if len(tokens) < 2 or tokens[0] != "(" or tokens[1] in "()":
+        return None, None
+    predicate = tokens[1]
+    subject = _unquote(tokens[2]) if len(tokens) > 3 and tokens[2] not in "()" else None
+    return predicate, subject
+
+def _is_variable(token: Optional[str]) -> bool:
+    return token is None or token[:1] in ("?", "$")
+
+class ShardedMeTTaClient:
+    def __init__(self, shards: List[str] = None, key: str = None, default_shard: str = None,
+                 snapshot_dir: str = None):
+        """Create one MeTTaClient per shard name.
+
+        `shards` defaults to METTA_SHARDS, `key` ("community" or "region") to
+        METTA_SHARD_KEY. Atoms that cannot be routed go to `default_shard`
+        (the first shard unless given). With `snapshot_dir` each shard
+        persists to its own subdirectory.
+        """
+        names = shards or [s.strip() for s in os.getenv("METTA_SHARDS", DEFAULT_SHARDS).split(",") if s.strip()]
+        self.key = key or os.getenv("METTA_SHARD_KEY", COMMUNITY)
+        if self.key not in (COMMUNITY, REGION):
+            raise ValueError(f"shard key must be '{COMMUNITY}' or '{REGION}', got {self.key!r}")
+        self.default_shard = default_shard or names[0]
+        if self.default_shard not in names:
+            names.append(self.default_shard)
+        self.shards: Dict[str, MeTTaClient] = {
+            name: MeTTaClient(snapshot_dir=os.path.join(snapshot_dir, name) if snapshot_dir else "")
+            for name in names
+        }
+        # Region mode: subject -> shard it was placed on
+        self._subject_shard: Dict[str, str] = {}
+        if self.key == REGION:
+            for name, shard in self.shards.items():
+                for subject in shard.index.subjects():
+                    self._subject_shard.setdefault(subject, name)
+        self._shard_order = sorted(self.shards)
+        self.shards_queried = 0
+        self.shards_skipped = 0
+
+    # Routing ----------------------------------------------------------------
+
+    def _hash_shard(self, subject: str) -> str:
+        """Stable across processes (unlike `hash`), so placement is reproducible"""
+        return self._shard_order[zlib.crc32(subject.encode("utf-8")) % len(self._shard_order)]
+
+    def _route(self, atoms: List[str], community: Optional[str]) -> Dict[str, List[int]]:
+        """Shard name -> indexes of the atoms that belong on it"""
+        if self.key == COMMUNITY:
+            shard = community if community in self.shards else self.default_shard
+            return {shard: list(range(len(atoms)))}
+
+        heads = [atom_head(text) for text in atoms]
+        # Place new subjects by their first region among this batch's found_in
+        # atoms; once placed, a subject stays on its shard
+        for text, (predicate, subject) in zip(atoms, heads):
+            if predicate != "found_in" or subject is None or subject in self._subject_shard:
+                continue
+            tokens = tokenize(text)
+            region = _unquote(tokens[3]) if len(tokens) > 4 else None
+            if region in self.shards:
+                self._subject_shard[subject] = region
+        routes: Dict[str, List[int]] = {}
+        for i, (_, subject) in enumerate(heads):
+            if subject is None:
+                shard = self.default_shard
+            else:
+                shard = self._subject_shard.setdefault(subject, self._hash_shard(subject))
+            routes.setdefault(shard, []).append(i)
+        return routes
+
+    def _candidate_shards(self, pattern: str) -> List[str]:
+        """Shards whose indexes could hold a match for `pattern`"""
+        predicate, subject = atom_head(pattern)
+        if _is_variable(predicate):
+            return list(self.shards)
+        if not _is_variable(subject):
+            if self.key == REGION and subject in self._subject_shard:
+                return [self._subject_shard[subject]]
+            return [name for name, shard in self.shards.items() if shard.index.has_subject(predicate, subject)]
+        return [name for name, shard in self.shards.items() if shard.count_predicate(predicate)]
+
+    # Client API -------------------------------------------------------------
+
+    def add_atoms(self, atoms: List[str], community: str = None) -> Dict[str, Any]:
+        """Route a batch to its shards; `community` selects the shard in community mode"""
+        added = 0
+        failed = []
+        errors = []
+        for name, indexes in self._route(atoms, community).items():
+            result = self.shards[name].add_atoms([atoms[i] for i in indexes])
+            added += result.get("added", 0)
+            for failure in result.get("failed", []):
+                failed.append(dict(failure, index=indexes[failure["index"]], shard=name))
+            if result.get("error") and not result.get("failed"):
+                errors.append(f"{name}: {result['error']}")
+        failed.sort(key=lambda f: f["index"])
+        error = "; ".join(errors) or (f"{len(failed)} atom(s) failed to parse" if failed else None)
+        return {"success": not failed and not errors, "added": added, "failed": failed, "error": error}
+
+    def query(self, pattern: str) -> Dict[str, Any]:
+        """Fan the query out to the shards that can match and merge the matches"""
+        candidates = self._candidate_shards(pattern)
+        self.shards_queried += len(candidates)
+        self.shards_skipped += len(self.shards) - len(candidates)
+        matches = []
+        for name in candidates:
+            result = self.shards[name].query(pattern)
+            if not result["success"]:
+                return {"success": False, "error": f"{name}: {result['error']}", "matches": []}
+            matches.extend(result["matches"])
+        return {"success": True, "matches": matches, "shards": candidates, "error": None}
+
+    def evaluate(self, expression: str, shard: str = None) -> Dict[str, Any]:
+        """Evaluate on one shard, or a side-effect-free expression on every shard"""
+        if shard is not None:
+            return self.shards[shard].evaluate(expression)
+        if not is_pure_expression(expression):
+            return {"success": False, "error": "impure expression needs an explicit shard", "result": None}
+        results = {name: client.evaluate(expression) for name, client in self.shards.items()}
+        failed = [f"{name}: {r['error']}" for name, r in results.items() if not r["success"]]
+        return {
+            "success": not failed,
+            "result": {name: r["result"] for name, r in results.items()},
+            "error": "; ".join(failed) or None
+        }
+
+    def count_predicate(self, predicate: str) -> int:
+        return sum(shard.count_predicate(predicate) for shard in self.shards.values())
+
+    def lookup(self, predicate: str, subject: Any) -> List[tuple]:
+        facts = []
+        for shard in self.shards.values():
+            facts.extend(shard.lookup(predicate, subject))
+        return facts
+
+    def get_atom_count(self) -> int:
+        return sum(shard.get_atom_count() for shard in self.shards.values())
+
+    def clear_knowledge_base(self) -> Dict[str, Any]:
+        errors = [f"{name}: {r['error']}" for name, r in
+                  ((name, shard.clear_knowledge_base()) for name, shard in self.shards.items())
+                  if not r["success"]]
+        self._subject_shard.clear()
+        return {"success": not errors, "error": "; ".join(errors) or None}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "key": self.key,
+            "atoms": {name: shard.get_atom_count() for name, shard in self.shards.items()},
+            "shards_queried": self.shards_queried,
+            "shards_skipped": self.shards_skipped
+        }
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Persistent snapshots for the AfriVerse MeTTa AtomSpace
+A snapshot is a small header followed by a zlib stream of newline-delimited
+canonical atoms; atoms added after it go to an append-only delta log. Loading
+streams the snapshot in large text chunks that are parsed in bulk, so warm
+start time depends on snapshot size rather than on per-atom round-trips
+"""
+
+import codecs
+import glob
+import os
+import struct
+import tempfile
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+MAGIC = b"AFVMETTA"
+VERSION = 1
+# magic, version, epoch, atom count
+HEADER = struct.Struct(">8sHQQ")
+READ_BLOCK = 1 << 20
+DEFAULT_CHUNK_CHARS = 4 << 20
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing its header or is corrupt"""
+
+def _encode(atom_text: str) -> str:
+    """One atom per line: escape embedded newlines"""
+    return atom_text.replace("\r", "\\r").replace("\n", "\\n")
+
+class SnapshotStore:
+    def __init__(self, directory: str, chunk_chars: int = DEFAULT_CHUNK_CHARS):
+        """Use `directory` for `space.snapshot` and `delta.<epoch>.log` files.
+
+        The epoch stored in the snapshot header names the delta log that
+        continues it, so a crash between writing a new snapshot and deleting
+        old logs never replays atoms twice.
+        """
+        self.directory = directory
+        self.chunk_chars = chunk_chars
+        self.snapshot_path = os.path.join(directory, "space.snapshot")
+        os.makedirs(directory, exist_ok=True)
+        self.epoch = self._read_header()[0] if os.path.exists(self.snapshot_path) else 0
+        self._repair_delta()
+
+    @property
+    def delta_path(self) -> str:
+        return os.path.join(self.directory, f"delta.{self.epoch}.log")
+
+    def _read_header(self, f=None) -> tuple:
+        close = f is None
+        f = f or open(self.snapshot_path, "rb")
+        try:
+            raw = f.read(HEADER.size)
+        finally:
+            if close:
+                f.close()
+        if len(raw) != HEADER.size:
+            raise SnapshotError(f"{self.snapshot_path}: truncated header")
+        magic, version, epoch, count = HEADER.unpack(raw)
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError(f"{self.snapshot_path}: not a v{VERSION} AtomSpace snapshot")
+        return epoch, count
+
+    def write_snapshot(self, atom_texts: Iterable[str]) -> Dict[str, Any]:
+        """Atomically replace the snapshot and start a fresh delta log"""
+        new_epoch = self.epoch + 1
+        fd, tmp_path = tempfile.mkstemp(prefix=".snapshot-", dir=self.directory)
+        count = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, new_epoch, 0))
+                compressor = zlib.compressobj(6)
+                buffer: List[str] = []
+                buffered = 0
+                for text in atom_texts:
+                    line = _encode(text) + "\n"
+                    buffer.append(line)
+                    buffered += len(line)
+                    count += 1
+                    if buffered >= READ_BLOCK:
+                        f.write(compressor.compress("".join(buffer).encode("utf-8")))
+                        buffer, buffered = [], 0
+                f.write(compressor.compress("".join(buffer).encode("utf-8")))
+                f.write(compressor.flush())
+                # Patch the atom count into the header now that it is known
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, VERSION, new_epoch, count))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._fsync_directory()
+
+        self.epoch = new_epoch
+        for path in glob.glob(os.path.join(self.directory, "delta.*.log")):
+            if path != self.delta_path:
+                os.unlink(path)
+        return {"atoms": count, "bytes": os.path.getsize(self.snapshot_path), "epoch": new_epoch}
+
+    def _fsync_directory(self):
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def iter_snapshot_chunks(self) -> Iterator[str]:
+        """Stream the snapshot as text chunks of whole lines for bulk parsing"""
+        if not os.path.exists(self.snapshot_path):
+            return
+        decompressor = zlib.decompressobj()
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        pending = ""
+        with open(self.snapshot_path, "rb") as f:
+            self._read_header(f)
+            for block in iter(lambda: f.read(READ_BLOCK), b""):
+                pending += decoder.decode(decompressor.decompress(block))
+                if len(pending) >= self.chunk_chars:
+                    cut = pending.rfind("\n") + 1
+                    if cut:
+                        yield pending[:cut]
+                        pending = pending[cut:]
+            pending += decoder.decode(decompressor.flush(), final=True)
+        if not decompressor.eof:
+            raise SnapshotError(f"{self.snapshot_path}: truncated data")
+        if pending:
+            yield pending
+
+    def _repair_delta(self):
+        """Cut a torn final line left by a crash mid-append"""
+        if not os.path.exists(self.delta_path):
+            return
+        with open(self.delta_path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            position = size
+            while position > 0:
+                step = min(READ_BLOCK, position)
+                f.seek(position - step)
+                newline = f.read(step).rfind(b"\n")
+                if newline >= 0:
+                    position = position - step + newline + 1
+                    break
+                position -= step
+            if position != size:
+                f.truncate(position)
+
+    def append_delta(self, atom_texts: List[str]):
+        """Durably append atoms added since the last snapshot"""
+        if not atom_texts:
+            return
+        data = "".join(_encode(text) + "\n" for text in atom_texts).encode("utf-8")
+        with open(self.delta_path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def iter_delta_chunks(self) -> Iterator[str]:
+        """Stream complete lines of the current delta log (a torn last line is skipped)"""
+        if not os.path.exists(self.delta_path):
+            return
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        pending = ""
+        with open(self.delta_path, "rb") as f:
+            for block in iter(lambda: f.read(READ_BLOCK), b""):
+                pending += decoder.decode(block)
+                cut = pending.rfind("\n") + 1
+                if cut and len(pending) >= self.chunk_chars:
+                    yield pending[:cut]
+                    pending = pending[cut:]
+        cut = pending.rfind("\n") + 1
+        if cut:
+            yield pending[:cut]
+
+    def reset(self):
+        """Persist an empty space (used when the knowledge base is cleared)"""
+        self.write_snapshot([])
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        exists = os.path.exists(self.snapshot_path)
+        return {
+            "epoch": self.epoch,
+            "snapshot_atoms": self._read_header()[1] if exists else 0,
+            "snapshot_bytes": os.path.getsize(self.snapshot_path) if exists else 0,
+            "delta_bytes": os.path.getsize(self.delta_path) if os.path.exists(self.delta_path) else 0
+        }
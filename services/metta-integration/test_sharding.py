@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for the sharded AfriVerse knowledge base
+Every sharded query must return what a single MeTTaClient holding all atoms
+returns, while routing only touches the shards that can match. Requires
+hyperon; run with `python -m pytest` from services/metta-integration.
+"""
+
+import pytest
+
+pytest.importorskip("hyperon")
+
+from metta_client import MeTTaClient
+from sharding import COMMUNITY, REGION, ShardedMeTTaClient, atom_head
+
+REGIONS = ["eastern_africa", "western_africa", "highlands"]
+COMMUNITIES = ["general", "kikuyu", "maasai"]
+PATTERNS = [
+    '(treats ?plant "burn")',
+    '(property "plant_4" ?value)',
+    '(found_in ?plant "highlands")',
+    '(?predicate "plant_2" ?object)',
+    '(no_such_predicate ?x)'
+]
+
+def plant_atoms(plant: int):
+    name = f"plant_{plant}"
+    atoms = [
+        f'(plant "{name}")',
+        f'(treats "{name}" "{["burn", "fever", "cough"][plant % 3]}")',
+        f'(property "{name}" "{["bitter", "cooling"][plant % 2]}")'
+    ]
+    # Every fourth plant names no region, so region mode places it by hash
+    if plant % 4:
+        atoms.append(f'(found_in "{name}" "{REGIONS[plant % len(REGIONS)]}")')
+    return atoms
+
+PLANTS = {plant: plant_atoms(plant) for plant in range(12)}
+ALL_ATOMS = [atom for atoms in PLANTS.values() for atom in atoms]
+
+def matches(result):
+    return sorted(tuple(sorted(match.items())) for match in result["matches"])
+
+@pytest.fixture(scope="module")
+def single():
+    client = MeTTaClient(snapshot_dir="")
+    assert client.add_atoms(ALL_ATOMS)["added"] == len(ALL_ATOMS)
+    return client
+
+def assert_same_results(single, sharded):
+    for pattern in PATTERNS:
+        assert matches(sharded.query(pattern)) == matches(single.query(pattern)), pattern
+
+def test_atom_head():
+    assert atom_head('(treats "aloe" "burn")') == ("treats", "aloe")
+    assert atom_head('(plant "aloe")') == ("plant", "aloe")
+    assert atom_head('(plant)') == ("plant", None)
+    assert atom_head('(implies (and a b) c)') == ("implies", None)
+    assert atom_head('"not an expression"') == (None, None)
+
+def test_community_mode_matches_single_client(single):
+    sharded = ShardedMeTTaClient(COMMUNITIES, key=COMMUNITY, snapshot_dir="")
+    for plant, atoms in PLANTS.items():
+        assert sharded.add_atoms(atoms, community=COMMUNITIES[plant % len(COMMUNITIES)])["success"]
+
+    # Atoms stay on the caller's community shard
+    assert sharded.shards["kikuyu"].query('(plant "plant_1")')["matches"] == [{}]
+    assert sharded.shards["general"].query('(plant "plant_1")')["matches"] == []
+    assert sum(shard.get_atom_count() for shard in sharded.shards.values()) == len(ALL_ATOMS)
+
+    assert_same_results(single, sharded)
+    # A bound subject is only looked up on the shard holding it
+    assert sharded.query('(property "plant_4" ?value)')["shards"] == ["kikuyu"]
+
+def test_region_mode_matches_single_client(single):
+    sharded = ShardedMeTTaClient(REGIONS + ["general"], key=REGION, default_shard="general", snapshot_dir="")
+    assert sharded.add_atoms(ALL_ATOMS)["success"]
+
+    # Each subject lives on the shard of its region, with all of its atoms
+    assert len(sharded.shards["highlands"].query('(?predicate "plant_2" ?object)')["matches"]) == 3
+    assert sharded.shards["highlands"].query('(plant "plant_2")')["matches"] == [{}]
+    assert sharded.query('(treats "plant_2" ?condition)')["shards"] == ["highlands"]
+    assert sum(shard.get_atom_count() for shard in sharded.shards.values()) == len(ALL_ATOMS)
+
+    assert_same_results(single, sharded)
+
+def test_region_placement_survives_restart(tmp_path):
+    names = REGIONS + ["general"]
+    half = len(PLANTS) // 2
+    first = ShardedMeTTaClient(names, key=REGION, default_shard="general", snapshot_dir=str(tmp_path))
+    first.add_atoms([atom for plant in range(half) for atom in PLANTS[plant]])
+    placement = dict(first._subject_shard)
+
+    reopened = ShardedMeTTaClient(names, key=REGION, default_shard="general", snapshot_dir=str(tmp_path))
+    assert {s: reopened._subject_shard[s] for s in placement} == placement
+    # New atoms about known subjects follow them, even without a region in the batch
+    reopened.add_atoms([atom for plant in reversed(range(half, len(PLANTS))) for atom in PLANTS[plant]])
+    reopened.add_atoms(['(used_for "plant_1" "tea")'])
+    assert reopened.query('(used_for "plant_1" ?use)')["shards"] == [placement["plant_1"]]
+
+    single_plus = MeTTaClient(snapshot_dir="")
+    single_plus.add_atoms(ALL_ATOMS + ['(used_for "plant_1" "tea")'])
+    assert_same_results(single_plus, reopened)